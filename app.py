@@ -1,27 +1,76 @@
 import os
 import cv2
 import base64
+import json
 import uuid
+import threading
+import time
 import numpy as np
-import requests # Import the requests library
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from io import BytesIO # Import BytesIO for image data handling
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file, Response
 from flask_cors import CORS
 
 # External imports from your modules
-from overlay import overlay_carpet_trapezoid, overlay_carpet_ellipse, apply_transparency_to_black_background
-from floor_mask_model import load_model, infer
-from carpet_working import overlay_texture_on_floor
-from mask_room_image import mask, scale_room_image, tileDesign
+from overlay import overlay_carpet_trapezoid, overlay_carpet_ellipse, apply_transparency_array, crop_layer
+from floor_mask_model import startup, get_model_status, segment_image, get_inference_metrics, FLOOR_LABEL_ID, WALL_LABEL_ID
+from carpet_working import overlay_texture_on_floor, floor_texture_layer
+from mask_room_image import scale_room_image_array, tile_design_array
+from video_overlay import overlay_video
+from wall_overlay import overlay_wall, paint_swatch
+from artifact_store import persist_request, persist_level, get_store
+from temp_dirs import request_temp_dir
+from image_encoding import output_encoding, encode_image, OUTPUT_FORMATS
+from mask_codec import encode_mask, MASK_ENCODINGS, MASK_EXT
+from image_fetch import get_fetcher, is_url, FETCH_MAX_VIDEO_BYTES
+from catalog import get_catalog, CARPET_SHAPES, ASSET_KINDS, UnknownAsset
+from room_sessions import get_room_sessions, RoomSession, UnknownRoom
+from jobs import get_job_queue, report_stage, current_job_id, JOB_WORKERS
 
 app = Flask(__name__)
 CORS(app)
-# Create necessary directories
-for folder in ["inputRoom", "inputCarpet", "inputTile", "mask_out", "final_out", "temporary"]:
+# Create necessary directories. Inputs, masks and outputs are kept (per ARTIFACT_PERSIST) in the
+# content-addressed artifact store instead of new uuid files under inputRoom/, final_out/, ...
+for folder in ["temporary"]:
     os.makedirs(folder, exist_ok=True)
 
-# Load ML model once at startup
-load_model()
+# The ML model is loaded (and warmed up) once per server process by init_app(). By default this
+# happens in a background thread so the worker binds immediately; /ping reports readiness and
+# model routes return 503 until the model is ready. MODEL_LOAD_IN_BACKGROUND=0 blocks init_app() instead.
+MODEL_LOAD_IN_BACKGROUND = os.environ.get("MODEL_LOAD_IN_BACKGROUND", "1") == "1"
+MODEL_ROUTES = {"/overlayCarpet", "/overlayFloor", "/overlayWall", "/overlayVideo", "/rooms", "/overlayBatch"}
+
+# Long renders can run as jobs instead (see /jobs): with `Prefer: respond-async`, `?async=1` or
+# a JSON `"async": true` these routes answer 202 with a job id at once
+JOB_ROUTES = {"/overlayCarpet", "/overlayFloor", "/overlayWall", "/overlayVideo"}
+
+def wants_async():
+    if "respond-async" in request.headers.get("Prefer", ""):
+        return True
+    # Not read from multipart forms: parsing one here would keep a second copy of the body
+    value = request.args.get("async")
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get("async")
+    return str(value).lower() in ("1", "true", "yes")
+
+# Registered before require_model_ready: jobs are accepted while the model loads and wait for it
+@app.before_request
+def enqueue_async_request():
+    # A job replaying its request (run_job_request()) renders it
+    if request.path in JOB_ROUTES and request.method == "POST" and current_job_id() is None and wants_async():
+        job_id = get_job_queue().enqueue(request.path, request.get_data(), request.content_type,
+                                         request.headers.get("Accept"), request.args.to_dict(flat=False))
+        status_url = f"/jobs/{job_id}"
+        return jsonify({"job_id": job_id, "state": "queued", "status_url": status_url,
+                        "result_url": f"{status_url}/result"}), 202, {"Location": status_url}
+
+@app.before_request
+def require_model_ready():
+    if request.path in MODEL_ROUTES:
+        status = get_model_status()
+        if not status["ready"]:
+            return jsonify({"error": "Model is not ready yet", **status}), 503
 
 # Utils
 def decode_base64_to_image(base64_string):
@@ -29,116 +78,451 @@ def decode_base64_to_image(base64_string):
     np_arr = np.frombuffer(image_data, np.uint8)
     return cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
 
-def encode_image_to_base64(image):
-    _, buffer = cv2.imencode(".png", image)
-    return base64.b64encode(buffer).decode("utf-8")
+def encode_image_to_base64(image, encoding=None):
+    # Server default encoding (PNG unless OUTPUT_FORMAT says otherwise) when none is requested
+    return base64.b64encode(encode_image(image, encoding)).decode("utf-8")
+
+def encode_class_masks(segmentation, labels, encoding=None, mask_encoding="image"):
+    """
+    Masks of the requested classes (None for classes not found) for a JSON response: base64
+    red-on-black images, or RLE/polygon dicts per `mask_encoding`.
+    """
+    masks = class_mask_images(segmentation, labels, mask_encoding)
+    return {label: encode_image_to_base64(mask, encoding) if isinstance(mask, np.ndarray) else mask
+            for label, mask in masks.items()}
 
 # NEW UTILITY: Function to download image from a URL
 def download_image_from_url(url):
     """
     Downloads an image from a given URL and returns it as an OpenCV image (numpy array).
+    Goes through the pooled, cached fetcher of image_fetch.py (timeouts, FETCH_MAX_BYTES,
+    ETag/Last-Modified revalidation); raises ConnectionError on network and HTTP errors and
+    ValueError for oversized or undecodable bodies.
     """
-    try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
-
-        # Read the image data from the response content
-        image_data = BytesIO(response.content)
-        
-        # Convert image data to a numpy array and then decode with OpenCV
-        np_arr = np.frombuffer(image_data.read(), np.uint8)
-        img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-
-        if img is None:
-            raise ValueError(f"Could not decode image from URL. It might be corrupted or not an image: {url}")
-        return img
-    except requests.exceptions.RequestException as e:
-        # Catch specific requests errors (e.g., network issues, invalid URL, timeouts)
-        raise ConnectionError(f"Failed to download image from URL {url} due to a request error: {e}")
-    except Exception as e:
-        # Catch any other unexpected errors during processing
-        raise RuntimeError(f"An unexpected error occurred while processing image from URL {url}: {e}")
+    return get_fetcher().fetch_image(url)
 
 # Helper to process image data (either base64 or URL)
 def get_image_from_input_data(image_input_data):
-    if image_input_data.startswith("http://") or image_input_data.startswith("https://"):
+    if is_url(image_input_data):
         return download_image_from_url(image_input_data)
     else:
         return decode_base64_to_image(image_input_data)
 
+def load_input_images(sources):
+    """
+    Loads several base64/URL image inputs; the URLs are downloaded concurrently while the
+    base64 ones are decoded on the calling thread.
+
+    Args:
+        sources (dict): field -> base64 string or URL.
+
+    Returns:
+        dict: field -> BGR image
+    """
+    return get_fetcher().fetch_images(sources, decode=decode_base64_to_image)
+
+def decode_image_bytes(image_bytes):
+    """Decodes uploaded file bytes (multipart part or raw request body) without a base64 step."""
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode the uploaded image")
+    return image
+
+def parse_overlay_request(image_fields):
+    """
+    Reads an overlay request in any of the accepted encodings:
+
+    - application/json: images as base64 strings or URLs, options alongside (as before);
+    - multipart/form-data: images as file parts (or base64/URL text fields), options as fields;
+    - a raw image body (image/*, application/octet-stream): the body is the first image field
+      (the next one when a `room_id` stands in for room_image), the others are URLs in the
+      query string, options too.
+
+    Form and query values of `mask_classes` are comma-separated.
+
+    Returns:
+        tuple: (options dict, {field: BGR image} for the image fields that were given)
+    """
+    report_stage("loading_inputs")
+    if request.is_json:
+        options = request.get_json()
+        images = load_input_images({field: options[field] for field in image_fields if options.get(field)})
+        return options, images
+
+    if request.mimetype == "multipart/form-data":
+        options = request.form.to_dict()
+        images = {field: decode_image_bytes(request.files[field].read()) for field in image_fields if field in request.files}
+        images.update(load_input_images({field: options[field] for field in image_fields
+                                         if field not in images and options.get(field)}))
+    else:
+        options = request.args.to_dict()
+        if options.get("room_id") and image_fields[0] == "room_image":
+            image_fields = image_fields[1:]
+        # Read the body once, straight from the stream, without keeping a second copy
+        body = request.get_data(cache=False)
+        images = {image_fields[0]: decode_image_bytes(body)} if body else {}
+        images.update(load_input_images({field: options[field] for field in image_fields[1:] if options.get(field)}))
+    if options.get("mask_classes"):
+        options["mask_classes"] = [label.strip() for label in options["mask_classes"].split(",") if label.strip()]
+    return options, images
+
+# Response formats of the overlay routes: "json" (base64 images), "image" (the main output as a
+# bare image body) or "multipart" (every output as its own part of a multipart/mixed body)
+RESPONSE_MIMETYPES = {"application/json": "json", "multipart/mixed": "multipart",
+                      **{mimetype: "image" for _, mimetype in OUTPUT_FORMATS.values()}}
+
+def requested_output(options):
+    """
+    `response_format` and image encoding of an overlay request. Both come from the request
+    options (`response_format`, `output_format`, `output_quality`, `lossless`, `png_compression`),
+    else from the Accept header (e.g. `image/webp` asks for a bare WebP image); JSON with the
+    server's default encoding otherwise.
+
+    Returns:
+        tuple: (response format, encoding from image_encoding.output_encoding())
+    """
+    response_format = options.get("response_format")
+    accepted_format = None
+    if response_format is None:
+        best = request.accept_mimetypes.best_match(list(RESPONSE_MIMETYPES), default="application/json")
+        response_format = RESPONSE_MIMETYPES[best]
+        accepted_format = next((name for name, (_, mimetype) in OUTPUT_FORMATS.items() if mimetype == best), None)
+    if response_format not in RESPONSE_MIMETYPES.values():
+        raise ValueError(f"Unsupported response_format: {response_format}")
+    return response_format, output_encoding(options, default_format=accepted_format)
+
+# Output layouts of the overlay routes: "frame" (room-sized images, the default) or "layer"
+# (only the bounding-box crop of the overlay, plus where it goes in the frame)
+OUTPUT_LAYOUTS = ("frame", "layer")
+
+def requested_layout(options):
+    """`output_layout` of an overlay request ("frame" by default)."""
+    layout = options.get("output_layout") or "frame"
+    if layout not in OUTPUT_LAYOUTS:
+        raise ValueError(f"Unsupported output_layout: {layout}")
+    return layout
+
+def layer_outputs(key, layer):
+    """
+    Crops a frame-sized BGRA layer for the "layer" layout.
+
+    Returns:
+        tuple: ({key: cropped layer}, metadata with `layer_offset` [x, y] and `frame_size` [width, height])
+    """
+    cropped, (x, y) = crop_layer(layer)
+    return {key: cropped}, {"layer_offset": [x, y], "frame_size": [layer.shape[1], layer.shape[0]]}
+
+def _metadata_headers(metadata):
+    """Metadata as X-... headers of binary responses, e.g. layer_offset -> `X-Layer-Offset: 120,340`."""
+    headers = {"X-" + "-".join(part.capitalize() for part in key.split("_")): ",".join(map(str, value))
+               for key, value in metadata.items()}
+    if headers:
+        # Lets browser clients read them across origins
+        headers["Access-Control-Expose-Headers"] = ", ".join(headers)
+    return headers
+
+def overlay_response(outputs, output, class_masks=None, metadata=None):
+    """
+    Builds the success response of an overlay route.
+
+    Args:
+        outputs (dict): response key -> BGR(A) image, or a JSON-serialisable dict (e.g. an RLE mask);
+                        the first one is the main output and must be an image.
+        output (tuple): (response format, encoding) from requested_output().
+        class_masks (dict): label -> red-on-black mask or RLE/polygon dict (None when absent),
+                            from class_mask_images().
+        metadata (dict): key -> list of numbers (e.g. `layer_offset`); JSON keys, or X-... headers
+                         of image and multipart responses.
+    """
+    report_stage("encoding")
+    response_format, encoding = output
+    metadata = metadata or {}
+    as_json = lambda value: encode_image_to_base64(value, encoding) if isinstance(value, np.ndarray) else value
+    if response_format == "json":
+        response = {"status": "success", **{key: as_json(value) for key, value in outputs.items()}}
+        if class_masks is not None:
+            response["class_masks"] = {label: as_json(mask) if mask is not None else None
+                                       for label, mask in class_masks.items()}
+        if encoding["format"] != "png":
+            response["output_format"] = encoding["format"]
+        response.update(metadata)
+        return jsonify(response)
+
+    if response_format == "image":
+        key, image = next(iter(outputs.items()))
+        return Response(encode_image(image, encoding), mimetype=encoding["mimetype"],
+                        headers={"Content-Disposition": f'inline; filename="{key}{encoding["ext"]}"',
+                                 **_metadata_headers(metadata)})
+
+    parts = dict(outputs)
+    for label, mask in (class_masks or {}).items():
+        if mask is not None:
+            parts[f"class_mask_{label}"] = mask
+    boundary = uuid.uuid4().hex
+    body = bytearray()
+    for key, value in parts.items():
+        # Images in the requested encoding; RLE/polygon masks as JSON parts
+        mimetype, ext = (encoding["mimetype"], encoding["ext"]) if isinstance(value, np.ndarray) else ("application/json", ".json")
+        body += (f"--{boundary}\r\nContent-Type: {mimetype}\r\n"
+                 f'Content-Disposition: attachment; name="{key}"; filename="{key}{ext}"\r\n\r\n').encode()
+        body += encode_image(value, encoding) if isinstance(value, np.ndarray) else json.dumps(value).encode("utf-8")
+        body += b"\r\n"
+    body += f"--{boundary}--\r\n".encode()
+    return Response(bytes(body), mimetype=f"multipart/mixed; boundary={boundary}", headers=_metadata_headers(metadata))
+
+def requested_mask_encoding(options):
+    """`mask_encoding` of a request: "image" (red-on-black raster, the default), "rle" (COCO RLE) or "polygon"."""
+    mask_encoding = options.get("mask_encoding") or "image"
+    if mask_encoding not in MASK_ENCODINGS:
+        raise ValueError(f"Unsupported mask_encoding: {mask_encoding}")
+    return mask_encoding
+
+def class_mask_images(segmentation, labels, mask_encoding="image"):
+    """Masks of the requested classes (None for classes not found): red-on-black images, or RLE/polygon dicts."""
+    return {label: mask_output(segmentation, label, mask_encoding)[1] if segmentation.has_class(label) else None
+            for label in labels}
+
+def mask_output(segmentation, label, mask_encoding="image"):
+    """
+    A class mask for overlay_response().
+
+    Returns:
+        tuple: ("image", red-on-black BGR mask) or (mask_encoding, RLE/polygon dict of the binary mask)
+    """
+    if mask_encoding == "image":
+        return "image", segmentation.mask_image(label)
+    return mask_encoding, encode_mask(segmentation.binary_mask(label), mask_encoding)
+
+def request_room(data, images):
+    """
+    The room an overlay request renders on: its `room_id` session (see room_sessions.py), or
+    room_image scaled and segmented here, as a session that is not stored.
+
+    Returns:
+        tuple: (uploaded room image or None, RoomSession)
+    """
+    if data.get("room_id"):
+        return None, get_room_sessions().load(str(data["room_id"]))
+    report_stage("segmenting")
+    # Applying scaling up/down right after user input to avoid multiple changes/repetetive function calls
+    room_img = scale_room_image_array(images["room_image"])
+    return images["room_image"], RoomSession.from_segmentation(room_img, segment_image(room_img))
+
+def catalog_asset(kind, asset_id, variant="source"):
+    """A variant of a registered carpet/design (see catalog.py); UnknownAsset when not registered."""
+    return get_catalog().load(kind, str(asset_id), variant)
+
+def carpet_input(options, images):
+    """
+    The carpet of an overlay request: carpet_image, or the catalog's `carpet_id`, whose
+    ellipse/trapezoid shape was computed when it was registered.
+
+    Returns:
+        tuple: (carpet image, the carpet shaped for overlay_type or None)
+    """
+    if "carpet_image" in images:
+        return images["carpet_image"], None
+    carpet_id = options["carpet_id"]
+    shape = CARPET_SHAPES.get(str(options.get("overlay_type", "ellipse")).lower())
+    return catalog_asset("carpet", carpet_id), catalog_asset("carpet", carpet_id, shape) if shape else None
+
+def design_input(options, images):
+    """
+    The floor design of an overlay request: design_image, or the catalog's `design_id`, whose
+    tiling is cached.
+
+    Returns:
+        tuple: (design image, design tiled 5x each way)
+    """
+    if "design_image" in images:
+        return images["design_image"], tile_design_array(images["design_image"])
+    return catalog_asset("design", options["design_id"]), catalog_asset("design", options["design_id"], "tiled")
+
+def render_carpet(session, carpet_img, shaped_carpet, options):
+    """Room-sized BGRA transparent carpet of a carpet on a room, or None on failure."""
+    report_stage("compositing")
+    return apply_transparency_array(
+        session.room,
+        carpet_img,
+        overlay_type=options.get("overlay_type", "ellipse"),
+        carpet_dimensions=options.get("carpet_dimensions", None),
+        floor_mask=session.floor_mask,
+        shaped_carpet=shaped_carpet,
+        floor_center=session.floor_center
+    )
+
+def render_floor(session, tiled_design, layout):
+    """The room with the design on its floor or, for the "layer" layout, the textured floor as a BGRA layer (alpha = floor mask)."""
+    report_stage("compositing")
+    if layout == "layer":
+        return floor_texture_layer(session.floor_mask, tiled_design, session.geometry)
+    return overlay_texture_on_floor(session.room, session.floor_mask, tiled_design, session.geometry)
+
+def layout_outputs(image, layout, frame_key, layer_key):
+    """Outputs and metadata of a rendered frame: as is, or cropped by layer_outputs() for the "layer" layout."""
+    if layout == "layer":
+        return layer_outputs(layer_key, image)
+    return {frame_key: image}, None
+
+# Raw bytes of inputs that are not images (e.g. videos), given as base64 or URL
+def get_bytes_from_input_data(input_data):
+    if is_url(input_data):
+        # Pooled and size-capped like the images, but not cached
+        return get_fetcher().fetch_bytes(input_data, max_bytes=FETCH_MAX_VIDEO_BYTES)
+    return base64.b64decode(input_data)
+
 # ───────────────────────────────────────────────────────────── #
 # ROUTES
 # ───────────────────────────────────────────────────────────── #
 
 @app.route("/ping", methods=["GET"])
 def ping():
-    return jsonify({"status": "API is live"}), 200
+    status = get_model_status()
+    return jsonify({"status": "API is live", **status}), 200 if status["ready"] else 503
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return jsonify(dict(get_inference_metrics(), artifact_store=get_store().stats(), image_fetch=get_fetcher().stats(),
+                        catalog=get_catalog().stats(), room_sessions=get_room_sessions().stats(),
+                        jobs=get_job_queue().stats())), 200
+
+# ─── Room Sessions ──────────────────────────────────────────── #
+# A room scaled and segmented once, then rendered with any number of carpets and designs by
+# passing its `room_id` to /overlayCarpet and /overlayFloor instead of room_image
+@app.route("/rooms", methods=["POST"])
+def create_room():
+    try:
+        # JSON (base64 or URL), multipart/form-data or a raw room image body
+        data, images = parse_overlay_request(["room_image"])
+        if "room_image" not in images:
+            return jsonify({"error": "room_image must be provided"}), 400
+        room_img = scale_room_image_array(images["room_image"])
+        segmentation = segment_image(room_img)
+        if not segmentation:
+            return jsonify({"error": "Feature not found in image"}), 400
+        session = get_room_sessions().create(room_img, segmentation)
+        persist_request("rooms",
+                        inputs={"room": images["room_image"]},
+                        outputs={"floor_mask": (session.floor_mask, MASK_EXT)})
+        return jsonify(session.meta), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/rooms/<room_id>", methods=["GET", "DELETE"])
+def room_info(room_id):
+    if request.method == "DELETE":
+        found = get_room_sessions().delete(room_id) if room_id.isalnum() else False
+        return (jsonify({"deleted": room_id}), 200) if found else (jsonify({"error": f"Unknown room id: {room_id}"}), 404)
+    meta = get_room_sessions().info(room_id)
+    if meta is None:
+        return jsonify({"error": f"Unknown or expired room id: {room_id}"}), 404
+    return jsonify(meta), 200
+
+# ─── Carpet / Design Catalog ────────────────────────────────── #
+# Assets registered once, with their room-independent variants precomputed, and then referenced
+# by `carpet_id` / `design_id` on the overlay routes instead of being uploaded with each request
+def _catalog_kind(kinds):
+    kind = kinds[:-1]
+    if kinds[-1:] != "s" or kind not in ASSET_KINDS:
+        return None
+    return kind
+
+@app.route("/catalog/<kinds>", methods=["POST"])
+def register_asset(kinds):
+    kind = _catalog_kind(kinds)
+    if kind is None:
+        return jsonify({"error": f"Unknown catalog: {kinds}"}), 404
+    try:
+        # JSON {"image": base64 or URL}, a multipart "image" file or a raw image body;
+        # `asset_id` is optional (the content digest by default)
+        data, images = parse_overlay_request(["image"])
+        if "image" not in images or images["image"] is None:
+            return jsonify({"error": "image must be provided"}), 400
+        return jsonify(get_catalog().register(kind, images["image"], data.get("asset_id"))), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/catalog/<kinds>", methods=["GET"])
+def list_assets(kinds):
+    kind = _catalog_kind(kinds)
+    if kind is None:
+        return jsonify({"error": f"Unknown catalog: {kinds}"}), 404
+    return jsonify({kinds: get_catalog().list(kind)}), 200
+
+@app.route("/catalog/<kinds>/<asset_id>", methods=["GET", "DELETE"])
+def asset_info(kinds, asset_id):
+    kind = _catalog_kind(kinds)
+    if kind is None:
+        return jsonify({"error": f"Unknown catalog: {kinds}"}), 404
+    try:
+        if request.method == "DELETE":
+            found = get_catalog().delete(kind, asset_id)
+            return (jsonify({"deleted": asset_id}), 200) if found else (jsonify({"error": f"Unknown {kind} id: {asset_id}"}), 404)
+        meta = get_catalog().info(kind, asset_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if meta is None:
+        return jsonify({"error": f"Unknown {kind} id: {asset_id}"}), 404
+    return jsonify(meta), 200
 
 # ─── Carpet Overlay ─────────────────────────────────────────── #
 @app.route("/overlayCarpet", methods=["POST"])
 def get_transparent_carpet():
     try:
-        data = request.json
-        room_image_data = data.get("room_image")    # Can be base64 or URL
-        carpet_image_data = data.get("carpet_image") # Can be base64 or URL
-        overlay_type = data.get("overlay_type", "ellipse")
-        carpet_dimensions = data.get("carpet_dimensions", None)
-
-        if not room_image_data or not carpet_image_data:
-            return jsonify({"error": "Both room_image and carpet_image must be provided"}), 400
-
-        unique_id = str(uuid.uuid4())
-        room_path = os.path.join("inputRoom", f"room_{unique_id}.jpg")
-        carpet_path = os.path.join("inputCarpet", f"carpet_{unique_id}.jpg")
-
-        # Process input images
-        room_img = get_image_from_input_data(room_image_data)
-        carpet_img = get_image_from_input_data(carpet_image_data)
-
-        cv2.imwrite(room_path, room_img)
-        cv2.imwrite(carpet_path, carpet_img)
+        # JSON (base64 or URL), multipart/form-data or a raw room image body; see parse_overlay_request
+        data, images = parse_overlay_request(["room_image", "carpet_image"])
+        extra_mask_classes = data.get("mask_classes", [])  # e.g. ["wall", "carpet"]; same forward pass as the floor
+        output = requested_output(data)
+        layout = requested_layout(data)
+        mask_encoding = requested_mask_encoding(data)
+
+        carpet_id = data.get("carpet_id")  # A registered carpet instead of carpet_image (see /catalog/carpets)
+        # A room session (see /rooms) instead of room_image: scaling and segmentation are skipped
+        if not ("room_image" in images or data.get("room_id")) or not ("carpet_image" in images or carpet_id):
+            return jsonify({"error": "room_image (or room_id) and either carpet_image or carpet_id must be provided"}), 400
+
+        # Process input images; the whole pipeline stays in memory (no input, intermediate
+        # or output files)
+        carpet_img, shaped_carpet = carpet_input(data, images)
 
         # ----------------- ADDITION FOR FLOOR MASK -----------------
-        # Step 1: Generate the floor mask using the room image path
-        # Applying scaling up/down right after user input to avoid multiple changes/repetetive function calls
-        scaled_room_img_path = scale_room_image(room_path)
-        room_path = scaled_room_img_path
-        floor_mask_path = mask(room_path)
-        
-        # Step 2: Read the floor mask image
-        floor_mask_img = cv2.imread(floor_mask_path)
-        if floor_mask_img is None:
-            raise RuntimeError(f"Failed to read floor mask image from path: {floor_mask_path}")
-        
-        # Step 3: Encode the floor mask image to base64
-        encoded_floor_mask = encode_image_to_base64(floor_mask_img)
+        # Step 1: Generate the floor mask (or take it from the room session)
+        input_room_img, session = request_room(data, images)
+        segmentation = session.segmentation
+        if not segmentation:
+            return jsonify({"error": "Feature not found in image"}), 400
         # -------------------------------------------------------------
 
-        transparent_carpet_path = apply_transparency_to_black_background(
-            room_path,
-            carpet_path,
-            overlay_type=overlay_type,
-            carpet_dimensions=carpet_dimensions
-        )
+        transparent_carpet_img = render_carpet(session, carpet_img, shaped_carpet, data)
 
-        if not transparent_carpet_path:
+        if transparent_carpet_img is None:
             return jsonify({"error": "Failed to generate transparent carpet. Check logs."}), 500
-
-        # IMREAD_UNCHANGED is important for transparent images (alpha channel)
-        transparent_carpet_img = cv2.imread(transparent_carpet_path, cv2.IMREAD_UNCHANGED)
-        if transparent_carpet_img is None: # Added check for successful image read
-            raise RuntimeError(f"Failed to read transparent carpet image from path: {transparent_carpet_path}")
-        
-        # encoded_room_img = encode_image_to_base64(room_img) # CHANGED: Removed original room image
-        encoded_transparent_carpet = encode_image_to_base64(transparent_carpet_img)
-
-        return jsonify({
-            "status": "success",
-            # "original_room_image": encoded_room_img, # CHANGED: Removed original room image
-            "transparent_carpet_image": encoded_transparent_carpet,
-            "floor_mask_image": encoded_floor_mask # CHANGED: Added floor mask image
-        })
-
+        persist_request("overlayCarpet",
+                        inputs={**({"room": input_room_img} if input_room_img is not None else {}), "carpet": carpet_img},
+                        outputs={"floor_mask": (session.floor_mask, MASK_EXT),
+                                 "transparent_carpet": (transparent_carpet_img, ".png")})
+
+        # Step 2: Return the carpet and the floor mask (encoded as requested). The "layer" layout
+        # returns only the carpet's bounding box and its offset; the client composites it
+        outputs, metadata = layout_outputs(transparent_carpet_img, layout, "transparent_carpet_image", "carpet_layer_image")
+        # The floor mask as `floor_mask_image`, or as an RLE/polygon `floor_mask` per mask_encoding
+        mask_kind, floor_mask = mask_output(segmentation, FLOOR_LABEL_ID, mask_encoding)
+        outputs["floor_mask_image" if mask_kind == "image" else "floor_mask"] = floor_mask
+        class_masks = class_mask_images(segmentation, extra_mask_classes, mask_encoding) if extra_mask_classes else None
+        return overlay_response(outputs, output, class_masks, metadata)
+
+    except (UnknownAsset, UnknownRoom) as e:
+        return jsonify({"error": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -148,50 +532,392 @@ def get_transparent_carpet():
 @app.route("/overlayFloor", methods=["POST"])
 def overlay_floor_model():
     try:
-        data = request.json
-        room_image_data = data.get("room_image")     # Can be base64 or URL
-        design_image_data = data.get("design_image") # Can be base64 or URL
+        # JSON (base64 or URL), multipart/form-data or a raw room image body; see parse_overlay_request
+        data, images = parse_overlay_request(["room_image", "design_image"])
+        extra_mask_classes = data.get("mask_classes", [])  # e.g. ["wall", "carpet"]; same forward pass as the floor
+        output = requested_output(data)
+        layout = requested_layout(data)
+        mask_encoding = requested_mask_encoding(data)
+
+        design_id = data.get("design_id")  # A registered design instead of design_image (see /catalog/designs)
+        # A room session (see /rooms) instead of room_image: scaling and segmentation are skipped
+        if not ("room_image" in images or data.get("room_id")) or not ("design_image" in images or design_id):
+            return jsonify({"error": "room_image (or room_id) and either design_image or design_id must be provided"}), 400
+
+        # Process input images; applying tiling to the floor design image (a registered design's tiling is cached)
+        design_img, tiled_design = design_input(data, images)
+
+        # Scaling and tiling stay in memory: the shared temporary/ folder is not safe under threaded workers.
+        # The room's floor contour and corners of the homography come with its session
+        input_room_img, session = request_room(data, images)
+        segmentation = session.segmentation
+
+        if segmentation:
+            # The "layer" layout gets the textured floor as a BGRA layer for the client to composite
+            final_output = render_floor(session, tiled_design, layout)
+            if final_output is not None:
+                persist_request("overlayFloor",
+                                inputs={**({"room": input_room_img} if input_room_img is not None else {}), "design": design_img},
+                                outputs={"floor_mask": (session.floor_mask, MASK_EXT),
+                                         **({"floor_layer": (final_output, ".png")} if layout == "layer"
+                                            else {"final_output": (final_output, ".jpg")})})
+                outputs, metadata = layout_outputs(final_output, layout, "final_output", "floor_layer_image")
+                # Class masks come from the same forward pass as the floor mask
+                class_masks = class_mask_images(segmentation, extra_mask_classes, mask_encoding) if extra_mask_classes else None
+                return overlay_response(outputs, output, class_masks, metadata)
+            else:
+                return jsonify({"error": "Failed to generate final output"}), 500
+        else:
+            return jsonify({"error": "Feature not found in image"}), 400
+    except (UnknownAsset, UnknownRoom) as e:
+        return jsonify({"error": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+    #flask app
+
+# ─── Batch Overlay ──────────────────────────────────────────── #
+# One room against many carpets and designs: the room is segmented once and the items are
+# composited on a shared thread pool (OpenCV and numpy release the GIL), each streamed back as
+# an NDJSON line as soon as it is ready
+OVERLAY_BATCH_WORKERS = int(os.environ.get("OVERLAY_BATCH_WORKERS", os.cpu_count() or 4))
+OVERLAY_BATCH_MAX_ITEMS = int(os.environ.get("OVERLAY_BATCH_MAX_ITEMS", 200))
+batch_executor = ThreadPoolExecutor(max_workers=OVERLAY_BATCH_WORKERS, thread_name_prefix="overlay-batch")
+
+def render_batch_item(index, item, session, options):
+    """
+    Renders one /overlayBatch item on the batch's room.
+
+    Args:
+        index (int): position of the item in the request.
+        item (dict): carpet_image/carpet_id (+ overlay_type, carpet_dimensions) or
+                     design_image/design_id, and optionally its own output options.
+        session (RoomSession): the batch's room.
+        options (dict): the batch's output options, which the item's override.
+
+    Returns:
+        dict: the item's NDJSON record: `index`, `status` and either its outputs (base64, as
+        /overlayCarpet and /overlayFloor return them) or an `error`.
+    """
+    started = time.perf_counter()
+    item_options = {**options, **item}
+    try:
+        layout = requested_layout(item_options)
+        encoding = output_encoding(item_options)
+        images = load_input_images({field: item[field] for field in ("carpet_image", "design_image") if item.get(field)})
+        if "carpet_image" in images or item.get("carpet_id"):
+            kind = "carpet"
+            carpet_img, shaped_carpet = carpet_input(item_options, images)
+            image = render_carpet(session, carpet_img, shaped_carpet, item_options)
+            if image is None:
+                raise RuntimeError("Failed to generate transparent carpet. Check logs.")
+            persist_request("overlayCarpet", inputs={"carpet": carpet_img}, outputs={"transparent_carpet": (image, ".png")})
+            outputs, metadata = layout_outputs(image, layout, "transparent_carpet_image", "carpet_layer_image")
+        elif "design_image" in images or item.get("design_id"):
+            kind = "floor"
+            design_img, tiled_design = design_input(item_options, images)
+            image = render_floor(session, tiled_design, layout)
+            if image is None:
+                raise RuntimeError("Failed to generate final output")
+            persist_request("overlayFloor", inputs={"design": design_img},
+                            outputs={"floor_layer": (image, ".png")} if layout == "layer" else {"final_output": (image, ".jpg")})
+            outputs, metadata = layout_outputs(image, layout, "final_output", "floor_layer_image")
+        else:
+            raise ValueError("Each item needs carpet_image, carpet_id, design_image or design_id")
+        record = {"index": index, "status": 200, "type": kind,
+                  **{key: encode_image_to_base64(value, encoding) for key, value in outputs.items()}, **(metadata or {})}
+        if encoding["format"] != "png":
+            record["output_format"] = encoding["format"]
+    except (UnknownAsset, UnknownRoom) as e:
+        record = {"index": index, "status": 404, "error": e.args[0]}
+    except ValueError as e:
+        record = {"index": index, "status": 400, "error": str(e)}
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        record = {"index": index, "status": 500, "error": str(e)}
+    record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return record
 
-        if not room_image_data or not design_image_data:
-            return jsonify({"error": "Both room_image and design_image must be provided"}), 400
+@app.route("/overlayBatch", methods=["POST"])
+def overlay_batch():
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "A JSON body is required"}), 400
+        items = data.get("items")
+        if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+            return jsonify({"error": "items must be a non-empty list of objects"}), 400
+        if len(items) > OVERLAY_BATCH_MAX_ITEMS:
+            return jsonify({"error": f"At most {OVERLAY_BATCH_MAX_ITEMS} items per batch"}), 400
+        if not (data.get("room_image") or data.get("room_id")):
+            return jsonify({"error": "room_image or room_id must be provided"}), 400
+        extra_mask_classes = data.get("mask_classes", [])
+        mask_encoding = requested_mask_encoding(data)
+        encoding = output_encoding(data)
+        requested_layout(data)
+
+        # The room is scaled and segmented once for every item (or comes from its session)
+        images = {} if data.get("room_id") else load_input_images({"room_image": data["room_image"]})
+        input_room_img, session = request_room(data, images)
+        if not session.segmentation:
+            return jsonify({"error": "Feature not found in image"}), 400
+        if input_room_img is not None:
+            persist_request("overlayBatch", inputs={"room": input_room_img}, outputs={"floor_mask": (session.floor_mask, MASK_EXT)})
+
+        options = {key: value for key, value in data.items()
+                   if key not in ("items", "room_image", "room_id", "mask_classes", "mask_encoding")}
+        started = time.perf_counter()
+        futures = [batch_executor.submit(render_batch_item, index, item, session, options) for index, item in enumerate(items)]
+
+        # First line: the room's floor mask (and class masks), sent once for all items
+        header = {"status": "success", "items": len(items), "frame_size": list(session.meta["size"])}
+        mask_kind, floor_mask = mask_output(session.segmentation, FLOOR_LABEL_ID, mask_encoding)
+        if mask_kind == "image":
+            header["floor_mask_image"] = encode_image_to_base64(floor_mask, encoding)
+        else:
+            header["floor_mask"] = floor_mask
+        if extra_mask_classes:
+            header["class_masks"] = encode_class_masks(session.segmentation, extra_mask_classes, encoding, mask_encoding)
+    except (UnknownAsset, UnknownRoom) as e:
+        return jsonify({"error": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
 
-        unique_id = str(uuid.uuid4())
-        room_path = os.path.join("inputRoom", f"room_{unique_id}.jpg")
-        design_path = os.path.join("inputTile", f"design_{unique_id}.jpg")
-        mask_path = os.path.join("mask_out", f"mask_{unique_id}.jpg")
-        final_path = os.path.join("final_out", f"final_{unique_id}.jpg")
+    def stream():
+        failed = 0
+        try:
+            yield json.dumps(header) + "\n"
+            for future in as_completed(futures):
+                record = future.result()
+                failed += record["status"] != 200
+                yield json.dumps(record) + "\n"
+            yield json.dumps({"done": True, "items": len(items), "failed": failed,
+                              "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}) + "\n"
+        finally:
+            # The client went away: drop the items that have not started
+            for future in futures:
+                future.cancel()
+
+    # Proxies must not buffer the stream, or lines arrive all at once at the end
+    return Response(stream(), mimetype="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+# ─── Wall Overlay ───────────────────────────────────────────── #
+@app.route("/overlayWall", methods=["POST"])
+def overlay_wall_model():
+    try:
+        data = request.json
+        room_image_data = data.get("room_image")     # Can be base64 or URL
+        design_image_data = data.get("design_image") # Wallpaper; can be base64 or URL
+        design_id = data.get("design_id")            # Or a registered design (see /catalog/designs)
+        paint_color = data.get("paint_color")        # Or a solid paint colour, "#RRGGBB"
+        extra_mask_classes = data.get("mask_classes", [])
+        encoding = output_encoding(data)  # output_format, output_quality, ... as on the other overlay routes
+        mask_encoding = requested_mask_encoding(data)
+
+        if not room_image_data or not (design_image_data or design_id or paint_color):
+            return jsonify({"error": "room_image and either design_image, design_id or paint_color must be provided"}), 400
+
+        report_stage("loading_inputs")
+        images = load_input_images({"room": room_image_data, **({"design": design_image_data} if design_image_data else {})})
+        input_room_img = images["room"]
+        room_img = scale_room_image_array(input_room_img)
+        if design_image_data:
+            design = images["design"]
+        elif design_id:
+            design = catalog_asset("design", design_id)
+        else:
+            design = paint_swatch(paint_color)
 
-        # Process input images
-        room_img = get_image_from_input_data(room_image_data)
-        design_img = get_image_from_input_data(design_image_data)
+        report_stage("segmenting")
+        segmentation = segment_image(room_img, WALL_LABEL_ID)
+        if not segmentation:
+            return jsonify({"error": "Feature not found in image"}), 400
 
-        cv2.imwrite(room_path, room_img)
-        cv2.imwrite(design_path, design_img)
+        report_stage("compositing")
+        final_output = overlay_wall(room_img, segmentation.binary_mask(WALL_LABEL_ID), design)
+        persist_request("overlayWall",
+                        inputs={"room": input_room_img, **({"design": design} if design_image_data or design_id else {})},
+                        outputs={"wall_mask": (segmentation.binary_mask(WALL_LABEL_ID), MASK_EXT),
+                                 "final_output": (final_output, ".jpg")})
+        report_stage("encoding")
+        response = {"status": "success", "final_output": encode_image_to_base64(final_output, encoding)}
+        if extra_mask_classes:
+            response["class_masks"] = encode_class_masks(segmentation, extra_mask_classes, encoding, mask_encoding)
+        if encoding["format"] != "png":
+            response["output_format"] = encoding["format"]
+        return jsonify(response)
+    except UnknownAsset as e:
+        return jsonify({"error": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
 
-        # Applying scaling up/down right after user input to avoid multiple changes/repetetive function calls
-        scaled_room_img_path = scale_room_image(room_path)
-        room_path = scaled_room_img_path
+# ─── Walkthrough Video Overlay ──────────────────────────────── #
+# Read size of the encoded video while streaming it back
+VIDEO_STREAM_CHUNK_BYTES = 1024 * 1024
 
-        # Applying tiling to the floor design image
-        tiled_design_path = tileDesign(design_path)
-        design_path = tiled_design_path
+@app.route("/overlayVideo", methods=["POST"])
+def overlay_floor_video():
+    temp_dir = ExitStack()
+    try:
+        data = request.json
+        video_data = data.get("video")                # Can be base64 or URL
+        design_image_data = data.get("design_image") # Can be base64 or URL
+        design_id = data.get("design_id")            # Or a registered design (see /catalog/designs)
 
-        success = infer(room_path, 0, mask_path)
+        if not video_data or not (design_image_data or design_id):
+            return jsonify({"error": "video and either design_image or design_id must be provided"}), 400
 
-        if success:
-            final_output = overlay_texture_on_floor(room_path, mask_path, design_path)
-            if final_output is not None:
-                cv2.imwrite(final_path, final_output)
-                return jsonify({"status": "success", "final_output": encode_image_to_base64(final_output)})
-            else:
-                return jsonify({"error": "Failed to generate final output"}), 500
+        report_stage("loading_inputs")
+        video_bytes = get_bytes_from_input_data(video_data)
+        if design_image_data:
+            design_img = get_image_from_input_data(design_image_data)
+            tiled_design = tile_design_array(design_img)
         else:
-            return jsonify({"error": "Feature not found in image"}), 400
+            design_img = catalog_asset("design", design_id)
+            tiled_design = catalog_asset("design", design_id, "tiled")
+
+        # OpenCV only reads and writes videos as files. The directory outlives the route: the
+        # response streams the encoded video from it and removes it when closed
+        temp_path = temp_dir.enter_context(request_temp_dir())
+        video_path = os.path.join(temp_path, "video")
+        final_path = os.path.join(temp_path, "final.mp4")
+        with open(video_path, "wb") as f:
+            f.write(video_bytes)
+        report_stage("rendering_video")
+        stats = overlay_video(video_path, tiled_design, final_path)
+        if not stats["frames"]:
+            return jsonify({"error": "Could not decode any frames from the video"}), 400
+
+        # The store needs the encoded bytes; the response does not
+        if persist_level("overlayVideo") != "none":
+            with open(final_path, "rb") as f:
+                persist_request("overlayVideo",
+                                inputs={"video": (video_bytes, ".video"), "design": design_img},
+                                outputs={"final_output": (f.read(), ".mp4")})
+
+        def stream():
+            with open(final_path, "rb") as f:
+                while True:
+                    chunk = f.read(VIDEO_STREAM_CHUNK_BYTES)
+                    if not chunk:
+                        return
+                    yield chunk
+
+        # Frame rate and keyframe counts travel in a header
+        response = Response(stream(), mimetype="video/mp4",
+                            headers={"Content-Length": str(os.path.getsize(final_path)), "X-Overlay-Stats": json.dumps(stats)})
+        # Runs once the body is sent or the client goes away (send_file() responses skip close callbacks)
+        response.call_on_close(temp_dir.pop_all().close)
+        return response
+    except UnknownAsset as e:
+        return jsonify({"error": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
-    #flask app
+    finally:
+        temp_dir.close()
+
+# ─── Jobs ───────────────────────────────────────────────────── #
+# Renders requested with `Prefer: respond-async` / `async=1` (see enqueue_async_request). The queue
+# (jobs.py) lives on disk, so any worker process can report on or render any job
+def run_job_request(job):
+    """Replays a queued request through its route, on a render thread; returns the response for the queue."""
+    request_info = job["request"]
+    headers = {"Accept": request_info["accept"]} if request_info.get("accept") else {}
+    with app.test_request_context(job["route"], method="POST", query_string=request_info["query"], data=job["body"],
+                                  content_type=request_info["content_type"], headers=headers):
+        response = app.full_dispatch_request()
+    # send_file() responses stream from their file object; the queue stores the bytes
+    response.direct_passthrough = False
+    try:
+        body = response.get_data()
+    finally:
+        # Runs the response's cleanup, e.g. removing /overlayVideo's temp directory
+        response.close()
+    headers = {key: value for key, value in response.headers.items()
+               if key.startswith("X-") or key in ("Content-Disposition", "Access-Control-Expose-Headers")}
+    return response.status_code, response.content_type, body, headers
+
+@app.route("/jobs/<job_id>", methods=["GET", "DELETE"])
+def job_status(job_id):
+    queue = get_job_queue()
+    if request.method == "DELETE":
+        # Cancels a queued job or drops a finished one; running jobs cannot be interrupted
+        if queue.delete(job_id):
+            return jsonify({"deleted": job_id}), 200
+        job = queue.get(job_id)
+        return (jsonify({"error": f"Job {job_id} is running"}), 409) if job else (jsonify({"error": f"Unknown job id: {job_id}"}), 404)
+    job = queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown or expired job id: {job_id}"}), 404
+    if job["state"] in ("done", "failed"):
+        job["result_url"] = f"/jobs/{job_id}/result"
+        result = queue.result(job_id)
+        # JSON responses are embedded; images, multipart bodies and videos are fetched from result_url
+        if result is not None and result[1].startswith("application/json"):
+            job["result"] = json.loads(result[3])
+    return jsonify(job), 200
+
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    """The response the route gave the job (status code, body and X-... headers), as a synchronous call would."""
+    result = get_job_queue().result(job_id)
+    if result is None:
+        job = get_job_queue().get(job_id)
+        if job is None:
+            return jsonify({"error": f"Unknown or expired job id: {job_id}"}), 404
+        return jsonify({"error": f"Job {job_id} is {job['state']}", "status_url": f"/jobs/{job_id}"}), 409
+    status_code, mimetype, headers, body = result
+    return Response(body, status=status_code, content_type=mimetype, headers=headers)
+
+# ───────────────────────────────────────────────────────────── #
+# STARTUP
+# ───────────────────────────────────────────────────────────── #
+
+_init_lock = threading.Lock()
+_initialized = False
+
+def init_app(job_workers=None):
+    """
+    Starts this server process: loads and warms up the model (in a background thread unless
+    MODEL_LOAD_IN_BACKGROUND=0) and starts the job render threads, which take jobs off the shared
+    queue once the model is ready. Importing app does neither; `python app.py` and gunicorn's
+    post_worker_init hook (gunicorn.conf.py) call this once per process, later calls do nothing.
+
+    Args:
+        job_workers (int): render threads (JOB_WORKERS by default); 0 only enqueues and never
+                           opens the queue.
+    """
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        _initialized = True
+    if MODEL_LOAD_IN_BACKGROUND:
+        threading.Thread(target=startup, name="model-startup", daemon=True).start()
+    else:
+        startup()
+    job_workers = JOB_WORKERS if job_workers is None else job_workers
+    if job_workers:
+        get_job_queue().start_workers(run_job_request, job_workers, ready=lambda: get_model_status()["ready"])
 
 if __name__ == "__main__":
+    # The debug reloader serves from a child process (WERKZEUG_RUN_MAIN); the watcher needs no model
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        init_app()
     app.run(debug=True, host = "0.0.0.0", port = 5001)
@@ -0,0 +1,359 @@
+# 024
+
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from mask_codec import MASK_EXT, mask_to_bytes, mask_from_bytes
+
+# Root of the content-addressed store (files under <2 hex chars>/<digest><ext>, index in index.sqlite)
+ARTIFACT_STORE_DIR = os.environ.get("ARTIFACT_STORE_DIR", "../Floor-Overlay/artifacts")
+# Size budget of the stored files; least recently used artifacts are evicted beyond it
+ARTIFACT_STORE_MAX_BYTES = int(os.environ.get("ARTIFACT_STORE_MAX_BYTES", 2 * 1024 ** 3))
+# How often the background thread checks the budget
+ARTIFACT_EVICTION_INTERVAL_S = float(os.environ.get("ARTIFACT_EVICTION_INTERVAL_S", "60"))
+# What each route keeps, as "route=level" pairs, e.g. "overlayFloor=outputs,overlayCarpet=none".
+# Levels: "none", "outputs" (results and masks) or "all" (inputs as well). Routes not listed
+# keep "all", which covers what they used to write to inputRoom/, inputCarpet/, inputTile/, final_out/, ...
+ARTIFACT_PERSIST = os.environ.get("ARTIFACT_PERSIST", "")
+
+_DEFAULT_PERSIST = {"overlayCarpet": "all", "overlayFloor": "all", "overlayWall": "all", "overlayVideo": "all", "rooms": "all", "overlayBatch": "all"}
+PERSIST_LEVELS = ("none", "outputs", "all")
+
+# Eviction stops once the store is back under this share of the budget, so it does not run
+# again for every new artifact
+_EVICTION_TARGET = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    digest TEXT PRIMARY KEY,
+    ext TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS artifacts_accessed ON artifacts (accessed);
+CREATE TABLE IF NOT EXISTS links (
+    source TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    route TEXT,
+    created REAL NOT NULL,
+    PRIMARY KEY (source, kind, digest)
+);
+CREATE INDEX IF NOT EXISTS links_digest ON links (digest);
+"""
+
+def _parse_persist(setting):
+    levels = dict(_DEFAULT_PERSIST)
+    for pair in filter(None, (item.strip() for item in setting.split(","))):
+        route, _, level = pair.partition("=")
+        if level not in PERSIST_LEVELS:
+            raise ValueError(f"024 Unsupported artifact persistence level for {route}: {level!r}")
+        levels[route.strip().lstrip("/")] = level
+    return levels
+
+_persist_levels = _parse_persist(ARTIFACT_PERSIST)
+
+def persist_level(route):
+    """"none", "outputs" or "all" for a route name such as "overlayFloor"."""
+    return _persist_levels.get(route.lstrip("/"), "none")
+
+def content_digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def image_digest(image):
+    """Digest of an image's decoded pixels, so the same picture matches however it was encoded."""
+    pixels = np.ascontiguousarray(image)
+    digest = hashlib.blake2b(pixels.tobytes(), digest_size=16)
+    digest.update(str(pixels.shape).encode())
+    return digest.hexdigest()
+
+class ArtifactStore:
+    """
+    Content-addressed file store with an LRU size budget.
+
+    Files are named after the digest of their bytes, so identical inputs and outputs are kept
+    once however often they are uploaded. A sqlite index records each artifact's size and last
+    access, and links artifacts to the input images they were produced from (the pixel digest
+    of a room, carpet or design), which is how earlier masks and outputs are looked up. Several
+    threads and processes can share one store.
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or ARTIFACT_STORE_DIR
+        self.max_bytes = ARTIFACT_STORE_MAX_BYTES if max_bytes is None else max_bytes
+        os.makedirs(self.root, exist_ok=True)
+        self._local = threading.local()
+        self._stats = {"stored": 0, "deduplicated": 0, "evicted": 0}
+        self._stats_lock = threading.Lock()
+        self._eviction_thread = None
+        with self._db() as db:
+            db.executescript(_SCHEMA)
+
+    def _db(self):
+        # One connection per thread; WAL lets other workers read while one writes
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(os.path.join(self.root, "index.sqlite"), timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _file_path(self, digest, ext):
+        return os.path.join(self.root, digest[:2], digest + ext)
+
+    def _count(self, stat):
+        with self._stats_lock:
+            self._stats[stat] += 1
+
+    def put(self, data, ext, source=None, kind=None, route=None):
+        """
+        Stores bytes (once) and optionally links them to the input they were derived from.
+
+        Args:
+            data (bytes): file contents.
+            ext (str): file extension, e.g. ".png".
+            source (str): image_digest() of the input this artifact belongs to.
+            kind (str): what the artifact is for that input, e.g. "floor_mask" or "final_output".
+            route (str): route that produced it.
+
+        Returns:
+            str: digest of the bytes.
+        """
+        digest = content_digest(data)
+        path = self._file_path(digest, ext)
+        now = time.time()
+        if os.path.exists(path):
+            self._count("deduplicated")
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write under a private name and rename, so readers never see a partial file
+            partial_path = f"{path}.{uuid.uuid4().hex}.partial"
+            with open(partial_path, "wb") as f:
+                f.write(data)
+            os.replace(partial_path, path)
+            self._count("stored")
+        with self._db() as db:
+            db.execute(
+                "INSERT INTO artifacts (digest, ext, size, created, accessed) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (digest) DO UPDATE SET accessed = excluded.accessed",
+                (digest, ext, len(data), now, now),
+            )
+        if source is not None:
+            self.link(source, kind, digest, route)
+        return digest
+
+    def link(self, source, kind, digest, route=None):
+        """Records that artifact `digest` is the `kind` of input `source` (an image_digest())."""
+        with self._db() as db:
+            db.execute("INSERT OR IGNORE INTO links (source, kind, digest, route, created) VALUES (?, ?, ?, ?, ?)",
+                       (source, kind, digest, route, time.time()))
+
+    def put_image(self, image, ext=".png", source=None, kind=None, route=None, params=None):
+        """Encodes an image with OpenCV (`params` as for cv2.imencode) and stores it; returns its digest."""
+        ok, buffer = cv2.imencode(ext, image, params or [])
+        if not ok:
+            raise ValueError(f"024 Could not encode image as {ext}")
+        return self.put(buffer.tobytes(), ext, source=source, kind=kind, route=route)
+
+    def path(self, digest):
+        """File path of an artifact (marking it as used), or None if it is not in the store."""
+        db = self._db()
+        row = db.execute("SELECT ext FROM artifacts WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        path = self._file_path(digest, row[0])
+        with db:
+            if not os.path.exists(path):
+                # Evicted by another process between the lookup and now
+                db.execute("DELETE FROM artifacts WHERE digest = ?", (digest,))
+                return None
+            db.execute("UPDATE artifacts SET accessed = ? WHERE digest = ?", (time.time(), digest))
+        return path
+
+    def get(self, digest):
+        """Bytes of an artifact, or None."""
+        path = self.path(digest)
+        if path is None:
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def lookup(self, source, kind=None):
+        """
+        Artifacts previously produced from an input.
+
+        Args:
+            source (str): image_digest() of the input.
+            kind (str): only artifacts of this kind (e.g. "floor_mask").
+
+        Returns:
+            list: dicts with kind, digest, route, created and path, newest first.
+        """
+        query = ("SELECT links.kind, links.digest, links.route, links.created FROM links "
+                 "JOIN artifacts ON artifacts.digest = links.digest WHERE links.source = ?")
+        args = [source]
+        if kind is not None:
+            query += " AND links.kind = ?"
+            args.append(kind)
+        rows = self._db().execute(query + " ORDER BY links.created DESC", args).fetchall()
+        results = []
+        for kind, digest, route, created in rows:
+            path = self.path(digest)
+            if path is not None:
+                results.append({"kind": kind, "digest": digest, "route": route, "created": created, "path": path})
+        return results
+
+    def evict(self):
+        """Deletes least recently used artifacts until the store is back under its budget; returns how many."""
+        db = self._db()
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        target = self.max_bytes * _EVICTION_TARGET
+        evicted = 0
+        for digest, ext, size in db.execute("SELECT digest, ext, size FROM artifacts ORDER BY accessed").fetchall():
+            if total <= target:
+                break
+            # Index first: a concurrent path() then misses instead of returning a deleted file
+            with db:
+                db.execute("DELETE FROM artifacts WHERE digest = ?", (digest,))
+                db.execute("DELETE FROM links WHERE digest = ?", (digest,))
+            try:
+                os.remove(self._file_path(digest, ext))
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        with self._stats_lock:
+            self._stats["evicted"] += evicted
+        print(f"024 Evicted {evicted} artifacts, store now {total / 1024 ** 2:.0f} MB")
+        return evicted
+
+    def start_eviction(self, interval=None):
+        """Starts the background thread that enforces the size budget (once per store)."""
+        if self._eviction_thread is not None:
+            return
+        interval = ARTIFACT_EVICTION_INTERVAL_S if interval is None else interval
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.evict()
+                except Exception as e:
+                    print(f"024 Artifact eviction failed: {e}")
+
+        self._eviction_thread = threading.Thread(target=run, name="artifact-eviction", daemon=True)
+        self._eviction_thread.start()
+
+    def stats(self):
+        count, total = self._db().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        with self._stats_lock:
+            return dict(self._stats, artifacts=count, bytes=total, max_bytes=self.max_bytes)
+
+_store = None
+_store_lock = threading.Lock()
+# Encoding and writing artifacts happens off the request thread
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifact-writer")
+
+def get_store():
+    """The process-wide store under ARTIFACT_STORE_DIR, with background eviction running."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+            _store.start_eviction()
+        return _store
+
+def persist_request(route, inputs=None, outputs=None):
+    """
+    Stores what a route's persistence level asks for, in the background.
+
+    Every output is linked to every input, so store.lookup(image_digest(room), "floor_mask")
+    finds the masks of an earlier request for that room.
+
+    Args:
+        route (str): route name, e.g. "overlayFloor".
+        inputs (dict): kind -> BGR image (stored as JPEG) or (bytes, ext); stored with level "all".
+        outputs (dict): kind -> (BGR image or bytes, ext); stored with level "outputs" or "all".
+                        Binary masks given with ext MASK_EXT are stored as compact JSON RLE.
+
+    Returns:
+        Future or None: resolves to {kind: digest} of the stored artifacts.
+    """
+    level = persist_level(route)
+    if level == "none":
+        return None
+    inputs = inputs or {}
+    outputs = outputs or {}
+
+    def encoded(value, ext):
+        if isinstance(value, bytes):
+            return value
+        if ext == MASK_EXT:
+            return mask_to_bytes(value)
+        ok, buffer = cv2.imencode(ext, value)
+        if not ok:
+            raise ValueError(f"024 Could not encode {route} artifact as {ext}")
+        return buffer.tobytes()
+
+    def write():
+        store = get_store()
+        sources = {}
+        digests = {}
+        for kind, value in inputs.items():
+            data, ext = value if isinstance(value, tuple) else (None, ".jpg")
+            sources[kind] = content_digest(data) if data is not None else image_digest(value)
+            if level == "all":
+                digests[kind] = store.put(data if data is not None else encoded(value, ext), ext,
+                                          source=sources[kind], kind=kind, route=route)
+        for kind, (value, ext) in outputs.items():
+            digests[kind] = store.put(encoded(value, ext), ext)
+            for source in sources.values():
+                store.link(source, kind, digests[kind], route)
+        return digests
+
+    def report(future):
+        if future.exception() is not None:
+            print(f"024 Could not store artifacts of {route}: {future.exception()}")
+
+    future = _writer.submit(write)
+    future.add_done_callback(report)
+    return future
+
+def main():
+    # python artifact_store.py stats | evict | lookup <image path> | mask <digest> <output png>
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    store = ArtifactStore()
+    if command == "evict":
+        print(f"024 Evicted {store.evict()} artifacts")
+    elif command == "lookup" and len(sys.argv) > 2:
+        image = cv2.imread(sys.argv[2])
+        if image is None:
+            print(f"024 Could not read image at: {sys.argv[2]}")
+            return
+        for row in store.lookup(image_digest(image)):
+            print(row)
+    elif command == "mask" and len(sys.argv) > 3:
+        # Rasterises a stored RLE mask, e.g. a floor_mask digest from `lookup`
+        data = store.get(sys.argv[2])
+        if data is None:
+            print(f"024 No artifact {sys.argv[2]}")
+            return
+        cv2.imwrite(sys.argv[3], mask_from_bytes(data))
+        print(f"024 Wrote {sys.argv[3]}")
+    print(store.stats())
+
+if __name__ == "__main__":
+    main()
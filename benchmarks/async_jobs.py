@@ -0,0 +1,101 @@
+"""
+Synchronous renders against jobs: --requests /overlayFloor renders, sent by that many
+concurrent clients either as plain requests (each holds a server thread until its image is
+encoded) or with `Prefer: respond-async` (answered 202 at once, rendered by the JOB_WORKERS
+render threads of jobs.py and collected from /jobs/<id>).
+
+Reports how long a client waits for its response (the 202 for jobs), time to each result and
+results per second, and the per-stage times the jobs recorded. Every job result must match the
+synchronous response; the script exits non-zero otherwise.
+
+    python -m benchmarks.async_jobs --requests 8 --job-workers 2
+"""
+
+import argparse
+import base64
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from benchmarks.common import DESIGNS_DIR, ROOMS_DIR, list_images, summarize_ms
+
+
+def encoded(path):
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode("utf-8")
+
+
+def decoded(value):
+    return cv2.imdecode(np.frombuffer(base64.b64decode(value), np.uint8), cv2.IMREAD_UNCHANGED)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--job-workers", type=int, default=2)
+    parser.add_argument("--max-design-px", type=int, default=1024,
+                        help="skip larger sample designs (tiling them needs several GB)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("MODEL_LOAD_IN_BACKGROUND", "0")
+    os.environ.setdefault("JOB_DIR", tempfile.mkdtemp(prefix="jobs-"))
+    import app
+    app.init_app(job_workers=args.job_workers)
+    from floor_mask_model import clear_segmentation_cache
+
+    client = app.app.test_client()
+    rooms = list_images(ROOMS_DIR)
+    designs = [path for path in list_images(DESIGNS_DIR) if max(cv2.imread(path).shape[:2]) <= args.max_design_px]
+    payloads = [{"room_image": encoded(rooms[index % len(rooms)]), "design_image": encoded(designs[index % len(designs)])}
+                for index in range(args.requests)]
+    print(f"{args.requests} /overlayFloor renders on {os.cpu_count()} cores, {args.job_workers} job workers\n")
+    print(f"{'mode':<20}{'response p50 ms':>16}{'result p50 ms':>15}{'result max ms':>15}{'results/s':>11}")
+
+    def report(name, response_ms, result_ms, wall_s):
+        print(f"{name:<20}{summarize_ms(response_ms)['p50_ms']:>16.0f}{summarize_ms(result_ms)['p50_ms']:>15.0f}"
+              f"{max(result_ms):>15.0f}{len(result_ms) / wall_s:>11.2f}")
+
+    def sync(payload):
+        started = time.perf_counter()
+        result = client.post("/overlayFloor", json=payload).get_json()
+        elapsed = (time.perf_counter() - started) * 1000
+        return elapsed, elapsed, result
+
+    def async_job(payload):
+        started = time.perf_counter()
+        status_url = client.post("/overlayFloor", json=payload, headers={"Prefer": "respond-async"}).headers["Location"]
+        response_ms = (time.perf_counter() - started) * 1000
+        while True:
+            job = client.get(status_url).get_json()
+            if job["state"] in ("done", "failed"):
+                return response_ms, (time.perf_counter() - started) * 1000, job
+            time.sleep(0.05)
+
+    runs = {}
+    for name, run in (("synchronous", sync), ("jobs", async_job)):
+        clear_segmentation_cache()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.requests) as clients:
+            runs[name] = list(clients.map(run, payloads))
+        report(name, [run[0] for run in runs[name]], [run[1] for run in runs[name]], time.perf_counter() - started)
+
+    stages = defaultdict(list)
+    for _, _, job in runs["jobs"]:
+        for stage in job["stages"]:
+            stages[stage["stage"]].append(stage["ms"])
+    print("\njob stages (mean ms): " + ", ".join(f"{stage} {np.mean(ms):.0f}" for stage, ms in stages.items()))
+
+    mismatches = sum(job["state"] != "done" or not np.array_equal(decoded(result["final_output"]), decoded(job["result"]["final_output"]))
+                     for (_, _, result), (_, _, job) in zip(runs["synchronous"], runs["jobs"]))
+    print(f"mismatches: {mismatches}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+/overlayCarpet pipeline: the file-based path (every stage writes its result to disk and
+the next one reads it back) against the in-memory path the route now uses.
+
+Per-stage times are reported for both paths and both overlay types. The segmentation
+stage is included once per room; the second segmentation the disk path runs (inside
+place_on_black) is answered by the segmentation cache, as it is in the API. The last
+column is the mean absolute difference between the two transparent carpets, which
+comes from the JPEG round trips of the disk path.
+
+    python -m benchmarks.carpet_pipeline --repeats 3
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.common import CARPETS_DIR, ROOMS_DIR, list_images, summarize_ms
+
+OVERLAY_TYPES = ("ellipse", "trapezoid")
+
+
+class _Laps:
+    def __init__(self):
+        self.timings = {}
+        self.started = time.perf_counter()
+
+    def __call__(self, stage):
+        now = time.perf_counter()
+        self.timings[stage] = (now - self.started) * 1000
+        self.started = now
+
+
+def run_disk(room_bytes, carpet_bytes, overlay_type, temp_dir):
+    from carpet_circle import carpet_ellipse_and_center
+    from convert_binary import convert_to_binary_carpet
+    from floor_mask_model import segment_image
+    from mask_room_image import scale_room_image
+    from overlay import adjust_carpet_perspective, transparent_carpet_array
+    from scale_and_overlay import place_on_black
+
+    lap = _Laps()
+    room_path = os.path.join(temp_dir, "room.jpg")
+    carpet_path = os.path.join(temp_dir, "carpet.jpg")
+    cv2.imwrite(room_path, cv2.imdecode(room_bytes, cv2.IMREAD_COLOR))
+    cv2.imwrite(carpet_path, cv2.imdecode(carpet_bytes, cv2.IMREAD_COLOR))
+    lap("decode_inputs")
+    room_path = scale_room_image(room_path, temp_path=temp_dir)
+    lap("scale_room")
+    segment_image(room_path)
+    lap("segment")
+    if overlay_type == "ellipse":
+        shaped_path, _ = carpet_ellipse_and_center(carpet_path, temp_path=temp_dir)
+    else:
+        shaped_path = adjust_carpet_perspective(carpet_path, temp_path=temp_dir)
+    lap("shape_carpet")
+    on_black_path = place_on_black(room_path, shaped_path, temp_path=temp_dir)
+    lap("place_on_black")
+    binary_path = convert_to_binary_carpet(on_black_path, temp_path=temp_dir)
+    lap("binary_carpet")
+    transparent = transparent_carpet_array(cv2.imread(on_black_path), cv2.imread(binary_path, cv2.IMREAD_GRAYSCALE))
+    output_path = os.path.join(temp_dir, "transparent_carpet.png")
+    cv2.imwrite(output_path, transparent)
+    transparent = cv2.imread(output_path, cv2.IMREAD_UNCHANGED)
+    lap("transparency")
+    return transparent, lap.timings
+
+
+def run_memory(room_bytes, carpet_bytes, overlay_type):
+    from floor_mask_model import FLOOR_LABEL_ID, segment_image
+    from mask_room_image import scale_room_image_array
+    from overlay import apply_transparency_array
+
+    lap = _Laps()
+    room = cv2.imdecode(room_bytes, cv2.IMREAD_COLOR)
+    carpet = cv2.imdecode(carpet_bytes, cv2.IMREAD_COLOR)
+    lap("decode_inputs")
+    room = scale_room_image_array(room)
+    lap("scale_room")
+    segmentation = segment_image(room)
+    lap("segment")
+    stages = {}
+    transparent = apply_transparency_array(room, carpet, overlay_type=overlay_type,
+                                           floor_mask=segmentation.binary_mask(FLOOR_LABEL_ID), timings=stages)
+    lap.timings.update(stages)
+    return transparent, lap.timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--rooms", type=int, default=3, help="number of sample rooms to use")
+    args = parser.parse_args()
+
+    from floor_mask_model import load_model, clear_segmentation_cache
+    load_model()
+
+    def encoded(path):
+        return np.frombuffer(open(path, "rb").read(), dtype=np.uint8)
+
+    rooms = [encoded(path) for path in list_images(ROOMS_DIR)[:args.rooms]]
+    carpet = encoded(list_images(CARPETS_DIR)[0])
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Warm-up: first-call costs (allocations, OpenCV initialisation) are not part of either path
+        run_memory(rooms[0], carpet, "ellipse")
+        run_disk(rooms[0], carpet, "ellipse", temp_dir)
+
+        for overlay_type in OVERLAY_TYPES:
+            samples = {"disk": {}, "memory": {}}
+            diffs = []
+            for room in rooms:
+                for _ in range(args.repeats):
+                    for path in ("disk", "memory"):
+                        # Every run segments from scratch, like a request for a new room
+                        clear_segmentation_cache()
+                        if path == "disk":
+                            output, timings = run_disk(room, carpet, overlay_type, temp_dir)
+                        else:
+                            output, timings = run_memory(room, carpet, overlay_type)
+                        timings["total"] = sum(timings.values())
+                        for stage, ms in timings.items():
+                            samples[path].setdefault(stage, []).append(ms)
+                        if path == "disk":
+                            disk_output = output
+                    diffs.append(float(np.abs(disk_output.astype(np.int16) - output).mean()))
+
+            print(f"\n{overlay_type}  (mean |disk - memory| per channel: {np.mean(diffs):.2f})")
+            print(f"{'stage':<16}{'disk ms':>10}{'memory ms':>12}")
+            for stage in samples["disk"]:
+                disk_ms = summarize_ms(samples["disk"][stage])["mean_ms"]
+                memory_ms = summarize_ms(samples["memory"][stage])["mean_ms"]
+                print(f"{stage:<16}{disk_ms:>10.1f}{memory_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
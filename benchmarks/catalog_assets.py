@@ -0,0 +1,69 @@
+"""
+Per-request carpet/design preparation: an uploaded image against a registered catalog id.
+
+- upload: base64-decode the image and compute what the route needs from it (the carpet's
+  ellipse/trapezoid shape, the 5x-tiled design), as /overlayCarpet and /overlayFloor do;
+- catalog, cold: load the precomputed variant from disk (another worker registered it);
+- catalog, warm: the variant from the memory cache.
+
+Segmentation and compositing are the same either way and are left out.
+
+    python -m benchmarks.catalog_assets --repeats 10
+"""
+
+import argparse
+import base64
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.common import CARPETS_DIR, DESIGNS_DIR, list_images, summarize_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    from carpet_circle import carpet_circle_array, carpet_ellipse_and_center_array
+    from catalog import Catalog
+    from mask_room_image import tile_design_array
+    from overlay import adjust_carpet_perspective_array
+
+    decode = lambda data: cv2.imdecode(np.frombuffer(base64.b64decode(data), np.uint8), cv2.IMREAD_COLOR)
+    uploads = {
+        ("carpet", "ellipse"): lambda image: carpet_ellipse_and_center_array(carpet_circle_array(image)),
+        ("carpet", "trapezoid"): adjust_carpet_perspective_array,
+        ("design", "tiled"): tile_design_array,
+    }
+    sources = {"carpet": list_images(CARPETS_DIR)[0], "design": list_images(DESIGNS_DIR)[-1]}
+    payloads = {kind: base64.b64encode(open(path, "rb").read()) for kind, path in sources.items()}
+
+    with tempfile.TemporaryDirectory() as root:
+        catalog = Catalog(root=root)
+        ids = {kind: catalog.register(kind, decode(payload))["asset_id"] for kind, payload in payloads.items()}
+
+        def cold(kind, variant):
+            catalog._cache.clear()
+            catalog._cache_bytes = 0
+            catalog.load(kind, ids[kind], variant)
+
+        print(f"{'variant':<18}{'upload ms':>11}{'cold ms':>10}{'warm ms':>10}")
+        for (kind, variant), prepare in uploads.items():
+            timings = {}
+            for mode, run in (("upload", lambda: prepare(decode(payloads[kind]))),
+                              ("cold", lambda: cold(kind, variant)),
+                              ("warm", lambda: catalog.load(kind, ids[kind], variant))):
+                latencies = []
+                for _ in range(args.repeats):
+                    started = time.perf_counter()
+                    run()
+                    latencies.append((time.perf_counter() - started) * 1000)
+                timings[mode] = summarize_ms(latencies)["p50_ms"]
+            print(f"{kind + ' ' + variant:<18}{timings['upload']:>11.1f}{timings['cold']:>10.1f}{timings['warm']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
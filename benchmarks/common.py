@@ -0,0 +1,111 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks are run from the repository root as modules, e.g.
+    python -m benchmarks.inference_precision
+"""
+
+import http.server
+import os
+import resource
+import tempfile
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+ROOMS_DIR = "sample_images/rooms"
+DESIGNS_DIR = "sample_images/designs"
+CARPETS_DIR = "sample_images/carpets"
+
+FLOOR_LABEL_ID = 3
+
+
+def list_images(directory):
+    return sorted(
+        os.path.join(directory, f) for f in os.listdir(directory)
+        if f.lower().endswith((".jpg", ".jpeg", ".png"))
+    )
+
+
+def load_scaled_room(room_path):
+    """Returns the room as the API sees it: scaled by scale_room_image, as a PIL RGB image."""
+    from mask_room_image import scale_room_image
+    with tempfile.TemporaryDirectory() as temp_dir:
+        scaled_path = scale_room_image(room_path, temp_path=temp_dir)
+        return Image.open(scaled_path).convert("RGB")
+
+
+def class_mask(panoptic_map, segments_info, label_id=FLOOR_LABEL_ID):
+    """Boolean mask of every segment carrying the given ADE label."""
+    ids = [info["id"] for info in segments_info if info["label_id"] == label_id]
+    return np.isin(panoptic_map, ids)
+
+
+def iou(mask_a, mask_b):
+    union = np.logical_or(mask_a, mask_b).sum()
+    if union == 0:
+        return 1.0
+    return float(np.logical_and(mask_a, mask_b).sum() / union)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (Linux reports ru_maxrss in KB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def summarize_ms(samples):
+    samples = np.asarray(samples)
+    return {
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p90_ms": float(np.percentile(samples, 90)),
+    }
+
+
+def serve_images(images, delay_s=0.0):
+    """
+    Local stand-in for a catalog/CDN server: /<name> and /slow/<name> (after delay_s) serve
+    images[name] = (body, version) with an ETag and answer If-None-Match with 304.
+
+    Returns:
+        tuple: (server, {path: requests received})
+    """
+    hits = {}
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            hits[self.path] = hits.get(self.path, 0) + 1
+            if self.path.startswith("/slow/"):
+                time.sleep(delay_s)
+            name = self.path.rsplit("/", 1)[-1]
+            if name not in images:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body, version = images[name]
+            etag = f'"{version}"'
+            not_modified = self.headers.get("If-None-Match") == etag
+            self.send_response(304 if not_modified else 200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0" if not_modified else str(len(body)))
+            self.end_headers()
+            if not not_modified:
+                self.wfile.write(body)
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, hits
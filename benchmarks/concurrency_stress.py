@@ -0,0 +1,131 @@
+"""
+Concurrency stress test for threaded workers (gunicorn gthread, Flask threaded=True).
+
+Every request is first run serially to record its reference response. Then all of them
+are fired again, repeated and shuffled, from a thread pool against the same app. Each
+parallel response must match its serial counterpart: the same status and, after
+decoding, pixel-identical images. The segmentation cache is cleared between the passes,
+so the parallel pass also exercises concurrent forward passes. Exits non-zero on any
+mismatch or when a request leaves a scratch directory behind.
+
+    python -m benchmarks.concurrency_stress --threads 8 --rounds 3
+"""
+
+import argparse
+import base64
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from benchmarks.common import CARPETS_DIR, DESIGNS_DIR, ROOMS_DIR, list_images, summarize_ms
+
+
+def encoded(path):
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode("utf-8")
+
+
+def build_requests(room_count):
+    rooms = [encoded(path) for path in list_images(ROOMS_DIR)[:room_count]]
+    carpets = [encoded(path) for path in list_images(CARPETS_DIR)[:2]]
+    designs = [encoded(path) for path in list_images(DESIGNS_DIR)[-2:]]
+    requests = []
+    for room_index, room in enumerate(rooms):
+        for carpet_index, carpet in enumerate(carpets):
+            for overlay_type in ("ellipse", "trapezoid"):
+                requests.append((f"room{room_index}/carpet{carpet_index}/{overlay_type}", "/overlayCarpet",
+                                 {"room_image": room, "carpet_image": carpet, "overlay_type": overlay_type}))
+        for design_index, design in enumerate(designs):
+            requests.append((f"room{room_index}/design{design_index}/floor", "/overlayFloor",
+                             {"room_image": room, "design_image": design}))
+        requests.append((f"room{room_index}/paint/wall", "/overlayWall",
+                         {"room_image": room, "paint_color": "#8FA3B8"}))
+    return requests
+
+
+def decoded(response):
+    """Status plus the response body with every base64 image replaced by its pixels."""
+    body = response.get_json()
+    images = {}
+    for key, value in sorted(body.items()):
+        if isinstance(value, str) and len(value) > 1000:
+            images[key] = cv2.imdecode(np.frombuffer(base64.b64decode(value), np.uint8), cv2.IMREAD_UNCHANGED)
+        else:
+            images[key] = value
+    return response.status_code, images
+
+
+def same(reference, result):
+    if reference[0] != result[0] or reference[1].keys() != result[1].keys():
+        return False
+    for key, expected in reference[1].items():
+        actual = result[1][key]
+        if isinstance(expected, np.ndarray):
+            if not (isinstance(actual, np.ndarray) and expected.shape == actual.shape and np.array_equal(expected, actual)):
+                return False
+        elif expected != actual:
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3, help="times each request is repeated in the parallel pass")
+    parser.add_argument("--rooms", type=int, default=2)
+    args = parser.parse_args()
+
+    os.environ.setdefault("MODEL_LOAD_IN_BACKGROUND", "0")
+    import app
+    app.init_app(job_workers=0)
+    from floor_mask_model import clear_segmentation_cache
+    from temp_dirs import TEMP_ROOT
+
+    requests = build_requests(args.rooms)
+
+    def post(item):
+        name, route, payload = item
+        started = time.perf_counter()
+        # One test client per call: clients are cheap and not meant to be shared across threads
+        response = app.app.test_client().post(route, json=payload)
+        return name, decoded(response), (time.perf_counter() - started) * 1000
+
+    print(f"Serial pass: {len(requests)} requests")
+    references = {}
+    serial_ms = []
+    for item in requests:
+        name, result, elapsed = post(item)
+        references[name] = result
+        serial_ms.append(elapsed)
+        print(f"  {name:<32}{result[0]:>5}{elapsed:>10.0f} ms")
+
+    clear_segmentation_cache()
+    parallel_items = requests * args.rounds
+    random.Random(0).shuffle(parallel_items)
+    print(f"\nParallel pass: {len(parallel_items)} requests on {args.threads} threads")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(post, parallel_items))
+    wall_seconds = time.perf_counter() - started
+
+    mismatches = [name for name, result, _ in results if not same(references[name], result)]
+    leftovers = [entry for entry in os.listdir(TEMP_ROOT) if entry.startswith("req_")] if os.path.isdir(TEMP_ROOT) else []
+
+    serial = summarize_ms(serial_ms)
+    parallel = summarize_ms([elapsed for _, _, elapsed in results])
+    print(f"serial   mean {serial['mean_ms']:.0f} ms  p90 {serial['p90_ms']:.0f} ms")
+    print(f"parallel mean {parallel['mean_ms']:.0f} ms  p90 {parallel['p90_ms']:.0f} ms  "
+          f"({len(results) / wall_seconds:.2f} requests/s)")
+    print(f"mismatches: {len(mismatches)}  leftover scratch directories: {len(leftovers)}")
+    for name in sorted(set(mismatches)):
+        print(f"  MISMATCH {name}")
+    sys.exit(1 if mismatches or leftovers else 0)
+
+
+if __name__ == "__main__":
+    main()
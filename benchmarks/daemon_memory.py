@@ -0,0 +1,104 @@
+"""
+Per-node memory of N worker processes that each load the model, against the same N workers
+served by one inference daemon (INFERENCE_DAEMON_SOCKET).
+
+Every process segments one sample room before it is measured, so caches and allocator pools
+are populated. RSS double-counts pages shared between processes (shared libraries,
+memory-mapped weights); PSS splits them between the sharers and is the better estimate of
+what the node actually spends.
+
+    python -m benchmarks.daemon_memory --workers 4
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import ROOMS_DIR, list_images
+
+
+def run_child():
+    import floor_mask_model
+
+    floor_mask_model.startup()
+    floor_mask_model.segment_image(list_images(ROOMS_DIR)[0])
+    print("ready", flush=True)
+    sys.stdin.read()  # measured by the parent until it closes stdin
+
+
+def process_memory_mb(pid):
+    """(RSS, PSS) of a process in MB, from /proc/<pid>/smaps_rollup."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            fields = line.split()
+            if fields[0] in ("Rss:", "Pss:"):
+                values[fields[0]] = int(fields[1]) / 1024
+    return values["Rss:"], values["Pss:"]
+
+
+def start_worker(env):
+    worker = subprocess.Popen([sys.executable, "-m", "benchmarks.daemon_memory", "--child"], env=env,
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    while worker.stdout.readline().strip() != "ready":
+        if worker.poll() is not None:
+            raise RuntimeError("worker exited before becoming ready")
+    return worker
+
+
+def measure(processes):
+    totals = [process_memory_mb(process.pid) for process in processes]
+    return sum(rss for rss, _ in totals), sum(pss for _, pss in totals)
+
+
+def stop(processes):
+    for process in processes:
+        if process.stdin:
+            process.stdin.close()
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    env = {key: value for key, value in os.environ.items() if key != "INFERENCE_DAEMON_SOCKET"}
+    env["MODEL_LOAD_IN_BACKGROUND"] = "0"
+
+    print(f"Starting {args.workers} independent workers...")
+    workers = [start_worker(env) for _ in range(args.workers)]
+    independent = measure(workers)
+    stop(workers)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        daemon_env = dict(env, INFERENCE_DAEMON_SOCKET=os.path.join(temp_dir, "inference.sock"))
+        print(f"Starting the inference daemon and {args.workers} client workers...")
+        daemon = subprocess.Popen([sys.executable, "inference_daemon.py"], env=daemon_env, stdout=subprocess.DEVNULL)
+        try:
+            workers = [start_worker(daemon_env) for _ in range(args.workers)]
+            time.sleep(0.5)
+            shared = measure([daemon] + workers)
+            daemon_only = measure([daemon])
+            stop(workers)
+        finally:
+            stop([daemon])
+
+    print(f"\n{'setup':<34}{'RSS MB':>10}{'PSS MB':>10}")
+    print(f"{f'{args.workers} independent workers':<34}{independent[0]:>10.0f}{independent[1]:>10.0f}")
+    print(f"{f'daemon + {args.workers} client workers':<34}{shared[0]:>10.0f}{shared[1]:>10.0f}")
+    print(f"{'  of which the daemon':<34}{daemon_only[0]:>10.0f}{daemon_only[1]:>10.0f}")
+    print(f"{'saving':<34}{independent[0] - shared[0]:>10.0f}{independent[1] - shared[1]:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
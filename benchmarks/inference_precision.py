@@ -0,0 +1,88 @@
+"""
+Latency, peak RSS and floor-mask IoU of the CPU inference settings in floor_mask_model.
+
+Each configuration runs in its own subprocess so peak RSS is measured per setting.
+IoU is reported against the fp32 floor masks.
+
+    python -m benchmarks.inference_precision --repeats 3
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from benchmarks.common import ROOMS_DIR, class_mask, iou, list_images, load_scaled_room, peak_rss_mb, summarize_ms, timed
+
+CONFIGS = {
+    "fp32": ("fp32", False),
+    "fp32-channels-last": ("fp32", True),
+    "bf16": ("bf16", False),
+    "bf16-channels-last": ("bf16", True),
+}
+
+
+def run_config(name, out_dir, repeats):
+    import floor_mask_model
+
+    precision_mode, use_channels_last = CONFIGS[name]
+    floor_mask_model.load_model(precision_mode=precision_mode, use_channels_last=use_channels_last)
+
+    latencies = []
+    masks = {}
+    for room_path in list_images(ROOMS_DIR):
+        image = load_scaled_room(room_path)
+        # Warm-up run so one-time allocation is not counted
+        floor_mask_model.clear_segmentation_cache()
+        floor_mask_model.segment(image)
+        for _ in range(repeats):
+            floor_mask_model.clear_segmentation_cache()
+            (panoptic_map, segments_info), elapsed = timed(floor_mask_model.segment, image)
+            latencies.append(elapsed)
+        masks[os.path.basename(room_path)] = class_mask(panoptic_map, segments_info)
+
+    np.savez_compressed(os.path.join(out_dir, f"{name}.npz"), **masks)
+    with open(os.path.join(out_dir, f"{name}.json"), "w") as f:
+        json.dump({"latency": summarize_ms(latencies), "peak_rss_mb": peak_rss_mb()}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", nargs="+", default=list(CONFIGS), choices=list(CONFIGS))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_config(args.child, args.out, args.repeats)
+        return
+
+    configs = ["fp32"] + [name for name in args.configs if name != "fp32"]
+    with tempfile.TemporaryDirectory() as out_dir:
+        for name in configs:
+            print(f"Running {name}...")
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.inference_precision", "--child", name,
+                 "--out", out_dir, "--repeats", str(args.repeats)],
+                check=True,
+            )
+
+        reference = np.load(os.path.join(out_dir, "fp32.npz"))
+        print(f"\n{'config':<22}{'mean ms':>10}{'p50 ms':>10}{'p90 ms':>10}{'peak RSS MB':>14}{'min IoU':>10}{'mean IoU':>10}")
+        for name in configs:
+            with open(os.path.join(out_dir, f"{name}.json")) as f:
+                stats = json.load(f)
+            masks = np.load(os.path.join(out_dir, f"{name}.npz"))
+            ious = [iou(reference[room], masks[room]) for room in reference.files]
+            latency = stats["latency"]
+            print(f"{name:<22}{latency['mean_ms']:>10.0f}{latency['p50_ms']:>10.0f}{latency['p90_ms']:>10.0f}"
+                  f"{stats['peak_rss_mb']:>14.0f}{min(ious):>10.4f}{np.mean(ious):>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
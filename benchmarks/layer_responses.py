@@ -0,0 +1,96 @@
+"""
+"frame" against "layer" output layouts: bytes, server encode time and client decode +
+composite time of the overlay outputs, per output format.
+
+- carpet: room-sized transparent carpet vs its bounding-box crop and offset (/overlayCarpet);
+- floor: composited frame vs the floor texture layer, alpha = floor mask (/overlayFloor).
+
+Client time includes alpha-compositing every layer onto the room (the full-frame carpet as
+well; the composited floor frame needs none). The floor composite is checked against the
+frame output.
+Outputs are built on a synthetic floor mask (the lower part of each room), so no model is needed.
+
+    python -m benchmarks.layer_responses --rooms 3 --repeats 3
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.common import CARPETS_DIR, DESIGNS_DIR, ROOMS_DIR, list_images, load_scaled_room, summarize_ms
+
+FORMATS = ("png", "webp")
+
+
+def composite(room, layer, offset):
+    """Alpha-blends a BGRA layer onto the room at offset, as a front end would."""
+    x, y = offset
+    h, w = layer.shape[:2]
+    out = room.copy()
+    if layer.shape[2] == 3:
+        # WebP decoders drop an all-opaque alpha channel
+        out[y:y + h, x:x + w] = layer
+        return out
+    alpha = layer[:, :, 3:].astype(np.float32) / 255
+    region = out[y:y + h, x:x + w].astype(np.float32)
+    out[y:y + h, x:x + w] = np.round(layer[:, :, :3] * alpha + region * (1 - alpha)).astype(np.uint8)
+    return out
+
+
+def cases(room_paths):
+    """Yields (route, room, frame output, frame-sized layer)."""
+    from carpet_working import floor_texture_layer, overlay_texture_on_floor
+    from mask_room_image import tile_design_array
+    from overlay import apply_transparency_array
+
+    carpet = cv2.imread(list_images(CARPETS_DIR)[0])
+    design = tile_design_array(cv2.imread(list_images(DESIGNS_DIR)[-1]))
+    for room_path in room_paths:
+        room = cv2.cvtColor(np.asarray(load_scaled_room(room_path)), cv2.COLOR_RGB2BGR)
+        floor_mask = np.zeros(room.shape[:2], dtype=np.uint8)
+        floor_mask[int(room.shape[0] * 0.55):] = 255
+        transparent = apply_transparency_array(room, carpet, floor_mask=floor_mask)
+        yield "carpet", room, transparent, transparent
+        yield "floor", room, overlay_texture_on_floor(room, floor_mask, design), floor_texture_layer(floor_mask, design)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    from image_encoding import encode_image, output_encoding
+    from overlay import crop_layer
+
+    results = {}
+    for route, room, frame, layer in cases(list_images(ROOMS_DIR)[:args.rooms]):
+        cropped, offset = crop_layer(layer)
+        # The floor layer must composite back to the frame output exactly
+        if route == "floor" and not np.array_equal(composite(room, cropped, offset), frame):
+            raise SystemExit("floor layer does not composite to the frame output")
+        for output_format in FORMATS:
+            encoding = output_encoding({"output_format": output_format})
+            for layout, image in (("frame", frame), ("layer", cropped)):
+                stats = results.setdefault((route, output_format, layout), {"bytes": [], "encode": [], "client": []})
+                for _ in range(args.repeats):
+                    started = time.perf_counter()
+                    data = encode_image(image, encoding)
+                    stats["encode"].append((time.perf_counter() - started) * 1000)
+                    started = time.perf_counter()
+                    decoded = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+                    if route == "carpet" or layout == "layer":
+                        composite(room, decoded, offset if layout == "layer" else (0, 0))
+                    stats["client"].append((time.perf_counter() - started) * 1000)
+                stats["bytes"].append(len(data))
+
+    print(f"{'route':<8}{'format':<8}{'layout':<8}{'KB':>8}{'encode ms':>11}{'client ms':>11}")
+    for (route, output_format, layout), stats in results.items():
+        print(f"{route:<8}{output_format:<8}{layout:<8}{np.mean(stats['bytes']) / 1024:>8.0f}"
+              f"{summarize_ms(stats['encode'])['mean_ms']:>11.1f}{summarize_ms(stats['client'])['mean_ms']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Output encodings of the API responses: encode time, bytes and client decode time per format.
+
+The outputs are built like the routes build them, on a synthetic floor mask (the lower
+part of each room) so no model is needed:
+- transparent_carpet_image: the room-sized BGRA carpet of /overlayCarpet;
+- floor_mask_image: the red-on-black floor mask;
+- final_output: the /overlayFloor composite.
+
+JPEG cannot hold the carpet's alpha channel and is skipped for it.
+
+    python -m benchmarks.output_encoding --rooms 3 --repeats 3
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.common import CARPETS_DIR, DESIGNS_DIR, ROOMS_DIR, list_images, load_scaled_room, summarize_ms
+
+ENCODINGS = {
+    "png (default)": {"output_format": "png"},
+    "png level 1": {"output_format": "png", "png_compression": 1},
+    "png level 3": {"output_format": "png", "png_compression": 3},
+    "png level 6": {"output_format": "png", "png_compression": 6},
+    "jpeg q90": {"output_format": "jpeg", "output_quality": 90},
+    "jpeg q75": {"output_format": "jpeg", "output_quality": 75},
+    "webp q80": {"output_format": "webp", "output_quality": 80},
+    "webp q90": {"output_format": "webp", "output_quality": 90},
+    "webp lossless": {"output_format": "webp", "lossless": "true"},
+}
+
+
+def sample_outputs(room_paths):
+    from carpet_working import overlay_texture_on_floor
+    from mask_room_image import tile_design_array
+    from overlay import apply_transparency_array
+
+    carpet = cv2.imread(list_images(CARPETS_DIR)[0])
+    design = tile_design_array(cv2.imread(list_images(DESIGNS_DIR)[0]))
+    outputs = {"transparent_carpet_image": [], "floor_mask_image": [], "final_output": []}
+    for room_path in room_paths:
+        room = cv2.cvtColor(np.asarray(load_scaled_room(room_path)), cv2.COLOR_RGB2BGR)
+        floor_mask = np.zeros(room.shape[:2], dtype=np.uint8)
+        floor_mask[int(room.shape[0] * 0.55):] = 255
+        outputs["transparent_carpet_image"].append(apply_transparency_array(room, carpet, floor_mask=floor_mask))
+        red_mask = np.zeros_like(room)
+        red_mask[floor_mask > 0] = (0, 0, 255)
+        outputs["floor_mask_image"].append(red_mask)
+        outputs["final_output"].append(overlay_texture_on_floor(room, floor_mask, design))
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    from image_encoding import encode_image, output_encoding
+
+    outputs = sample_outputs(list_images(ROOMS_DIR)[:args.rooms])
+    for name, images in outputs.items():
+        print(f"\n{name} ({images[0].shape[1]}x{images[0].shape[0]}, {images[0].shape[2]} channels)")
+        print(f"{'encoding':<16}{'encode ms':>11}{'KB':>9}{'decode ms':>11}")
+        for label, options in ENCODINGS.items():
+            encoding = output_encoding(options)
+            if encoding["format"] == "jpeg" and images[0].shape[2] == 4:
+                continue
+            encode_ms, decode_ms, sizes = [], [], []
+            for image in images:
+                for _ in range(args.repeats):
+                    started = time.perf_counter()
+                    data = encode_image(image, encoding)
+                    encode_ms.append((time.perf_counter() - started) * 1000)
+                    started = time.perf_counter()
+                    cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+                    decode_ms.append((time.perf_counter() - started) * 1000)
+                sizes.append(len(data))
+            print(f"{label:<16}{summarize_ms(encode_ms)['mean_ms']:>11.1f}{np.mean(sizes) / 1024:>9.0f}"
+                  f"{summarize_ms(decode_ms)['mean_ms']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
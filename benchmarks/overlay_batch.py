@@ -0,0 +1,92 @@
+"""
+One room against many carpets and designs, as test_app.py renders them: a request per
+combination (room re-uploaded, re-decoded and re-segmented each time) against a single
+/overlayBatch request (segmented once, items composited on the batch pool and streamed).
+
+For each --workers count the batch pool is resized and the script reports wall time,
+time to the first streamed item and items per second. Every batch output must match its
+per-request counterpart; the script exits non-zero otherwise.
+
+    python -m benchmarks.overlay_batch --workers 1 2 4 8
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from benchmarks.common import CARPETS_DIR, DESIGNS_DIR, ROOMS_DIR, list_images
+
+
+def encoded(path):
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode("utf-8")
+
+
+def images_of(record):
+    return {key: cv2.imdecode(np.frombuffer(base64.b64decode(value), np.uint8), cv2.IMREAD_UNCHANGED)
+            for key, value in record.items() if isinstance(value, str) and len(value) > 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--room", type=int, default=0, help="index of the sample room")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 4])
+    parser.add_argument("--max-design-px", type=int, default=1024,
+                        help="skip larger sample designs (tiling them needs several GB)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("MODEL_LOAD_IN_BACKGROUND", "0")
+    import app
+    app.init_app(job_workers=0)
+    from floor_mask_model import clear_segmentation_cache
+
+    client = app.app.test_client()
+    room = encoded(list_images(ROOMS_DIR)[args.room])
+    items = [{"carpet_image": encoded(path), "overlay_type": overlay_type}
+             for path in list_images(CARPETS_DIR) for overlay_type in ("ellipse", "trapezoid")]
+    items += [{"design_image": encoded(path)} for path in list_images(DESIGNS_DIR)
+              if max(cv2.imread(path).shape[:2]) <= args.max_design_px]
+    print(f"{len(items)} items on {os.cpu_count()} cores\n")
+    print(f"{'mode':<26}{'wall ms':>10}{'first ms':>10}{'items/s':>9}")
+
+    references = []
+    started = time.perf_counter()
+    for item in items:
+        clear_segmentation_cache()
+        route = "/overlayCarpet" if "carpet_image" in item else "/overlayFloor"
+        references.append(images_of(client.post(route, json={"room_image": room, **item}).get_json()))
+        if len(references) == 1:
+            first_ms = (time.perf_counter() - started) * 1000
+    wall_ms = (time.perf_counter() - started) * 1000
+    print(f"{'one request per item':<26}{wall_ms:>10.0f}{first_ms:>10.0f}{len(items) / wall_ms * 1000:>9.2f}")
+
+    mismatches = 0
+    for workers in args.workers:
+        app.batch_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="overlay-batch")
+        clear_segmentation_cache()
+        started = time.perf_counter()
+        response = client.post("/overlayBatch", json={"room_image": room, "items": items}, buffered=False)
+        first_ms = None
+        for line in response.response:
+            record = json.loads(line)
+            if "index" not in record:
+                continue
+            first_ms = first_ms or (time.perf_counter() - started) * 1000
+            result = images_of(record)
+            reference = references[record["index"]]
+            mismatches += not (record["status"] == 200 and all(np.array_equal(reference[key], result[key]) for key in result))
+        wall_ms = (time.perf_counter() - started) * 1000
+        print(f"{f'/overlayBatch, {workers} workers':<26}{wall_ms:>10.0f}{first_ms:>10.0f}{len(items) / wall_ms * 1000:>9.2f}")
+    print(f"mismatches: {mismatches}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Panoptic vs semantic post-processing on the sample rooms.
+
+The forward pass is run once per room; both post-processing paths are timed on the same model
+outputs (the semantic floor mask includes its upsampling to full resolution). Masks are compared
+by IoU and by the fraction of pixels that agree exactly.
+
+    python -m benchmarks.postprocess_modes --repeats 3
+"""
+
+import argparse
+import os
+
+import numpy as np
+import torch
+
+from benchmarks.common import FLOOR_LABEL_ID, ROOMS_DIR, class_mask, iou, list_images, load_scaled_room, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    import floor_mask_model
+
+    floor_mask_model.load_model()
+
+    def semantic_floor(outputs, image):
+        label_map, segments_info = floor_mask_model._postprocess_semantic(outputs)
+        return floor_mask_model.upsample_mask(class_mask(label_map, segments_info, FLOOR_LABEL_ID), image)
+
+    def panoptic_floor(outputs, image):
+        panoptic_map, segments_info = floor_mask_model._postprocess_panoptic(outputs, image.size[::-1])
+        return class_mask(panoptic_map, segments_info, FLOOR_LABEL_ID)
+
+    print(f"\n{'room':<14}{'panoptic ms':>13}{'semantic ms':>13}{'speedup':>9}{'IoU':>8}{'equal px':>10}")
+    speedups, ious, agreement = [], [], []
+    for room_path in list_images(ROOMS_DIR):
+        image = load_scaled_room(room_path)
+        inputs = floor_mask_model.feature_extractor(images=image, return_tensors="pt").to(floor_mask_model.device)
+        outputs = floor_mask_model._run_model(inputs["pixel_values"], inputs["pixel_mask"])
+
+        with torch.inference_mode():
+            panoptic_times, semantic_times = [], []
+            for _ in range(args.repeats):
+                panoptic, elapsed = timed(panoptic_floor, outputs, image)
+                panoptic_times.append(elapsed)
+                semantic, elapsed = timed(semantic_floor, outputs, image)
+                semantic_times.append(elapsed)
+
+        panoptic_ms, semantic_ms = np.median(panoptic_times), np.median(semantic_times)
+        room_iou = iou(panoptic, semantic)
+        equal = float((panoptic == semantic).mean())
+        speedups.append(panoptic_ms / semantic_ms)
+        ious.append(room_iou)
+        agreement.append(equal)
+        print(f"{os.path.basename(room_path):<14}{panoptic_ms:>13.0f}{semantic_ms:>13.0f}{panoptic_ms / semantic_ms:>8.1f}x"
+              f"{room_iou:>8.4f}{equal:>10.4f}")
+
+    print(f"\n{'mean':<14}{'':>26}{np.mean(speedups):>8.1f}x{np.mean(ious):>8.4f}{np.mean(agreement):>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
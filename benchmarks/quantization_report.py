@@ -0,0 +1,68 @@
+"""
+fp32 vs dynamic int8 MaskFormer on the sample rooms.
+
+For every room it reports the floor-mask IoU, the drift of the floor centroid used to place
+carpets (find_centroid.largest_contour_centroid) and the speedup of the int8 backend.
+
+    python -m benchmarks.quantization_report --repeats 3
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from benchmarks.common import ROOMS_DIR, class_mask, iou, list_images, load_scaled_room, timed
+from find_centroid import largest_contour_centroid
+
+
+def run(quantization_mode, rooms, repeats):
+    import floor_mask_model
+
+    floor_mask_model.load_model(precision_mode="fp32", quantization_mode=quantization_mode)
+    results = {}
+    for room_path, image in rooms:
+        floor_mask_model.clear_segmentation_cache()
+        floor_mask_model.segment(image)  # warm-up
+        latencies = []
+        for _ in range(repeats):
+            floor_mask_model.clear_segmentation_cache()
+            (panoptic_map, segments_info), elapsed = timed(floor_mask_model.segment, image)
+            latencies.append(elapsed)
+        floor = class_mask(panoptic_map, segments_info)
+        results[room_path] = (floor, float(np.median(latencies)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    rooms = [(room_path, load_scaled_room(room_path)) for room_path in list_images(ROOMS_DIR)]
+    fp32 = run("none", rooms, args.repeats)
+    int8 = run("int8", rooms, args.repeats)
+
+    print(f"\n{'room':<14}{'IoU':>8}{'drift px':>10}{'fp32 ms':>10}{'int8 ms':>10}{'speedup':>9}")
+    ious, drifts, speedups = [], [], []
+    for room_path, _ in rooms:
+        fp32_mask, fp32_ms = fp32[room_path]
+        int8_mask, int8_ms = int8[room_path]
+        fp32_center = largest_contour_centroid(fp32_mask.astype(np.uint8) * 255)
+        int8_center = largest_contour_centroid(int8_mask.astype(np.uint8) * 255)
+        if fp32_center is None or int8_center is None:
+            drift = float("nan") if fp32_center != int8_center else 0.0
+        else:
+            drift = float(np.hypot(fp32_center[0] - int8_center[0], fp32_center[1] - int8_center[1]))
+        room_iou = iou(fp32_mask, int8_mask)
+        ious.append(room_iou)
+        drifts.append(drift)
+        speedups.append(fp32_ms / int8_ms)
+        print(f"{os.path.basename(room_path):<14}{room_iou:>8.4f}{drift:>10.1f}{fp32_ms:>10.0f}{int8_ms:>10.0f}{fp32_ms / int8_ms:>8.2f}x")
+
+    print(f"\n{'mean':<14}{np.mean(ious):>8.4f}{np.nanmean(drifts):>10.1f}{'':>20}{np.mean(speedups):>8.2f}x")
+    print(f"{'worst':<14}{min(ious):>8.4f}{np.nanmax(drifts):>10.1f}{'':>20}{min(speedups):>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
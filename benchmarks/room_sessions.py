@@ -0,0 +1,101 @@
+"""
+Trying many carpets and designs on one room: per-render latency of the overlay routes when
+every request uploads the room (scaled and segmented each time) against a `room_id` session
+(POST /rooms once), optionally with catalog ids for the carpets and designs as well.
+
+Each carpet is rendered as an ellipse and a trapezoid; each design on the floor. The segmentation
+cache is cleared before every room_image request, as for a room the worker has not seen.
+Outputs with a room_id must be pixel-identical to the room_image ones; the script exits
+non-zero otherwise, or when the p50 render with ids exceeds --target-ms.
+
+    python -m benchmarks.room_sessions --target-ms 200
+"""
+
+import argparse
+import base64
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.common import CARPETS_DIR, DESIGNS_DIR, ROOMS_DIR, list_images, summarize_ms
+
+
+def encoded(path):
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode("utf-8")
+
+
+def images_of(body):
+    return {key: cv2.imdecode(np.frombuffer(base64.b64decode(value), np.uint8), cv2.IMREAD_UNCHANGED)
+            for key, value in body.items() if isinstance(value, str) and len(value) > 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--room", type=int, default=0, help="index of the sample room")
+    parser.add_argument("--output-format", default="png")
+    parser.add_argument("--max-design-px", type=int, default=1024,
+                        help="skip larger sample designs (tiling them needs several GB)")
+    parser.add_argument("--target-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault("MODEL_LOAD_IN_BACKGROUND", "0")
+    import app
+    app.init_app(job_workers=0)
+    from floor_mask_model import clear_segmentation_cache
+
+    client = app.app.test_client()
+    room = encoded(list_images(ROOMS_DIR)[args.room])
+    carpets = [encoded(path) for path in list_images(CARPETS_DIR)]
+    designs = [encoded(path) for path in list_images(DESIGNS_DIR)
+               if max(cv2.imread(path).shape[:2]) <= args.max_design_px]
+
+    started = time.perf_counter()
+    room_id = client.post("/rooms", json={"room_image": room}).get_json()["room_id"]
+    print(f"POST /rooms: {(time.perf_counter() - started) * 1000:.0f} ms")
+    carpet_ids = [client.post("/catalog/carpets", json={"image": carpet}).get_json()["asset_id"] for carpet in carpets]
+    design_ids = [client.post("/catalog/designs", json={"image": design}).get_json()["asset_id"] for design in designs]
+
+    renders = []
+    for carpet, carpet_id in zip(carpets, carpet_ids):
+        for overlay_type in ("ellipse", "trapezoid"):
+            renders.append(("/overlayCarpet", {"carpet_image": carpet, "overlay_type": overlay_type},
+                            {"carpet_id": carpet_id, "overlay_type": overlay_type}))
+    for design, design_id in zip(designs, design_ids):
+        renders.append(("/overlayFloor", {"design_image": design}, {"design_id": design_id}))
+
+    def post(route, payload):
+        started = time.perf_counter()
+        response = client.post(route, json=dict(payload, output_format=args.output_format))
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != 200:
+            raise SystemExit(f"{route} returned {response.status_code}: {response.get_json()}")
+        return images_of(response.get_json()), elapsed
+
+    latencies = {"room_image": [], "room_id": [], "room_id + asset ids": []}
+    mismatches = 0
+    for route, upload, ids in renders:
+        clear_segmentation_cache()
+        reference, elapsed = post(route, {"room_image": room, **upload})
+        latencies["room_image"].append(elapsed)
+        for mode, payload in (("room_id", {"room_id": room_id, **upload}), ("room_id + asset ids", {"room_id": room_id, **ids})):
+            post(route, payload)  # loads the session and catalog variants into this worker's memory
+            result, elapsed = post(route, payload)
+            latencies[mode].append(elapsed)
+            same = reference.keys() == result.keys() and all(np.array_equal(reference[key], result[key]) for key in reference)
+            mismatches += not same
+
+    print(f"{len(renders)} renders ({len(carpets)} carpets x 2 shapes, {len(designs)} designs), output_format={args.output_format}\n")
+    print(f"{'mode':<22}{'mean ms':>10}{'p50 ms':>9}{'p90 ms':>9}{'max ms':>9}")
+    for mode, values in latencies.items():
+        stats = summarize_ms(values)
+        print(f"{mode:<22}{stats['mean_ms']:>10.0f}{stats['p50_ms']:>9.0f}{stats['p90_ms']:>9.0f}{max(values):>9.0f}")
+    print(f"mismatches: {mismatches}")
+    sys.exit(1 if mismatches or summarize_ms(latencies["room_id + asset ids"])["p50_ms"] > args.target_ms else 0)
+
+
+if __name__ == "__main__":
+    main()
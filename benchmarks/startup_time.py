@@ -0,0 +1,90 @@
+"""
+Cold-start time of the API: importing app.py, time until /ping reports ready, and the
+latency of the first /overlayFloor request.
+
+Each run is a fresh interpreter (as a new container would be), so the numbers include
+module imports, weight loading (snapshot or hub, see MODEL_SNAPSHOT_DIR) and warm-up.
+Pass --max-ready-ms to exit non-zero when time-to-ready regresses past a budget.
+
+    python -m benchmarks.startup_time --runs 3
+"""
+
+import argparse
+import base64
+import json
+import subprocess
+import sys
+import time
+
+from benchmarks.common import DESIGNS_DIR, ROOMS_DIR, list_images, summarize_ms
+
+
+def run_child():
+    started = time.perf_counter()
+    import app
+    import_ms = (time.perf_counter() - started) * 1000
+    # No job workers: a benchmark process must not take jobs off the queue of a server on this host
+    app.init_app(job_workers=0)
+
+    client = app.app.test_client()
+    while True:
+        response = client.get("/ping")
+        if response.status_code == 200:
+            break
+        if response.get_json().get("stage") == "failed":
+            raise RuntimeError(f"Model failed to load: {response.get_json()}")
+        time.sleep(0.05)
+    ready_ms = (time.perf_counter() - started) * 1000
+
+    def encoded(path):
+        with open(path, "rb") as f:
+            return base64.b64encode(f.read()).decode("utf-8")
+
+    payload = {"room_image": encoded(list_images(ROOMS_DIR)[0]), "design_image": encoded(list_images(DESIGNS_DIR)[0])}
+    request_started = time.perf_counter()
+    response = client.post("/overlayFloor", json=payload)
+    first_request_ms = (time.perf_counter() - request_started) * 1000
+    if response.status_code != 200:
+        raise RuntimeError(f"/overlayFloor returned {response.status_code}: {response.get_json()}")
+
+    status = client.get("/ping").get_json()
+    print(json.dumps({
+        "import_ms": import_ms,
+        "ready_ms": ready_ms,
+        "first_request_ms": first_request_ms,
+        "load_ms": status.get("load_seconds", 0) * 1000,
+        "warm_up_ms": status.get("warm_up_seconds", 0) * 1000,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-ready-ms", type=float, help="fail if the median time-to-ready exceeds this")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    results = []
+    for run in range(args.runs):
+        print(f"Run {run + 1}/{args.runs}...")
+        output = subprocess.run([sys.executable, "-m", "benchmarks.startup_time", "--child"],
+                                check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"\n{'stage':<22}{'mean ms':>10}{'p50 ms':>10}{'p90 ms':>10}")
+    for stage in ("import_ms", "load_ms", "warm_up_ms", "ready_ms", "first_request_ms"):
+        summary = summarize_ms([result[stage] for result in results])
+        print(f"{stage[:-3]:<22}{summary['mean_ms']:>10.0f}{summary['p50_ms']:>10.0f}{summary['p90_ms']:>10.0f}")
+
+    if args.max_ready_ms is not None:
+        ready_p50 = summarize_ms([result["ready_ms"] for result in results])["p50_ms"]
+        if ready_p50 > args.max_ready_ms:
+            sys.exit(f"Time-to-ready p50 {ready_p50:.0f} ms exceeds budget {args.max_ready_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
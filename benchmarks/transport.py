@@ -0,0 +1,136 @@
+"""
+Request/response transport of the overlay routes: base64 JSON against multipart uploads,
+raw image bodies and binary (image or multipart) responses.
+
+Traffic follows test_app.py: each room against the carpets (ellipse and trapezoid) and
+the designs. The API runs in this process behind a real HTTP server, so the numbers
+include the socket transfer, request parsing and response encoding. Latency is measured
+on the client, from building the request to having every returned image decoded.
+For raw bodies the room is the body and the carpet or design is fetched by the API from
+a local static file server, as a catalog URL would be.
+
+    python -m benchmarks.transport --rooms 3 --repeats 2
+"""
+
+import argparse
+import base64
+import email.parser
+import functools
+import http.server
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+import requests
+
+from benchmarks.common import CARPETS_DIR, DESIGNS_DIR, ROOMS_DIR, list_images, summarize_ms
+
+TRANSPORTS = ("json -> json", "multipart -> multipart", "multipart -> image", "raw -> image")
+
+
+def _serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def decode_png(data):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+
+
+def decode_response(transport, response):
+    """Decodes every image in the response, as a client would before using it."""
+    if transport.endswith("json"):
+        body = response.json()
+        return [decode_png(base64.b64decode(value)) for key, value in body.items() if key != "status"]
+    if transport.endswith("multipart"):
+        header = f"Content-Type: {response.headers['Content-Type']}\r\n\r\n".encode()
+        message = email.parser.BytesParser().parsebytes(header + response.content)
+        return [decode_png(part.get_payload(decode=True)) for part in message.get_payload()]
+    return [decode_png(response.content)]
+
+
+def send(session, api_url, static_url, transport, route, room_path, other_field, other_path, options):
+    """Returns (request bytes, response bytes, latency ms)."""
+    started = time.perf_counter()
+    url = f"{api_url}/{route}"
+    if transport.startswith("json"):
+        def encoded(path):
+            with open(path, "rb") as f:
+                return base64.b64encode(f.read()).decode("utf-8")
+        prepared = requests.Request("POST", url, json={"room_image": encoded(room_path), other_field: encoded(other_path),
+                                                       **options}).prepare()
+    elif transport.startswith("multipart"):
+        response_format = transport.split(" -> ")[1]
+        with open(room_path, "rb") as room, open(other_path, "rb") as other:
+            prepared = requests.Request("POST", url, files={"room_image": room.read(), other_field: other.read()},
+                                        data=dict(options, response_format=response_format)).prepare()
+    else:
+        with open(room_path, "rb") as room:
+            params = dict(options, response_format="image", **{other_field: f"{static_url}/{other_path}"})
+            prepared = requests.Request("POST", url, data=room.read(), params=params,
+                                        headers={"Content-Type": "image/jpeg"}).prepare()
+    response = session.send(prepared)
+    response.raise_for_status()
+    decode_response(transport, response)
+    elapsed = (time.perf_counter() - started) * 1000
+    return len(prepared.body), len(response.content), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=2)
+    args = parser.parse_args()
+
+    os.environ.setdefault("MODEL_LOAD_IN_BACKGROUND", "0")
+    os.environ.setdefault("ARTIFACT_PERSIST", "overlayFloor=none,overlayCarpet=none")
+    from werkzeug.serving import make_server
+    import app
+    app.init_app(job_workers=0)
+
+    api = _serve(make_server("127.0.0.1", 0, app.app, threaded=True))
+    static_handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=os.getcwd())
+    static_handler.log_message = lambda *args: None
+    static = _serve(http.server.ThreadingHTTPServer(("127.0.0.1", 0), static_handler))
+    api_url = f"http://127.0.0.1:{api.server_port}"
+    static_url = f"http://127.0.0.1:{static.server_port}"
+
+    rooms = list_images(ROOMS_DIR)[:args.rooms]
+    carpets = list_images(CARPETS_DIR)[:2]
+    designs = list_images(DESIGNS_DIR)[-2:]
+    traffic = []
+    for room in rooms:
+        for carpet in carpets:
+            for overlay_type in ("ellipse", "trapezoid"):
+                traffic.append(("overlayCarpet", room, "carpet_image", carpet, {"overlay_type": overlay_type}))
+        for design in designs:
+            traffic.append(("overlayFloor", room, "design_image", design, {}))
+
+    session = requests.Session()
+    # Warm-up: segment every room once, so all transports hit the segmentation cache alike
+    for item in traffic:
+        send(session, api_url, static_url, "multipart -> image", *item)
+
+    print(f"{len(traffic)} requests x {args.repeats} per transport\n")
+    print(f"{'transport':<26}{'request KB':>12}{'response KB':>13}{'mean ms':>10}{'p50 ms':>9}{'p90 ms':>9}")
+    for transport in TRANSPORTS:
+        request_bytes, response_bytes, latencies = [], [], []
+        for _ in range(args.repeats):
+            for item in traffic:
+                sent, received, elapsed = send(session, api_url, static_url, transport, *item)
+                request_bytes.append(sent)
+                response_bytes.append(received)
+                latencies.append(elapsed)
+        latency = summarize_ms(latencies)
+        print(f"{transport:<26}{np.mean(request_bytes) / 1024:>12.0f}{np.mean(response_bytes) / 1024:>13.0f}"
+              f"{latency['mean_ms']:>10.0f}{latency['p50_ms']:>9.0f}{latency['p90_ms']:>9.0f}")
+
+    api.shutdown()
+    static.shutdown()
+
+
+if __name__ == "__main__":
+    main()
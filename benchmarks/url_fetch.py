@@ -0,0 +1,79 @@
+"""
+URL inputs: the old per-request `requests.get` download against the pooled, concurrent,
+cached fetcher of image_fetch.py.
+
+A local server stands in for the catalog/CDN and adds --latency-ms before every response
+(/slow/<name>). Each "request" loads a room and a carpet/design URL, as /overlayCarpet and
+/overlayFloor do:
+- sequential requests.get: a new connection per image, one image after the other;
+- fetcher, cold: both images at once over pooled connections, nothing cached;
+- fetcher, revalidate: cached images past their freshness, answered with 304;
+- fetcher, warm: cached images still fresh, no request at all.
+
+    python -m benchmarks.url_fetch --requests 20 --latency-ms 50
+"""
+
+import argparse
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import requests
+
+from benchmarks.common import CARPETS_DIR, ROOMS_DIR, list_images, serve_images, summarize_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    from image_fetch import ImageFetcher
+
+    with open(list_images(ROOMS_DIR)[0], "rb") as room, open(list_images(CARPETS_DIR)[0], "rb") as carpet:
+        images = {"room.jpg": (room.read(), 1), "carpet.jpg": (carpet.read(), 1)}
+    server, hits = serve_images(images, delay_s=args.latency_ms / 1000)
+    urls = {name: f"http://127.0.0.1:{server.server_port}/slow/{name}" for name in images}
+
+    def sequential():
+        for url in urls.values():
+            response = requests.get(url, stream=True)
+            response.raise_for_status()
+            cv2.imdecode(np.frombuffer(response.content, np.uint8), cv2.IMREAD_COLOR)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        fetcher = ImageFetcher(cache_dir=cache_dir)
+
+        def cold():
+            fetcher._cache.clear()
+            fetcher._cache_bytes = 0
+            fetcher.cache_dir = ""
+            fetcher.fetch_images(urls)
+            fetcher.cache_dir = cache_dir
+
+        def revalidate():
+            for entry in fetcher._cache.values():
+                entry.expires = 0
+            fetcher.fetch_images(urls)
+
+        fetcher.fetch_images(urls)
+        print(f"{args.requests} requests x {len(urls)} URLs, {args.latency_ms:.0f} ms server latency\n")
+        print(f"{'mode':<24}{'mean ms':>10}{'p50 ms':>9}{'p90 ms':>9}{'server hits':>13}")
+        for name, run in (("sequential requests.get", sequential), ("fetcher, cold", cold),
+                          ("fetcher, revalidate", revalidate), ("fetcher, warm", lambda: fetcher.fetch_images(urls))):
+            before = sum(hits.values())
+            latencies = []
+            for _ in range(args.requests):
+                started = time.perf_counter()
+                run()
+                latencies.append((time.perf_counter() - started) * 1000)
+            stats = summarize_ms(latencies)
+            print(f"{name:<24}{stats['mean_ms']:>10.1f}{stats['p50_ms']:>9.1f}{stats['p90_ms']:>9.1f}"
+                  f"{sum(hits.values()) - before:>13}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
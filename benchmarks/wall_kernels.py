@@ -0,0 +1,93 @@
+"""
+Wall overlay kernels: the numba kernels in wall_kernels.py against the vectorized
+NumPy/OpenCV versions in wall_overlay.py.
+
+Each setup runs in its own process. numba is measured twice against a fresh cache
+directory: the first process compiles the kernels and the second loads them from the
+cache, which is what every later worker does. The "startup" column is the cost of
+importing wall_overlay (including that compile or cache load). No request pays it.
+Outputs are compared against the vectorized result.
+
+Wall masks are synthetic (the upper part of each room), so no model is needed.
+
+    python -m benchmarks.wall_kernels --repeats 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.common import DESIGNS_DIR, ROOMS_DIR, list_images, load_scaled_room, summarize_ms, timed
+
+SETUPS = {
+    "numba (compile)": "numba",
+    "numba (cached)": "numba",
+    "vectorized": "vectorized",
+}
+
+
+def run_child(kernels, out_path, repeats):
+    os.environ["WALL_KERNELS"] = kernels
+    started = time.perf_counter()
+    import wall_overlay
+    startup_ms = (time.perf_counter() - started) * 1000
+
+    design = cv2.imread(list_images(DESIGNS_DIR)[0])
+    latencies = []
+    outputs = {}
+    for room_path in list_images(ROOMS_DIR):
+        room = cv2.cvtColor(np.asarray(load_scaled_room(room_path)), cv2.COLOR_RGB2BGR)
+        wall_mask = np.zeros(room.shape[:2], dtype=np.uint8)
+        wall_mask[: int(room.shape[0] * 0.55)] = 255
+        for _ in range(repeats):
+            output, elapsed = timed(wall_overlay.overlay_wall, room, wall_mask, design)
+            latencies.append(elapsed)
+        outputs[os.path.basename(room_path)] = output
+
+    np.savez_compressed(out_path + ".npz", **outputs)
+    with open(out_path + ".json", "w") as f:
+        json.dump({"startup_ms": startup_ms, "latency": summarize_ms(latencies)}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.out, args.repeats)
+        return
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        env = dict(os.environ, NUMBA_CACHE_DIR=os.path.join(out_dir, "numba_cache"))
+        for index, (name, kernels) in enumerate(SETUPS.items()):
+            print(f"Running {name}...")
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.wall_kernels", "--child", kernels,
+                 "--out", os.path.join(out_dir, str(index)), "--repeats", str(args.repeats)],
+                check=True, env=env,
+            )
+
+        reference = np.load(os.path.join(out_dir, f"{list(SETUPS).index('vectorized')}.npz"))
+        print(f"\n{'kernels':<18}{'startup ms':>12}{'mean ms':>10}{'p50 ms':>10}{'p90 ms':>10}{'max |diff|':>12}")
+        for index, name in enumerate(SETUPS):
+            with open(os.path.join(out_dir, f"{index}.json")) as f:
+                stats = json.load(f)
+            outputs = np.load(os.path.join(out_dir, f"{index}.npz"))
+            max_diff = max(int(np.abs(reference[room].astype(np.int16) - outputs[room]).max()) for room in reference.files)
+            latency = stats["latency"]
+            print(f"{name:<18}{stats['startup_ms']:>12.0f}{latency['mean_ms']:>10.1f}{latency['p50_ms']:>10.1f}"
+                  f"{latency['p90_ms']:>10.1f}{max_diff:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Latency / accuracy trade-off of SEGMENTATION_WORKING_SIZE.
+
+For each working size the sample rooms are segmented and the floor mask is upsampled to full
+resolution with floor_mask_model.upsample_mask(). IoU is measured against the full-resolution
+floor mask (working size 0).
+
+    python -m benchmarks.working_size --sizes 0 1280 960 768 640 480
+"""
+
+import argparse
+
+import numpy as np
+
+from benchmarks.common import ROOMS_DIR, class_mask, iou, list_images, load_scaled_room, summarize_ms, timed
+
+
+def floor_mask_at(floor_mask_model, image):
+    panoptic_map, segments_info = floor_mask_model.segment(image)
+    return floor_mask_model.upsample_mask(class_mask(panoptic_map, segments_info), image)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 1280, 960, 768, 640, 480])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    import floor_mask_model
+
+    floor_mask_model.load_model()
+    rooms = [load_scaled_room(room_path) for room_path in list_images(ROOMS_DIR)]
+
+    reference = None
+    print(f"\n{'working size':<14}{'mean ms':>10}{'p50 ms':>10}{'p90 ms':>10}{'mean IoU':>10}{'min IoU':>10}")
+    for size in [0] + [size for size in args.sizes if size != 0]:
+        floor_mask_model.SEGMENTATION_WORKING_SIZE = size
+        latencies, masks = [], []
+        for image in rooms:
+            floor_mask_model.clear_segmentation_cache()
+            floor_mask_at(floor_mask_model, image)  # warm-up
+            for _ in range(args.repeats):
+                floor_mask_model.clear_segmentation_cache()
+                mask, elapsed = timed(floor_mask_at, floor_mask_model, image)
+                latencies.append(elapsed)
+            masks.append(mask)
+        if reference is None:
+            reference = masks
+        ious = [iou(a, b) for a, b in zip(reference, masks)]
+        latency = summarize_ms(latencies)
+        label = str(size) if size else "full"
+        print(f"{label:<14}{latency['mean_ms']:>10.0f}{latency['p50_ms']:>10.0f}{latency['p90_ms']:>10.0f}"
+              f"{np.mean(ious):>10.4f}{min(ious):>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
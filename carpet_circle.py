@@ -3,19 +3,19 @@
 import os
 import cv2
 import numpy as np
-import pandas as pd
 # from scale_and_overlay import scale_carpet
 
-def carpet_circle(carpet_img_path, temp_path="../Floor-Overlay/temporary"):
-    # scaled_carpet_img_path = scale_carpet(room_img_path, carpet_img_path)
-    # scaled_carpet_img = cv2.imread(scaled_carpet_img_path)
-    
-    carpet_img = cv2.imread(carpet_img_path)
-    
-    # Error handling for missing file
-    if carpet_img is None:
-        raise FileNotFoundError(f"Could not read image at path: {carpet_img_path}")
-    
+def carpet_circle_array(carpet_img):
+    """
+    In-memory counterpart of carpet_circle(): the largest centred circle of the carpet,
+    cropped to its bounding box, black outside the circle.
+
+    Args:
+        carpet_img (np.ndarray): BGR carpet image.
+
+    Returns:
+        np.ndarray: BGR circle crop.
+    """
     height, width = carpet_img.shape[:2]
 
     # Add alpha channel if missing
@@ -43,7 +43,19 @@ def carpet_circle(carpet_img_path, temp_path="../Floor-Overlay/temporary"):
     rgb[mask] = [0, 0, 0]  # Set transparent pixels to black
 
     # Final image is RGB (drop alpha)
-    cropped_rgb = rgb
+    return np.ascontiguousarray(rgb)
+
+def carpet_circle(carpet_img_path, temp_path="../Floor-Overlay/temporary"):
+    # scaled_carpet_img_path = scale_carpet(room_img_path, carpet_img_path)
+    # scaled_carpet_img = cv2.imread(scaled_carpet_img_path)
+    
+    carpet_img = cv2.imread(carpet_img_path)
+    
+    # Error handling for missing file
+    if carpet_img is None:
+        raise FileNotFoundError(f"Could not read image at path: {carpet_img_path}")
+
+    cropped_rgb = carpet_circle_array(carpet_img)
 
     # Ensure output directory exists
     os.makedirs(temp_path, exist_ok=True)
@@ -54,9 +66,17 @@ def carpet_circle(carpet_img_path, temp_path="../Floor-Overlay/temporary"):
 
     return cropped_carpet_path
 
-def carpet_ellipse_and_center(carpet_img_path, temp_path="../Floor-Overlay/temporary"):
-    cropped_carpet_path = carpet_circle(carpet_img_path)
-    img = cv2.imread(cropped_carpet_path, cv2.IMREAD_UNCHANGED)
+def carpet_ellipse_and_center_array(img):
+    """
+    In-memory counterpart of carpet_ellipse_and_center(): warps a circle crop into a floor-
+    perspective ellipse.
+
+    Args:
+        img (np.ndarray): circle crop from carpet_circle_array() (BGR, or BGRA).
+
+    Returns:
+        tuple: (ellipse image as BGR, black outside the ellipse, (cx, cy) of the ellipse).
+    """
     height, width = img.shape[:2]
 
     # Parameters to control horizontal perspective distortion
@@ -124,7 +144,14 @@ def carpet_ellipse_and_center(carpet_img_path, temp_path="../Floor-Overlay/tempo
         rgb_channels = warped[:, :, :3]
         mask = alpha_channel == 0
         rgb_channels[mask] = [0, 0, 0]  # Set transparent pixels to black
-        warped = rgb_channels  # Drop alpha
+        warped = np.ascontiguousarray(rgb_channels)  # Drop alpha
+
+    return warped, center
+
+def carpet_ellipse_and_center(carpet_img_path, temp_path="../Floor-Overlay/temporary"):
+    cropped_carpet_path = carpet_circle(carpet_img_path, temp_path=temp_path)
+    img = cv2.imread(cropped_carpet_path, cv2.IMREAD_UNCHANGED)
+    warped, center = carpet_ellipse_and_center_array(img)
 
     output_name = "carpet_ellipse.jpg"
     carpet_ellipse_path = os.path.join(temp_path, output_name)
@@ -33,9 +33,17 @@ def order_points(pts):
     rect[0], rect[1], rect[2], rect[3] = top_left, top_right, bottom_right, bottom_left
     return rect
 
+def _read_image(image, flags=cv2.IMREAD_COLOR):
+    """Returns arrays unchanged and reads paths with cv2.imread."""
+    if isinstance(image, np.ndarray):
+        return image
+    return cv2.imread(image, flags)
+
 def find_floor_contour(mask_path):
-    """Finds the largest contour in the given binary mask image."""
-    mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+    """Finds the largest contour in the given binary mask image (path, or grayscale/BGR array)."""
+    mask = _read_image(mask_path, cv2.IMREAD_GRAYSCALE)
+    if mask.ndim == 3:
+        mask = cv2.cvtColor(mask, cv2.COLOR_BGR2GRAY)
     _, binary_mask = cv2.threshold(mask, 40, 255, cv2.THRESH_BINARY)
     contours, _ = cv2.findContours(binary_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     if not contours:
@@ -45,6 +53,20 @@ def find_floor_contour(mask_path):
     approx = cv2.convexHull(largest_contour)
     return approx.reshape(-1, 2), binary_mask
 
+def floor_geometry(mask_path):
+    """
+    Room-only inputs of the floor homography, which every design rendered on the room shares.
+
+    Returns:
+        dict: {"contour": convex hull of the largest floor contour (N x 2), "corners": its
+        order_points() corners, "binary_mask": the thresholded mask}, or None without a contour.
+    """
+    contour = find_floor_contour(mask_path)
+    if contour is None:
+        return
+    corners, binary_mask = contour
+    return {"contour": corners, "corners": order_points(corners), "binary_mask": binary_mask}
+
 def apply_homography(tile_img, ordered_corners, mask_shape):
     """Applies homography to warp the tile image onto the detected floor area."""
     tile_h, tile_w = tile_img.shape[:2]
@@ -52,23 +74,57 @@ def apply_homography(tile_img, ordered_corners, mask_shape):
     H, _ = cv2.findHomography(src_pts, ordered_corners)
     return cv2.warpPerspective(tile_img, H, (mask_shape[1], mask_shape[0]))
 
-def overlay_texture_on_floor(original_image, mask_path, tile_path):
-    """Overlays a tile texture onto the detected floor area of an image."""
-    corners, binary_mask = find_floor_contour(mask_path)
-    if corners is None:
+def _floor_texture(mask_path, tile_path, geometry=None):
+    """Frame-sized warped tile texture and the binary floor mask it covers, or None without a floor contour."""
+    geometry = geometry or floor_geometry(mask_path)
+    if geometry is None:
         return
-    ordered_corners = order_points(corners)
-    original_image = cv2.imread(original_image)
-    tile = cv2.imread(tile_path)
+    ordered_corners, binary_mask = geometry["corners"], geometry["binary_mask"]
+    tile = _read_image(tile_path)
     tiled_image = np.tile(tile, (2, 2, 1))
     warped_tile = apply_homography(tiled_image, ordered_corners, binary_mask.shape)
     carpet_mask = cv2.bitwise_not(cv2.cvtColor(warped_tile, cv2.COLOR_BGR2GRAY))
     uncovered_mask = cv2.bitwise_and(binary_mask, cv2.threshold(carpet_mask, 250, 255, cv2.THRESH_BINARY)[1])
     resized_mask = cv2.resize(tiled_image, (uncovered_mask.shape[1], uncovered_mask.shape[0]))
     tresult = np.where(uncovered_mask[:, :, None] == 255, resized_mask, warped_tile)
+    return tresult, binary_mask
+
+def overlay_texture_on_floor(original_image, mask_path, tile_path, geometry=None):
+    """
+    Overlays a tile texture onto the detected floor area of an image.
+    Each argument may be a file path or an already decoded array (BGR image, uint8 mask).
+    A precomputed floor_geometry() of the mask skips the contour search.
+    """
+    texture = _floor_texture(mask_path, tile_path, geometry)
+    if texture is None:
+        return
+    tresult, binary_mask = texture
+    original_image = _read_image(original_image)
     final_result = np.where(binary_mask[:, :, None] == 255, tresult, original_image)
     return final_result
 
+def floor_texture_layer(mask_path, tile_path, geometry=None):
+    """
+    The floor texture of overlay_texture_on_floor() as a layer, without compositing it.
+
+    Args:
+        mask_path: floor mask (file path, or grayscale/BGR array).
+        tile_path: tile texture (file path or BGR array).
+        geometry (dict): precomputed floor_geometry() of the mask.
+
+    Returns:
+        np.ndarray: frame-sized BGRA layer whose alpha is the floor mask (texture pixels are
+        zeroed outside it), or None when no floor contour is found. Alpha-blending it over the
+        room gives overlay_texture_on_floor()'s output.
+    """
+    texture = _floor_texture(mask_path, tile_path, geometry)
+    if texture is None:
+        return
+    tresult, binary_mask = texture
+    layer = cv2.merge([*cv2.split(tresult), binary_mask])
+    layer[binary_mask == 0] = 0
+    return layer
+
 def main():
     mask_path = "D:/Quleep/Prototype/Code/mask_output/demo1.jpg"
     tile_path = "D:/Quleep/Prototype/Code/Data/floor4.jpg"
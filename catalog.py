@@ -0,0 +1,269 @@
+# 028
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from carpet_circle import carpet_circle_array, carpet_ellipse_and_center_array
+from mask_codec import MASK_EXT, mask_to_bytes, mask_from_bytes
+from mask_room_image import tile_design_array
+from overlay import adjust_carpet_perspective_array
+
+# Registered carpets and designs: <CATALOG_DIR>/<kind>s/<asset_id>/ holds meta.json and the
+# precomputed variants. Shared by every worker on the host.
+CATALOG_DIR = os.environ.get("CATALOG_DIR", "../Floor-Overlay/catalog")
+# Memory budget of decoded variants (LRU). A 5x-tiled design is 25x its source, so this is
+# what keeps tiling off the request path for the designs in use.
+CATALOG_CACHE_MAX_BYTES = int(os.environ.get("CATALOG_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+ASSET_KINDS = ("carpet", "design")
+# Starts with a letter or digit, so "." and ".." never name the kind directory or the root
+_ASSET_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+# Variants are computed at registration and stored (lossless PNG, masks as RLE), except these:
+# a tiled PNG is 25x the source and slower to decode than np.tile, so "tiled" is derived from
+# the source when first loaded and kept in the memory cache
+DERIVED_VARIANTS = {"design": {"tiled": tile_design_array}}
+# overlay_type accepted by the carpet routes -> carpet variant
+CARPET_SHAPES = {"ellipse": "ellipse", "e": "ellipse", "trapezoid": "trapezoid", "t": "trapezoid"}
+
+class UnknownAsset(KeyError):
+    """The asset id is not registered, or has no such variant."""
+
+def _shape_mask(shaped):
+    """Alpha mask (255 on the carpet) of a shaped carpet on black."""
+    return (cv2.cvtColor(shaped, cv2.COLOR_BGR2GRAY) > 0).astype(np.uint8) * 255
+
+def carpet_variants(carpet):
+    """
+    Room-independent shapes of a carpet, as apply_transparency_array() would compute them.
+
+    Args:
+        carpet (np.ndarray): BGR carpet image.
+
+    Returns:
+        tuple: ({variant: array}, {"ellipse_center": [cx, cy]})
+    """
+    ellipse, center = carpet_ellipse_and_center_array(carpet_circle_array(carpet))
+    trapezoid = adjust_carpet_perspective_array(carpet)
+    variants = {"source": carpet, "ellipse": ellipse, "trapezoid": trapezoid,
+                "ellipse_mask": _shape_mask(ellipse), "trapezoid_mask": _shape_mask(trapezoid)}
+    return variants, {"ellipse_center": [int(center[0]), int(center[1])]}
+
+class Catalog:
+    """
+    Carpets and designs registered once and addressed by asset id.
+
+    register() decodes the asset, computes every room-independent variant and writes them
+    next to a meta.json; load() returns a variant from the memory cache or, on a miss, reads
+    it from disk, so assets registered through one worker are usable by all. Safe to use from
+    several threads.
+    """
+
+    def __init__(self, root=None, cache_max_bytes=None):
+        self.root = root or CATALOG_DIR
+        self.cache_max_bytes = CATALOG_CACHE_MAX_BYTES if cache_max_bytes is None else cache_max_bytes
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+        for kind in ASSET_KINDS:
+            os.makedirs(self._kind_dir(kind), exist_ok=True)
+
+    def _kind_dir(self, kind):
+        if kind not in ASSET_KINDS:
+            raise ValueError(f"028 Unknown asset kind: {kind}")
+        return os.path.join(self.root, kind + "s")
+
+    def _asset_dir(self, kind, asset_id):
+        # fullmatch: `$` would also accept a trailing newline
+        if not isinstance(asset_id, str) or not _ASSET_ID.fullmatch(asset_id):
+            raise ValueError(f"028 Invalid asset id: {asset_id!r} (1-64 of A-Z a-z 0-9 _ . -, starting with a letter or digit)")
+        kind_dir = self._kind_dir(kind)
+        path = os.path.join(kind_dir, asset_id)
+        # register() and delete() replace and remove this directory; it must be an entry of the kind directory
+        if os.path.dirname(os.path.realpath(path)) != os.path.realpath(kind_dir):
+            raise ValueError(f"028 Invalid asset id: {asset_id!r}")
+        return path
+
+    def register(self, kind, image, asset_id=None):
+        """
+        Registers (or replaces) an asset and precomputes its variants.
+
+        Args:
+            kind (str): "carpet" or "design".
+            image (np.ndarray): decoded BGR image.
+            asset_id (str): id to address it by; the content digest when omitted, which makes
+                            registering the same image twice a no-op.
+
+        Returns:
+            dict: the asset's metadata (asset_id, kind, digest, size, variants, ...).
+        """
+        digest = hashlib.blake2b(np.ascontiguousarray(image).tobytes(), digest_size=16).hexdigest()
+        asset_id = asset_id or digest
+        asset_dir = self._asset_dir(kind, asset_id)
+        existing = self.info(kind, asset_id)
+        if existing is not None and existing["digest"] == digest:
+            return existing
+
+        started = time.perf_counter()
+        if kind == "carpet":
+            variants, extra = carpet_variants(image)
+        else:
+            variants, extra = {"source": image}, {}
+        meta = {"asset_id": asset_id, "kind": kind, "digest": digest, "size": [image.shape[1], image.shape[0]],
+                "variants": sorted([*variants, *DERIVED_VARIANTS.get(kind, {})]), "registered": time.time(), **extra}
+
+        # Built in a scratch directory and renamed into place, so readers never see half an asset
+        scratch = os.path.join(self._kind_dir(kind), f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(scratch)
+        try:
+            for name, array in variants.items():
+                if name.endswith("_mask"):
+                    data = mask_to_bytes(array)
+                    path = os.path.join(scratch, name + MASK_EXT)
+                else:
+                    data = cv2.imencode(".png", array)[1].tobytes()
+                    path = os.path.join(scratch, name + ".png")
+                with open(path, "wb") as f:
+                    f.write(data)
+            with open(os.path.join(scratch, "meta.json"), "w") as f:
+                json.dump(meta, f)
+            if os.path.isdir(asset_dir):
+                stale = os.path.join(self._kind_dir(kind), f".old-{uuid.uuid4().hex}")
+                os.replace(asset_dir, stale)
+                shutil.rmtree(stale, ignore_errors=True)
+            os.replace(scratch, asset_dir)
+        except BaseException:
+            shutil.rmtree(scratch, ignore_errors=True)
+            raise
+        print(f"028 Registered {kind} {asset_id} in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return meta
+
+    def info(self, kind, asset_id):
+        """Metadata of a registered asset, or None."""
+        try:
+            with open(os.path.join(self._asset_dir(kind, asset_id), "meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def load(self, kind, asset_id, variant="source"):
+        """
+        A variant of a registered asset.
+
+        Args:
+            kind (str): "carpet" or "design".
+            asset_id (str): id given to (or returned by) register().
+            variant (str): e.g. "source", "ellipse", "trapezoid", "tiled", "ellipse_mask".
+
+        Returns:
+            np.ndarray: read-only array shared with other callers (copy before modifying).
+
+        Raises:
+            UnknownAsset: the asset is not registered or has no such variant.
+        """
+        meta = self.info(kind, asset_id)
+        if meta is None:
+            raise UnknownAsset(f"028 Unknown {kind} id: {asset_id}")
+        if variant not in meta["variants"]:
+            raise UnknownAsset(f"028 {kind} {asset_id} has no variant {variant!r}; available: {meta['variants']}")
+        # The digest is part of the key, so re-registering an id (from any worker) is picked up
+        key = (kind, asset_id, meta["digest"], variant)
+        with self._lock:
+            array = self._cache.get(key)
+            if array is not None:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                return array
+            self._stats["misses"] += 1
+
+        derived = DERIVED_VARIANTS.get(kind, {}).get(variant)
+        if derived is not None:
+            array = derived(self.load(kind, asset_id, "source"))
+        else:
+            array = self._read_variant(kind, asset_id, variant)
+        array.flags.writeable = False
+        self._remember(key, array)
+        return array
+
+    def _read_variant(self, kind, asset_id, variant):
+        asset_dir = self._asset_dir(kind, asset_id)
+        if variant.endswith("_mask"):
+            with open(os.path.join(asset_dir, variant + MASK_EXT), "rb") as f:
+                return mask_from_bytes(f.read())
+        array = cv2.imread(os.path.join(asset_dir, variant + ".png"), cv2.IMREAD_UNCHANGED)
+        if array is None:
+            raise UnknownAsset(f"028 Could not read {kind} {asset_id} variant {variant}")
+        return array
+
+    def _remember(self, key, array):
+        if array.nbytes > self.cache_max_bytes:
+            return
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = array
+            self._cache_bytes += array.nbytes
+            while self._cache_bytes > self.cache_max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= evicted.nbytes
+
+    def delete(self, kind, asset_id):
+        """Removes an asset; returns whether it existed."""
+        asset_dir = self._asset_dir(kind, asset_id)
+        if not os.path.isdir(asset_dir):
+            return False
+        shutil.rmtree(asset_dir, ignore_errors=True)
+        with self._lock:
+            for key in [key for key in self._cache if key[:2] == (kind, asset_id)]:
+                self._cache_bytes -= self._cache.pop(key).nbytes
+        return True
+
+    def list(self, kind):
+        return sorted(name for name in os.listdir(self._kind_dir(kind)) if not name.startswith("."))
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._cache), cache_bytes=self._cache_bytes,
+                        **{kind + "s": len(self.list(kind)) for kind in ASSET_KINDS})
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog():
+    """Process-wide Catalog."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = Catalog()
+        return _catalog
+
+def main():
+    # python catalog.py register carpet|design <image> [asset_id] | info carpet|design <asset_id> | list carpet|design
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    catalog = get_catalog()
+    if command == "register" and len(sys.argv) > 3:
+        image = cv2.imread(sys.argv[3])
+        if image is None:
+            print(f"028 Could not read image at: {sys.argv[3]}")
+            return
+        print(catalog.register(sys.argv[2], image, sys.argv[4] if len(sys.argv) > 4 else None))
+    elif command == "info" and len(sys.argv) > 3:
+        print(catalog.info(sys.argv[2], sys.argv[3]))
+    else:
+        for kind in ASSET_KINDS:
+            print(f"{kind}s: {catalog.list(kind)}")
+
+if __name__ == "__main__":
+    main()
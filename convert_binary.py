@@ -2,26 +2,32 @@
 
 import os
 import cv2
-from mask_room_image import mask
+import numpy as np
+from mask_room_image import mask_array
 
-def convert_to_binary_mask(room_image_path, temp_path="../Floor-Overlay/temporary"):
-    # Get the mask image path
-    mask_image_path = mask(room_image_path)
-    
-    if not mask_image_path:
+def convert_to_binary_mask_array(room_image):
+    """
+    Binary (0/255) floor mask of a room image, as an array.
+
+    The mask comes straight from the model, so unlike the old JPEG-based path it needs no
+    blur/re-threshold to clean up compression artifacts.
+
+    Args:
+        room_image: BGR array or path of the (scaled) room image.
+
+    Returns:
+        np.ndarray: (H, W) uint8 mask, or None if no floor is found.
+    """
+    binary_mask = mask_array(room_image)
+    if binary_mask is None:
         print("012 Masking failed. Exiting...")
+    return binary_mask
+
+def convert_to_binary_mask(room_image_path, temp_path="../Floor-Overlay/temporary"):
+    binary_mask = convert_to_binary_mask_array(room_image_path)
+    if binary_mask is None:
         return None
     
-    # Read the mask image
-    mask_image = cv2.imread(mask_image_path, cv2.IMREAD_GRAYSCALE)
-    if mask_image is None:
-        print("012 Failed to read mask image. Exiting...")
-        return None
-    
-    # Convert the mask to binary (thresholding)
-    blurred_mask = cv2.GaussianBlur(mask_image, (5, 5), 0)
-    _, binary_mask = cv2.threshold(blurred_mask, 1, 255, cv2.THRESH_BINARY)
-    
     # Define output directory and filename
     temp_output_dir = temp_path
     os.makedirs(temp_output_dir, exist_ok=True)
@@ -35,16 +41,35 @@ def convert_to_binary_mask(room_image_path, temp_path="../Floor-Overlay/temporar
     
     return binary_mask_path
 
+def convert_to_binary_carpet_array(carpet_image):
+    """
+    In-memory counterpart of convert_to_binary_carpet(): 255 wherever the carpet-on-black image
+    is not black.
+
+    Args:
+        carpet_image (np.ndarray): BGR or grayscale carpet on black.
+
+    Returns:
+        np.ndarray: (H, W) uint8 mask.
+    """
+    if carpet_image.ndim == 3:
+        carpet_image = cv2.cvtColor(carpet_image, cv2.COLOR_BGR2GRAY)
+    # Convert the carpet image to binary (thresholding)
+    blurred_carpet = cv2.GaussianBlur(carpet_image, (5, 5), 0)
+    _, binary_carpet = cv2.threshold(blurred_carpet, 1, 255, cv2.THRESH_BINARY)
+    return binary_carpet
+
 def convert_to_binary_carpet(carpet_img_path, temp_path="../Floor-Overlay/temporary"):
     # Read the carpet image
-    carpet_image = cv2.imread(carpet_img_path, cv2.IMREAD_GRAYSCALE)
+    if isinstance(carpet_img_path, np.ndarray):
+        carpet_image = carpet_img_path
+    else:
+        carpet_image = cv2.imread(carpet_img_path, cv2.IMREAD_GRAYSCALE)
     if carpet_image is None:
         print("012 Failed to read carpet image. Exiting...")
         return None
-    
-    # Convert the carpet image to binary (thresholding)
-    blurred_carpet = cv2.GaussianBlur(carpet_image, (5, 5), 0)
-    _, binary_carpet = cv2.threshold(blurred_carpet, 1, 255, cv2.THRESH_BINARY)
+
+    binary_carpet = convert_to_binary_carpet_array(carpet_image)
 
     # Define output directory and filename
     temp_output_dir = temp_path
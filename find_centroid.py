@@ -3,41 +3,49 @@
 import cv2
 import numpy as np
 import os
-from mask_room_image import mask
+from mask_room_image import mask_array
 
-def find_and_mark_floor_center(room_img_path, temp_path="../Floor-Overlay/temporary"):
-    masked_image_path = mask(room_img_path)
-    # Load the masked image
-    image = cv2.imread(masked_image_path)
-    
-    # Convert image to HSV color space
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    
-    # Define lower and upper bounds for red color (adjust if needed)
-    lower_red1 = np.array([0, 120, 70])
-    upper_red1 = np.array([10, 255, 255])
-    lower_red2 = np.array([170, 120, 70])
-    upper_red2 = np.array([180, 255, 255])
+def largest_contour_centroid(binary_mask):
+    """
+    Centroid of the largest external contour in a binary mask, taken to be the floor.
 
-    # Create masks to detect red color
-    mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
-    mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
-    red_mask = mask1 + mask2  # Combine both masks
+    Returns:
+        tuple: (cx, cy) in pixels, or None if the mask is empty.
+    """
+    contours, _ = cv2.findContours(binary_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    largest_contour = max(contours, key=cv2.contourArea)
+    M = cv2.moments(largest_contour)
+    if M["m00"] == 0:
+        return None
+    return int(M["m10"] / M["m00"]), int(M["m01"] / M["m00"])
 
-    # Find contours of the red mask
-    contours, _ = cv2.findContours(red_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+def find_and_mark_floor_center(room_img_path, temp_path="../Floor-Overlay/temporary", floor_mask=None, save_marked_image=True):
+    """
+    Finds the centre of the floor in a room image.
 
-    if contours:
-        # Find the largest contour assuming it's the floor
-        largest_contour = max(contours, key=cv2.contourArea)
-        
-        # Compute the centroid of the contour
-        M = cv2.moments(largest_contour)
-        if M["m00"] != 0:
-            cx = int(M["m10"] / M["m00"])
-            cy = int(M["m01"] / M["m00"])
-            
-            # Draw the center point on the image
+    Args:
+        room_img_path: path or BGR array of the (scaled) room image.
+        temp_path (str): directory for the marked mask image.
+        floor_mask (np.ndarray): precomputed uint8 floor mask; segmentation is skipped when given.
+        save_marked_image (bool): also write the floor mask with the centre marked to temp_path.
+
+    Returns:
+        tuple: (cx, cy) of the floor centroid, or None if no floor is found.
+    """
+    if floor_mask is None:
+        # The mask comes straight from the model, no JPEG round trip or red thresholding
+        floor_mask = mask_array(room_img_path)
+
+    center = largest_contour_centroid(floor_mask) if floor_mask is not None else None
+    if center:
+        cx, cy = center
+
+        if save_marked_image:
+            # Draw the center point on the red mask image
+            image = np.zeros(floor_mask.shape + (3,), dtype=np.uint8)
+            image[floor_mask > 0] = (0, 0, 255)
             cv2.circle(image, (cx, cy), 5, (0, 255, 0), -1)  # Green circle
             
             # Ensure the output folder exists
@@ -48,7 +56,7 @@ def find_and_mark_floor_center(room_img_path, temp_path="../Floor-Overlay/tempor
             cv2.imwrite(output_path, image)
 
             print(f"013 Marked image saved at: {output_path}")
-            return (cx, cy)
+        return (cx, cy)
 
     print("013 No floor mask detected.")
     return None
@@ -1,116 +1,736 @@
 # 001
 
-from transformers import MaskFormerFeatureExtractor, MaskFormerForInstanceSegmentation
-from transformers import AutoImageProcessor, MaskFormerModel
+# torch and transformers are imported where the model is loaded and run, so importing this module
+# (and app.py) stays cheap and clients of the inference daemon never load them;
+# the numba wall kernels live in wall_kernels.py
 from PIL import Image
-import requests
 import numpy as np
-import matplotlib.pyplot as plt
 import cv2
-import torch
-from numba import njit, prange
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from inference_scheduler import InferenceScheduler, INFERENCE_BATCH_WINDOW_MS
+from inference_daemon import InferenceClient, INFERENCE_DAEMON_SOCKET
+from mask_codec import encode_label_map, decode_label_map, encoded_label_map_nbytes
 
 import os
 os.environ["PYTORCH_CUDA_ALLOC_CONF"] = "max_split_size_mb:512"
 
+MODEL_NAME = "facebook/maskformer-swin-base-ade"
+# Hub revision used when downloading; pin a commit hash in production
+MODEL_REVISION = os.environ.get("MODEL_REVISION", "main")
+# Local safetensors snapshot (see save_model_snapshot); used instead of the hub when present
+MODEL_SNAPSHOT_DIR = os.environ.get("MODEL_SNAPSHOT_DIR", "../Floor-Overlay/model_snapshot")
+
+# ADE20K label ids used across the pipeline (facebook/maskformer-swin-base-ade)
+WALL_LABEL_ID = 0
+FLOOR_LABEL_ID = 3
+CARPET_LABEL_ID = 28
+# Names accepted by resolve_label_id() besides the model's own ADE label names
+LABEL_ALIASES = {"walls": WALL_LABEL_ID, "floors": FLOOR_LABEL_ID, "carpet": CARPET_LABEL_ID}
+
+# Upper bound on the memory held by cached label maps (default 256 MB: roughly 100 rooms at 1920x1080
+# uncompressed, tens of thousands run-length encoded)
+SEGMENTATION_CACHE_MAX_BYTES = int(os.environ.get("SEGMENTATION_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# "rle" keeps cached label maps run-length encoded (a few KB instead of ~3.5 MB per 1080p room,
+# decoded in ~2 ms on a hit); "raw" keeps the arrays as they are
+SEGMENTATION_CACHE_ENCODING = os.environ.get("SEGMENTATION_CACHE_ENCODING", "rle")
+
+# "fp32" or "bf16" (bfloat16 autocast, worthwhile on CPUs with AVX512-BF16/AMX)
+INFERENCE_PRECISION = os.environ.get("INFERENCE_PRECISION", "fp32")
+INFERENCE_CHANNELS_LAST = os.environ.get("INFERENCE_CHANNELS_LAST", "0") == "1"
+
+# Long edge (px) of the image the model and panoptic post-processing run on; 0 keeps the full
+# scaled room. Class masks are upsampled back to full resolution with a guided filter.
+SEGMENTATION_WORKING_SIZE = int(os.environ.get("SEGMENTATION_WORKING_SIZE", "0"))
+# The guided filter comes with opencv-contrib (cv2.ximgproc); without it upsampled masks are
+# bilinear only, with blockier edges. get_model_status() reports which one is in use.
+GUIDED_FILTER_AVAILABLE = hasattr(cv2, "ximgproc")
+
+# "panoptic" (HF panoptic post-processing at the working size) or "semantic" (per-class scores
+# at mask-logit resolution, 1/4 of the model input; only the requested class mask is upsampled)
+SEGMENTATION_POSTPROCESS = os.environ.get("SEGMENTATION_POSTPROCESS", "panoptic")
+
+# "none" or "int8" (dynamic int8 quantization of every nn.Linear in the Swin backbone and
+# transformer decoder; CPU only)
+INFERENCE_QUANTIZATION = os.environ.get("INFERENCE_QUANTIZATION", "none")
+
+# "eager", "trace" (TorchScript, one traced graph per shape bucket saved under MODEL_CACHE_DIR)
+# or "compile" (torch.compile, inductor kernels cached under MODEL_CACHE_DIR)
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "eager")
+MODEL_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", "../Floor-Overlay/model_cache")
+
+# Allowed edge lengths of the padded model input. The feature extractor resizes the shortest
+# edge of the (<= 1920x1080) room to 640, so every input lands in one of a handful of buckets.
+# Reduced working sizes use the smaller edges.
+SHAPE_BUCKET_EDGES = (320, 384, 448, 512, 576, 640, 768, 896, 1024, 1152, 1280, 1536, 2048)
+
 feature_extractor = None
 model = None
-device = torch.device('cpu')
-
-@njit(parallel=True)
-def create_wall_overlay(mask,dsgn,woverlay):
-    w,h,_ = woverlay.shape
-    dw,dh,_ = dsgn.shape
-    for i in prange(0,w):
-        for j in prange(0,h):
-            if(mask[i][j][0] == 255):
-                p = dsgn[i%dw][j%dh]
-                woverlay[i][j]= p
-    return woverlay
-
-@njit(parallel=True)
-def create_output_image(imagearray,walloverlayarray):
-    h,w,_ =  walloverlayarray.shape
-    for i in prange(0,h):
-        for j in prange(0,w):
-            if(walloverlayarray[i][j].sum() > 0 ):
-                imagearray[i][j] =  walloverlayarray[i][j]
-    return imagearray.astype(np.uint8)
-
-@njit(parallel=True)
-def create_image_with_shadow(img_gray,hsv_image,walloverlayarray):
-  h,w,_ =  hsv_image.shape
-  hsvmin = np.min(hsv_image[:,:,2])
-  hsvmax = np.max(hsv_image[:,:,2])
-  for i in prange(0,h):
-    for j in prange(0,w):
-      if(walloverlayarray[i][j].sum() > 0 ):
-        # hsv_image[i][j][2] = hsv_image[i][j][2] - (img_gray[i][j]/2)
-        hsv_image[i][j][2] = abs(hsv_image[i][j][2] - (((img_gray[i][j]/1)-hsvmin)/(hsvmax-hsvmin))*100)
-  print(hsv_image.shape)
-  return hsv_image.astype(np.uint8)
-
-def load_model():
-    global feature_extractor,model,device
+device = None
+precision = INFERENCE_PRECISION
+channels_last = INFERENCE_CHANNELS_LAST
+backend = INFERENCE_BACKEND
+quantization = INFERENCE_QUANTIZATION
+# Traced/compiled callables keyed by padded (height, width)
+_bucket_runners = {}
+_bucket_runners_lock = threading.Lock()
+# Identifies the loaded weights and execution settings; part of the segmentation cache key
+model_key = MODEL_NAME
+# ADE label name -> id of the loaded model (or of the daemon's model), used by resolve_label_id()
+label2id = {}
+
+# LRU of (panoptic_map, segments_info, bytes) keyed by (pixel hash, model key, working size, post-processing
+# mode); panoptic_map is run-length encoded per SEGMENTATION_CACHE_ENCODING
+_segmentation_cache = OrderedDict()
+_segmentation_cache_bytes = 0
+_segmentation_cache_lock = threading.Lock()
+_segmentation_cache_stats = {"hits": 0, "misses": 0}
+
+# Micro-batching front end, created by load_model() when INFERENCE_BATCH_WINDOW_MS > 0
+_scheduler = None
+
+# Serialises forward passes of request threads (threaded workers, daemon connections) when
+# micro-batching is off. One forward pass already uses every core, so concurrent passes would
+# only contend for them and multiply the activation memory.
+_inference_lock = threading.Lock()
+# Segmentations in progress keyed like the cache: a request for an image that is already being
+# segmented waits for that result instead of running the model again
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+# Connection to the inference daemon, set by load_model() when INFERENCE_DAEMON_SOCKET is configured;
+# segmentation then runs in the daemon and this process never loads the model
+_daemon_client = None
+
+# Startup progress reported by get_model_status() (and /ping)
+_model_status = {"stage": "not loaded", "ready": False}
+# Set once upsample_mask() has warned that it fell back to bilinear upsampling
+_bilinear_fallback_warned = False
+
+def _model_source():
+    """Local snapshot directory if one has been saved, otherwise the hub model id and pinned revision."""
+    if os.path.exists(os.path.join(MODEL_SNAPSHOT_DIR, "model.safetensors")):
+        return MODEL_SNAPSHOT_DIR, {"local_files_only": True}
+    return MODEL_NAME, {"revision": MODEL_REVISION}
+
+def save_model_snapshot(snapshot_dir=None):
+    """
+    Downloads MODEL_NAME at MODEL_REVISION and saves it as a local safetensors snapshot.
+    load_model() memory-maps the snapshot on later boots instead of resolving the hub.
+    """
+    from transformers import MaskFormerFeatureExtractor, MaskFormerForInstanceSegmentation
+    snapshot_dir = snapshot_dir or MODEL_SNAPSHOT_DIR
+    os.makedirs(snapshot_dir, exist_ok=True)
+    MaskFormerFeatureExtractor.from_pretrained(MODEL_NAME, revision=MODEL_REVISION).save_pretrained(snapshot_dir)
+    MaskFormerForInstanceSegmentation.from_pretrained(MODEL_NAME, revision=MODEL_REVISION).save_pretrained(snapshot_dir, safe_serialization=True)
+    print(f"001 Snapshot of {MODEL_NAME}@{MODEL_REVISION} saved to {snapshot_dir}")
+    return snapshot_dir
+
+def load_model(precision_mode=None, use_channels_last=None, backend_mode=None, quantization_mode=None, use_daemon=None):
+    """
+    Loads MaskFormer and pins it for inference: eval mode, moved to the device once,
+    optionally in channels-last memory format. With an inference daemon configured it
+    connects to the daemon instead and waits until the daemon's model is ready.
+
+    Args:
+        precision_mode (str): "fp32" or "bf16". Defaults to INFERENCE_PRECISION.
+        use_channels_last (bool): Defaults to INFERENCE_CHANNELS_LAST.
+        backend_mode (str): "eager", "trace" or "compile". Defaults to INFERENCE_BACKEND.
+        quantization_mode (str): "none" or "int8". Defaults to INFERENCE_QUANTIZATION.
+        use_daemon (bool): segment through the inference daemon. Defaults to whether
+                           INFERENCE_DAEMON_SOCKET is set.
+    """
+    global feature_extractor,model,device,precision,channels_last,backend,quantization,model_key,label2id,_scheduler,_daemon_client
+    if use_daemon is None:
+        use_daemon = bool(INFERENCE_DAEMON_SOCKET)
+    if use_daemon:
+        # The daemon's settings (precision, backend, ...) apply; its model key keeps cache keys consistent
+        _daemon_client = InferenceClient(INFERENCE_DAEMON_SOCKET)
+        hello = _daemon_client.wait_until_ready()
+        model_key = hello["model_key"]
+        label2id = hello["label2id"]
+        print(f"Model served by inference daemon at {_daemon_client.socket_path} (pid {hello['pid']}, {model_key})")
+        return
+    _daemon_client = None
+    precision = precision_mode or INFERENCE_PRECISION
+    channels_last = INFERENCE_CHANNELS_LAST if use_channels_last is None else use_channels_last
+    backend = backend_mode or INFERENCE_BACKEND
+    quantization = quantization_mode or INFERENCE_QUANTIZATION
+    if precision not in ("fp32", "bf16"):
+        raise ValueError(f"001 Unsupported inference precision: {precision}")
+    if backend not in ("eager", "trace", "compile"):
+        raise ValueError(f"001 Unsupported inference backend: {backend}")
+    if quantization not in ("none", "int8"):
+        raise ValueError(f"001 Unsupported quantization: {quantization}")
+    if SEGMENTATION_POSTPROCESS not in ("panoptic", "semantic"):
+        raise ValueError(f"001 Unsupported post-processing mode: {SEGMENTATION_POSTPROCESS}")
+    if quantization == "int8" and precision != "fp32":
+        raise ValueError("001 int8 quantization runs with fp32 activations; use INFERENCE_PRECISION=fp32")
+    import torch
+    from transformers import MaskFormerFeatureExtractor, MaskFormerForInstanceSegmentation
     # load MaskFormer fine-tuned on COCO panoptic segmentation
+    device = torch.device('cpu')
     if torch.cuda.is_available():
         device = torch.device("cuda")
-    feature_extractor = MaskFormerFeatureExtractor.from_pretrained("facebook/maskformer-swin-base-ade")
-    model = MaskFormerForInstanceSegmentation.from_pretrained("facebook/maskformer-swin-base-ade")
-    # model.to(device)
-    print("Model Successfully Loaded")
+    source, source_kwargs = _model_source()
+    feature_extractor = MaskFormerFeatureExtractor.from_pretrained(source, **source_kwargs)
+    # safetensors weights are memory-mapped rather than read and copied
+    model = MaskFormerForInstanceSegmentation.from_pretrained(source, **source_kwargs)
+    model.eval()
+    label2id = {key.lower(): int(value) for key, value in model.config.label2id.items()}
+    if quantization == "int8":
+        # Dynamic quantization kernels are CPU-only
+        device = torch.device("cpu")
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    model.to(device)
+    if channels_last:
+        model.to(memory_format=torch.channels_last)
+    model_key = f"{MODEL_NAME}:{precision}" + (f":{quantization}" if quantization != "none" else "")
+    with _bucket_runners_lock:
+        _bucket_runners.clear()
+    if backend == "compile":
+        # Persist inductor's compiled kernels so later boots skip code generation
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.join(MODEL_CACHE_DIR, "inductor"))
+        os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+    elif backend == "trace":
+        _load_traced_buckets()
+    if INFERENCE_BATCH_WINDOW_MS > 0 and _scheduler is None:
+        _scheduler = InferenceScheduler(segment_batch)
+    print(f"Model Successfully Loaded from {source} ({precision}{', ' + quantization if quantization != 'none' else ''}{', channels-last' if channels_last else ''}, {backend} on {device})")
     # image_processor = AutoImageProcessor.from_pretrained("facebook/maskformer-swin-base-ade")
     # model = MaskFormerForInstanceSegmentation.from_pretrained("facebook/maskformer-swin-base-ade")
 
-def infer(imagepath,designimgpath,outputpath,mode = 3):
+def warm_up(size=(1920, 1080)):
+    """
+    Runs one uncached inference on a synthetic room-sized image so the first real request does
+    not pay for lazy initialisation (allocator growth, oneDNN primitives, trace/compile of the
+    1920x1080 shape bucket).
+    """
+    rng = np.random.default_rng(0)
+    image = Image.fromarray(rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8))
+    segment_batch([_to_working_size(image)])
+
+def startup(run_warm_up=True, use_daemon=None):
+    """
+    Loads the model and warms it up, recording each stage for get_model_status().
+    Clients of the inference daemon skip the warm-up; the daemon has already run it.
+    """
+    try:
+        _model_status.update(stage="loading", ready=False)
+        started = time.perf_counter()
+        load_model(use_daemon=use_daemon)
+        _model_status["load_seconds"] = round(time.perf_counter() - started, 3)
+        if run_warm_up and _daemon_client is None:
+            _model_status["stage"] = "warming up"
+            started = time.perf_counter()
+            warm_up()
+            _model_status["warm_up_seconds"] = round(time.perf_counter() - started, 3)
+        _model_status.update(stage="ready", ready=True)
+        print(f"001 Model ready: {_model_status}")
+    except Exception as e:
+        _model_status.update(stage="failed", error=str(e))
+        raise
+
+def get_model_status():
+    """
+    Readiness of the model: stage ("not loaded", "loading", "warming up", "ready", "failed") and
+    timings, plus `mask_upsampling` ("guided_filter" or "bilinear"). `degraded` lists features
+    running in a reduced mode, e.g. bilinear mask upsampling while masks are upsampled
+    (SEGMENTATION_WORKING_SIZE or semantic post-processing) and cv2.ximgproc is missing.
+    """
+    status = dict(_model_status, mask_upsampling="guided_filter" if GUIDED_FILTER_AVAILABLE else "bilinear")
+    if not GUIDED_FILTER_AVAILABLE and (SEGMENTATION_WORKING_SIZE or SEGMENTATION_POSTPROCESS == "semantic"):
+        status["degraded"] = ["mask_upsampling: bilinear, cv2.ximgproc (opencv-contrib-python) is not installed"]
+    return status
+
+def _logits_only(wrapped):
+    """Wraps the model so tracing/compiling sees tensors in and a (class, mask) logits tuple out."""
+    import torch
+
+    class _LogitsOnly(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.wrapped = wrapped
+
+        def forward(self, pixel_values, pixel_mask):
+            outputs = self.wrapped(pixel_values=pixel_values, pixel_mask=pixel_mask)
+            return outputs.class_queries_logits, outputs.masks_queries_logits
+
+    return _LogitsOnly()
+
+def _shape_bucket(height, width):
+    """Smallest bucket that holds an input of the given size, or None if it is larger than all buckets."""
+    bucket_height = next((edge for edge in SHAPE_BUCKET_EDGES if edge >= height), None)
+    bucket_width = next((edge for edge in SHAPE_BUCKET_EDGES if edge >= width), None)
+    if bucket_height is None or bucket_width is None:
+        return None
+    return (bucket_height, bucket_width)
+
+def _traced_artifact_path(bucket):
+    name = model_key.replace("/", "_").replace(":", "_")
+    return os.path.join(MODEL_CACHE_DIR, f"{name}_{device.type}{'_cl' if channels_last else ''}_{bucket[0]}x{bucket[1]}.pt")
+
+def _load_traced_buckets():
+    """Loads every traced graph already on disk for the current model settings."""
+    import torch
+    for bucket_height in SHAPE_BUCKET_EDGES:
+        for bucket_width in SHAPE_BUCKET_EDGES:
+            bucket = (bucket_height, bucket_width)
+            artifact_path = _traced_artifact_path(bucket)
+            if os.path.exists(artifact_path):
+                _bucket_runners[bucket] = torch.jit.load(artifact_path, map_location=device)
+                print(f"001 Loaded traced model for bucket {bucket} from {artifact_path}")
+
+def _bucket_runner(bucket):
+    """Returns the traced or compiled callable for a bucket, building (and for tracing, saving) it on first use."""
+    import torch
+    with _bucket_runners_lock:
+        runner = _bucket_runners.get(bucket)
+        if runner is not None:
+            return runner
+        wrapper = _logits_only(model).eval()
+        if backend == "compile":
+            runner = torch.compile(wrapper, dynamic=False)
+        else:
+            example_values = torch.zeros((1, 3) + bucket, device=device)
+            example_mask = torch.ones((1,) + bucket, dtype=torch.long, device=device)
+            if channels_last:
+                example_values = example_values.contiguous(memory_format=torch.channels_last)
+            with torch.inference_mode(), torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=(precision == "bf16")):
+                runner = torch.jit.trace(wrapper, (example_values, example_mask), check_trace=False, strict=False)
+            runner = torch.jit.freeze(runner.eval())
+            os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+            artifact_path = _traced_artifact_path(bucket)
+            torch.jit.save(runner, artifact_path)
+            print(f"001 Traced model for bucket {bucket} saved to {artifact_path}")
+        _bucket_runners[bucket] = runner
+        return runner
+
+def _run_model(pixel_values, pixel_mask):
+    """
+    Runs the forward pass with the configured backend.
+
+    For "trace"/"compile" the batch is zero-padded (bottom/right) into its shape bucket so the
+    same graph is reused, and the mask logits are cropped back to the unpadded input afterwards.
+
+    Returns:
+        MaskFormerForInstanceSegmentationOutput: fp32 class and mask logits, ready for post-processing.
+    """
+    import torch
+    from transformers.models.maskformer.modeling_maskformer import MaskFormerForInstanceSegmentationOutput
+    height, width = pixel_values.shape[-2:]
+    bucket = _shape_bucket(height, width) if backend != "eager" else None
+    if bucket is not None:
+        pad = (0, bucket[1] - width, 0, bucket[0] - height)
+        pixel_values = torch.nn.functional.pad(pixel_values, pad)
+        pixel_mask = torch.nn.functional.pad(pixel_mask, pad)
+    if channels_last:
+        pixel_values = pixel_values.contiguous(memory_format=torch.channels_last)
+
+    with torch.inference_mode(), torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=(precision == "bf16")):
+        if bucket is not None:
+            class_queries_logits, masks_queries_logits = _bucket_runner(bucket)(pixel_values, pixel_mask)
+        else:
+            outputs = model(pixel_values=pixel_values, pixel_mask=pixel_mask)
+            class_queries_logits, masks_queries_logits = outputs.class_queries_logits, outputs.masks_queries_logits
+
+    if bucket is not None:
+        # Mask logits come out at 1/4 of the input resolution
+        scale_height = masks_queries_logits.shape[-2] / bucket[0]
+        scale_width = masks_queries_logits.shape[-1] / bucket[1]
+        masks_queries_logits = masks_queries_logits[..., :math.ceil(height * scale_height), :math.ceil(width * scale_width)]
+    return MaskFormerForInstanceSegmentationOutput(
+        class_queries_logits=class_queries_logits.float(),
+        masks_queries_logits=masks_queries_logits.float(),
+    )
+
+def _segmentation_cache_key(image):
+    """Builds the cache key from the decoded RGB pixels of the image and the model in use."""
+    pixels = np.ascontiguousarray(np.asarray(image))
+    digest = hashlib.blake2b(pixels.tobytes(), digest_size=16)
+    digest.update(str(pixels.shape).encode())
+    return (digest.hexdigest(), model_key, SEGMENTATION_WORKING_SIZE, SEGMENTATION_POSTPROCESS)
+
+def _cache_get(key):
+    with _segmentation_cache_lock:
+        entry = _segmentation_cache.get(key)
+        if entry is not None:
+            _segmentation_cache.move_to_end(key)
+            _segmentation_cache_stats["hits"] += 1
+        else:
+            _segmentation_cache_stats["misses"] += 1
+    if entry is None:
+        return None
+    panoptic_map, segments_info, _ = entry
+    if SEGMENTATION_CACHE_ENCODING == "rle":
+        panoptic_map = decode_label_map(panoptic_map)
+        panoptic_map.flags.writeable = False
+    return panoptic_map, segments_info
+
+def _cache_put(key, entry):
+    global _segmentation_cache_bytes
+    panoptic_map, segments_info = entry
+    if SEGMENTATION_CACHE_ENCODING == "rle":
+        panoptic_map = encode_label_map(panoptic_map)
+        entry_bytes = encoded_label_map_nbytes(panoptic_map)
+    else:
+        entry_bytes = panoptic_map.nbytes
+    if entry_bytes > SEGMENTATION_CACHE_MAX_BYTES:
+        return
+    with _segmentation_cache_lock:
+        if key in _segmentation_cache:
+            return
+        _segmentation_cache[key] = (panoptic_map, segments_info, entry_bytes)
+        _segmentation_cache_bytes += entry_bytes
+        while _segmentation_cache_bytes > SEGMENTATION_CACHE_MAX_BYTES:
+            _, evicted = _segmentation_cache.popitem(last=False)
+            _segmentation_cache_bytes -= evicted[2]
+
+def clear_segmentation_cache():
+    global _segmentation_cache_bytes
+    with _segmentation_cache_lock:
+        _segmentation_cache.clear()
+        _segmentation_cache_bytes = 0
+
+def get_inference_metrics():
+    """Segmentation cache counters and, when micro-batching is enabled, batch size and queue wait statistics."""
+    if _daemon_client is not None:
+        # Cache and batching live in the daemon, shared by every worker
+        return dict(_daemon_client.metrics(), daemon=_daemon_client.socket_path)
+    with _segmentation_cache_lock:
+        metrics = {
+            "model": model_key,
+            "segmentation_cache": dict(_segmentation_cache_stats, entries=len(_segmentation_cache), bytes=_segmentation_cache_bytes),
+        }
+    if _scheduler is not None:
+        metrics["batching"] = _scheduler.metrics()
+    return metrics
+
+def _to_working_size(image):
+    """Downscales a PIL image so its long edge is at most SEGMENTATION_WORKING_SIZE."""
+    if not SEGMENTATION_WORKING_SIZE or max(image.size) <= SEGMENTATION_WORKING_SIZE:
+        return image
+    scale = SEGMENTATION_WORKING_SIZE / max(image.size)
+    working_size = (max(1, round(image.size[0] * scale)), max(1, round(image.size[1] * scale)))
+    return image.resize(working_size, Image.BILINEAR, reducing_gap=2.0)
+
+def upsample_mask(mask, guide_image, eps=1e-3):
+    """
+    Upsamples a low-resolution binary mask to the size of the guide image.
+
+    The mask is bilinearly upsampled and then refined with a guided filter on the grayscale
+    guide, so the boundary snaps to edges in the room photo instead of staying blocky. Without
+    cv2.ximgproc the mask stays bilinear; the first such call prints a warning.
+
+    Args:
+        mask (np.ndarray): (h, w) boolean or 0/255 mask.
+        guide_image: full-resolution PIL RGB image or (H, W, 3) RGB array.
+        eps (float): guided filter regularisation; larger values smooth more.
+
+    Returns:
+        np.ndarray: (H, W) boolean mask.
+    """
+    guide = np.asarray(guide_image)
+    height, width = guide.shape[:2]
+    if mask.shape == (height, width):
+        return mask > 0
+    soft = cv2.resize((mask > 0).astype(np.float32), (width, height), interpolation=cv2.INTER_LINEAR)
+    if GUIDED_FILTER_AVAILABLE:
+        radius = max(2, int(round(2 * width / mask.shape[1])))
+        gray = cv2.cvtColor(guide, cv2.COLOR_RGB2GRAY).astype(np.float32) / 255.0
+        soft = cv2.ximgproc.guidedFilter(gray, soft, radius, eps)
+    else:
+        _warn_bilinear_fallback()
+    return soft > 0.5
+
+def _warn_bilinear_fallback():
+    global _bilinear_fallback_warned
+    if not _bilinear_fallback_warned:
+        _bilinear_fallback_warned = True
+        print("001 WARNING: cv2.ximgproc is not available (install opencv-contrib-python); class masks are "
+              "upsampled bilinearly, without the guided filter that snaps their edges to the room photo")
+
+def _postprocess_panoptic(image_outputs, target_size):
+    """HF panoptic post-processing: every query mask is upsampled to target_size (height, width)."""
+    # you can pass them to feature_extractor for postprocessing
+    # An empty label_ids_to_fuse keeps the default (no fusing) without the per-call warning
+    result = feature_extractor.post_process_panoptic_segmentation(image_outputs, target_sizes=[target_size], label_ids_to_fuse=set())[0]
+    # we refer to the demo notebooks for visualization (see "Resources" section in the MaskFormer docs)
+    predicted_panoptic_map = result["segmentation"].cpu().numpy().astype(np.int16)
+    return predicted_panoptic_map, result['segments_info']
+
+def _postprocess_semantic(image_outputs):
+    """
+    Semantic post-processing at mask-logit resolution.
+
+    Per-class scores are the class-probability-weighted sum of the query masks; each pixel takes
+    the best class. Nothing is upsampled here: one segment per present class is reported
+    (id = label_id + 1) and SegmentationResult.class_mask() upsamples only the classes asked for.
+    A segment's score is the mean probability of its class over its pixels (per-pixel scores
+    normalised over the classes), a model confidence like the panoptic path's query score.
+    """
+    import torch
+    class_probs = image_outputs.class_queries_logits[0].softmax(dim=-1)[:, :-1]  # drop the "no object" class
+    mask_probs = image_outputs.masks_queries_logits[0].sigmoid()
+    class_scores = torch.einsum("qc,qhw->chw", class_probs, mask_probs)
+    pixel_probs, label_map = (class_scores / class_scores.sum(dim=0).clamp_min(1e-6)).max(dim=0)
+    label_map = label_map.cpu().numpy().astype(np.int16)
+    label_ids, counts = np.unique(label_map, return_counts=True)
+    mean_probs = np.bincount(label_map.ravel(), weights=pixel_probs.float().cpu().numpy().ravel())[label_ids] / counts
+    segments_info = [
+        {"id": int(label_id) + 1, "label_id": int(label_id), "was_fused": True, "score": float(mean_prob)}
+        for label_id, mean_prob in zip(label_ids, mean_probs)
+    ]
+    return label_map + 1, segments_info
+
+def segment_batch(images):
+    """
+    Segments several PIL RGB images with a single forward pass (no caching).
+
+    The feature extractor pads the batch to its largest image; each image's mask logits are
+    cropped back to its own extent before post-processing (panoptic at its own size, or
+    semantic at mask-logit resolution, per SEGMENTATION_POSTPROCESS).
+    When SEGMENTATION_WORKING_SIZE is set the model input is not upscaled past the working image.
+
+    Returns:
+        list: one (panoptic_map, segments_info) tuple per image, in order.
+    """
+    from transformers.models.maskformer.modeling_maskformer import MaskFormerForInstanceSegmentationOutput
+    extractor_kwargs = {}
+    shortest_edge = min(min(image.size) for image in images)
+    if SEGMENTATION_WORKING_SIZE and shortest_edge < feature_extractor.size["shortest_edge"]:
+        extractor_kwargs["size"] = dict(feature_extractor.size, shortest_edge=shortest_edge)
+    inputs = feature_extractor(images=images, return_tensors="pt", **extractor_kwargs)
+    # inputs = feature_extractor(images=image, return_tensors="pt")
+    inputs.to(device)
+    outputs = _run_model(inputs["pixel_values"], inputs["pixel_mask"])
+    # model predicts class_queries_logits of shape `(batch_size, num_queries)`
+    # and masks_queries_logits of shape `(batch_size, num_queries, height, width)`
+    batch_height, batch_width = inputs["pixel_values"].shape[-2:]
+    scale_height = outputs.masks_queries_logits.shape[-2] / batch_height
+    scale_width = outputs.masks_queries_logits.shape[-1] / batch_width
+
+    entries = []
+    for index, image in enumerate(images):
+        valid = inputs["pixel_mask"][index].bool()
+        valid_height = int(valid.any(dim=1).sum())
+        valid_width = int(valid.any(dim=0).sum())
+        image_outputs = MaskFormerForInstanceSegmentationOutput(
+            class_queries_logits=outputs.class_queries_logits[index:index + 1],
+            masks_queries_logits=outputs.masks_queries_logits[index:index + 1, :, :math.ceil(valid_height * scale_height), :math.ceil(valid_width * scale_width)],
+        )
+        if SEGMENTATION_POSTPROCESS == "semantic":
+            entries.append(_postprocess_semantic(image_outputs))
+        else:
+            entries.append(_postprocess_panoptic(image_outputs, image.size[::-1]))
+    return entries
+
+def segment(image):
+    """
+    Runs panoptic segmentation on a PIL RGB image.
+
+    Results are cached on the decoded pixels, so segmenting the same room again
+    (within a request or across requests) skips the forward pass, and concurrent requests
+    for the same room share one forward pass. Safe to call from several threads. With micro-batching
+    enabled the forward pass is shared with other requests queued at the same time.
+    With an inference daemon configured the request is forwarded to it.
+
+    Returns:
+        tuple: (panoptic_map, segments_info) where panoptic_map is an int16 array of
+               segment ids and segments_info the matching segment list. The map is at the
+               working resolution (SEGMENTATION_WORKING_SIZE), which is the image size
+               unless a working size is configured, or at mask-logit resolution in semantic
+               mode; see upsample_mask().
+    """
+    if _daemon_client is not None:
+        # The daemon caches (and batches) on behalf of all of its clients
+        return _daemon_client.segment(image)
+
+    key = _segmentation_cache_key(image)
+    cached = _cache_get(key)
+    if cached is not None:
+        print("001 Segmentation cache hit")
+        return cached
+
+    with _inflight_lock:
+        pending = _inflight.get(key)
+        if pending is None:
+            _inflight[key] = future = Future()
+    if pending is not None:
+        return pending.result()
+
+    try:
+        working_image = _to_working_size(image)
+        if _scheduler is not None:
+            entry = _scheduler.submit(working_image).result()
+        else:
+            with _inference_lock:
+                entry = segment_batch([working_image])[0]
+        # Cached results are shared between threads; nothing may modify them in place
+        entry[0].flags.writeable = False
+        _cache_put(key, entry)
+        future.set_result(entry)
+        return entry
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+def resolve_label_id(label):
+    """Maps an ADE label name ("floor", "wall", "rug", "carpet", ...) or id to its integer id."""
+    if isinstance(label, (int, np.integer)) or (isinstance(label, str) and label.isdigit()):
+        return int(label)
+    name = label.strip().lower()
+    if name in LABEL_ALIASES:
+        return LABEL_ALIASES[name]
+    if name not in label2id:
+        raise ValueError(f"001 Unknown segmentation class: {label}")
+    return int(label2id[name])
+
+class SegmentationResult:
+    """
+    Full panoptic segmentation of one room image.
+
+    Holds the label map and segment list from a single forward pass, so masks for the floor,
+    walls, carpet or any other ADE class are extracted without running the model again.
+    Truthiness reports whether the requested class (`mode`) was found, which keeps
+    `if infer(...):` working as it did with the old 0/1 return value.
+    """
+
+    def __init__(self, panoptic_map, segments_info, image, mode=FLOOR_LABEL_ID):
+        self.panoptic_map = panoptic_map
+        self.segments_info = segments_info
+        self.image = image
+        self.mode = mode
+        self._class_masks = {}
+
+    def __bool__(self):
+        return self.has_class(self.mode)
+
+    @property
+    def size(self):
+        """(width, height) of the room image the masks are produced at."""
+        return self.image.size
+
+    @property
+    def label_ids(self):
+        return sorted({info["label_id"] for info in self.segments_info})
+
+    def has_class(self, label):
+        return resolve_label_id(label) in self.label_ids
+
+    def label_map(self):
+        """Per-pixel ADE label id (-1 where nothing was predicted) at the working resolution."""
+        lookup = np.full(max([info["id"] for info in self.segments_info], default=0) + 2, -1, dtype=np.int16)
+        for info in self.segments_info:
+            lookup[info["id"]] = info["label_id"]
+        return lookup[self.panoptic_map]
+
+    def class_mask(self, label):
+        """
+        Full-resolution boolean mask of every segment of the given class (all False if absent).
+        Masks are computed once per class and reused.
+        """
+        label_id = resolve_label_id(label)
+        if label_id not in self._class_masks:
+            segment_ids = [info["id"] for info in self.segments_info if info["label_id"] == label_id]
+            self._class_masks[label_id] = upsample_mask(np.isin(self.panoptic_map, segment_ids), self.image)
+        return self._class_masks[label_id]
+
+    def binary_mask(self, label):
+        """Full-resolution uint8 mask (255 on the class, 0 elsewhere)."""
+        return self.class_mask(label).astype(np.uint8) * 255
+
+    def mask_image(self, label):
+        """Class mask painted red on black as a BGR array, the visual format infer() has always written."""
+        feature_mask = self.class_mask(label)
+        #creating empty panoptic map
+        color_predicted_panoptic_map = np.zeros((feature_mask.shape[0], feature_mask.shape[1], 3), dtype=np.uint8) # height, width, 3
+        color_predicted_panoptic_map[feature_mask] = (0,0,255)
+        return color_predicted_panoptic_map
+
+    def save_mask(self, label, outputpath):
+        """Writes mask_image() to outputpath."""
+        cv2.imwrite(outputpath, self.mask_image(label))
+        return outputpath
+
+def _as_pil_rgb(image):
+    """
+    Accepts a BGR array (OpenCV convention), a PIL image or a path and returns a PIL RGB image.
+    Paths are decoded with OpenCV like arrays from the API, so both hash to the same cache key.
+    """
+    if isinstance(image, Image.Image):
+        return image.convert('RGB')
+    if isinstance(image, np.ndarray):
+        return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    image_array = cv2.imread(image)
+    if image_array is None:
+        raise FileNotFoundError(f"001 Could not read room image at: {image}")
+    return Image.fromarray(cv2.cvtColor(image_array, cv2.COLOR_BGR2RGB))
+
+def segment_image(image, mode=FLOOR_LABEL_ID):
+    """
+    In-memory segmentation entry point.
+
+    Args:
+        image: BGR array, PIL image or path of the (scaled) room image.
+        mode (int): class reported by the result's truthiness (floor by default).
+
+    Returns:
+        SegmentationResult
+    """
+    image = _as_pil_rgb(image)
+    predicted_panoptic_map, segments_info = segment(image)
+    return SegmentationResult(predicted_panoptic_map, segments_info, image, mode)
+
+def floor_mask(image):
+    """uint8 floor mask (255 = floor) of a BGR array/PIL image/path, or None if no floor is found."""
+    result = segment_image(image, FLOOR_LABEL_ID)
+    return result.binary_mask(FLOOR_LABEL_ID) if result else None
+
+def infer(imagepath,designimgpath,outputpath=None,mode = 3):
+    """
+    Segments the room image and, if `outputpath` is given, writes the mask of class `mode` to it.
+
+    Args:
+        imagepath: path of the room image, or the image itself as a BGR array / PIL image.
+
+    Returns:
+        SegmentationResult: truthy when class `mode` is present. The same object yields masks
+                            for any other class without another forward pass.
+    """
     #mode 0 for walls
     #model 3 for floors
     #model 28 for carpet
-    global feature_extractor,model,device
     # url = "http://images.cocodataset.org/val2017/000000039769.jpg"
     # image = Image.open(requests.get(url, stream=True).raw)
-    if torch.cuda.is_available():
-        torch.cuda.empty_cache()
-    model.to(device)
-    image = Image.open(imagepath).convert('RGB')
-    inputs = feature_extractor(images=image, return_tensors="pt")
-    # inputs = feature_extractor(images=image, return_tensors="pt")
-    inputs.to(device)
-    outputs = model(**inputs)
-    # model predicts class_queries_logits of shape `(batch_size, num_queries)`
-    # and masks_queries_logits of shape `(batch_size, num_queries, height, width)`
-    # class_queries_logits = outputs.class_queries_logits
-    # masks_queries_logits = outputs.masks_queries_logits
-
-    # you can pass them to feature_extractor for postprocessing
-    result = feature_extractor.post_process_panoptic_segmentation(outputs, target_sizes=[image.size[::-1]])[0]
-    # we refer to the demo notebooks for visualization (see "Resources" section in the MaskFormer docs)
-    predicted_panoptic_map = result["segmentation"].cpu()
+    result = segment_image(imagepath, mode)
 
     # Checking if the requested feature is in the image 
-    if (mode not in [info['label_id'] for info in result['segments_info']]):
-        return 0
+    if not result:
+        return result
 
-    # Finding the id of the wall from the segment predictions
+    # Every segment of the class goes into the mask
     # facebook/maskformer-swin-base-coco" -> 131
     # facebook/maskformer-swin-base-ade => 0
-    wallitem = next(item for item in result['segments_info'] if item["label_id"] == mode)
-    wallitemid = wallitem['id']
-
-    #creating empty panoptic map
-    color_predicted_panoptic_map = np.zeros((predicted_panoptic_map.shape[0], predicted_panoptic_map.shape[1], 3), dtype=np.uint8) # height, width, 3
-    color_predicted_panoptic_map[predicted_panoptic_map == wallitemid ] = (255,0,0)
-
-    plt.imsave(outputpath,color_predicted_panoptic_map)
+    if outputpath:
+        result.save_mask(mode, outputpath)
     print('Inference done!')
-    if torch.cuda.is_available():
-        model.to('cpu')
-        del inputs,outputs,result
-        torch.cuda.empty_cache()
-    print(torch.cuda.memory_allocated())
-    return 1
+    return result
 
 def main():
+    import sys
+    if sys.argv[1:] == ["snapshot"]:
+        # python floor_mask_model.py snapshot  ->  writes the local weight snapshot
+        save_model_snapshot()
+        return
+
     imagepath = "../Floor-Overlay/inputRoom/room_01a80ef6-b94e-4f2d-8169-84f1b0ec3896.jpg"
     designimgpath = 0
     outputpath = "../Floor-Overlay/mask_out/mask_01a80ef6-b94e-4f2d-8169-84f1b0ec3896.jpg"
@@ -0,0 +1,8 @@
+# Read by gunicorn from the working directory (`gunicorn app:app`, or `-c gunicorn.conf.py`)
+
+def post_worker_init(worker):
+    # Each worker loads its model and starts its job render threads after the fork: importing
+    # app (also in the master with --preload) starts neither
+    import app
+
+    app.init_app()
@@ -0,0 +1,87 @@
+# 025
+
+import os
+
+import cv2
+
+# Server-side defaults of the output encoding; requests can override them (see output_encoding()).
+# "png" stays the default format for compatibility. Without an explicit level OpenCV's PNG encoder
+# uses its speed-tuned setup (level 1, RLE strategy, a single row filter); an explicit level
+# switches to the default strategy and all filters, which benchmarks/output_encoding.py measures
+# as slower even at level 1.
+OUTPUT_FORMAT = os.environ.get("OUTPUT_FORMAT", "png")
+# 0-9; unset keeps OpenCV's fast default
+OUTPUT_PNG_COMPRESSION = os.environ.get("OUTPUT_PNG_COMPRESSION", "")
+OUTPUT_JPEG_QUALITY = int(os.environ.get("OUTPUT_JPEG_QUALITY", "90"))
+# 1-100 for lossy WebP; above 100 encodes lossless
+OUTPUT_WEBP_QUALITY = int(os.environ.get("OUTPUT_WEBP_QUALITY", "80"))
+
+OUTPUT_FORMATS = {
+    "png": (".png", "image/png"),
+    "jpeg": (".jpg", "image/jpeg"),
+    "webp": (".webp", "image/webp"),
+}
+_FORMAT_ALIASES = {"jpg": "jpeg"}
+
+def _int_option(options, name, low, high):
+    value = options.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"025 {name} must be an integer, got: {value!r}")
+    if not low <= value <= high:
+        raise ValueError(f"025 {name} must be between {low} and {high}, got: {value}")
+    return value
+
+def output_encoding(options=None, default_format=None):
+    """
+    Output encoding of one request.
+
+    Args:
+        options (dict): request options; `output_format` ("png", "jpeg", "webp"), `output_quality`
+                        (JPEG/WebP quality 1-100), `lossless` (WebP) and `png_compression` (0-9).
+        default_format (str): format used when the options do not name one (OUTPUT_FORMAT otherwise).
+
+    Returns:
+        dict: format, ext, mimetype and the cv2.imencode params.
+    """
+    options = options or {}
+    output_format = str(options.get("output_format") or default_format or OUTPUT_FORMAT).lower()
+    output_format = _FORMAT_ALIASES.get(output_format, output_format)
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"025 Unsupported output_format: {output_format}")
+    ext, mimetype = OUTPUT_FORMATS[output_format]
+
+    quality = _int_option(options, "output_quality", 1, 100)
+    if output_format == "png":
+        level = _int_option(options, "png_compression", 0, 9)
+        if level is None and OUTPUT_PNG_COMPRESSION:
+            level = int(OUTPUT_PNG_COMPRESSION)
+        params = [cv2.IMWRITE_PNG_COMPRESSION, level] if level is not None else []
+    elif output_format == "jpeg":
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality or OUTPUT_JPEG_QUALITY]
+    else:
+        lossless = str(options.get("lossless", "")).lower() in ("1", "true", "yes")
+        params = [cv2.IMWRITE_WEBP_QUALITY, 101 if lossless else quality or OUTPUT_WEBP_QUALITY]
+    return {"format": output_format, "ext": ext, "mimetype": mimetype, "params": params}
+
+def encode_image(image, encoding=None):
+    """
+    Encodes a BGR, BGRA or grayscale image.
+
+    Args:
+        image (np.ndarray): image to encode.
+        encoding (dict): from output_encoding(); server defaults when None.
+
+    Returns:
+        bytes: the encoded image.
+    """
+    encoding = encoding or output_encoding()
+    if encoding["format"] == "jpeg" and image.ndim == 3 and image.shape[2] == 4:
+        raise ValueError("025 JPEG cannot carry transparency; use output_format png or webp")
+    ok, buffer = cv2.imencode(encoding["ext"], image, encoding["params"])
+    if not ok:
+        raise ValueError(f"025 Could not encode image as {encoding['format']}")
+    return buffer.tobytes()
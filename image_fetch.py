@@ -0,0 +1,321 @@
+# 027
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+import cv2
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+# Seconds to wait for a connection and between received bytes (not for the whole body)
+FETCH_CONNECT_TIMEOUT_S = float(os.environ.get("FETCH_CONNECT_TIMEOUT_S", "5"))
+FETCH_READ_TIMEOUT_S = float(os.environ.get("FETCH_READ_TIMEOUT_S", "20"))
+# Largest accepted image body; bigger downloads are aborted
+FETCH_MAX_BYTES = int(os.environ.get("FETCH_MAX_BYTES", 25 * 1024 * 1024))
+# Same for videos (/overlayVideo), which are not cached
+FETCH_MAX_VIDEO_BYTES = int(os.environ.get("FETCH_MAX_VIDEO_BYTES", 500 * 1024 * 1024))
+# Pooled connections per host, and threads fetching the inputs of a request concurrently
+FETCH_POOL_SIZE = int(os.environ.get("FETCH_POOL_SIZE", "16"))
+# Memory budget of the decoded-image cache (LRU)
+FETCH_CACHE_MAX_BYTES = int(os.environ.get("FETCH_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Downloaded bodies and their validators, shared by workers and kept across restarts ("" disables)
+FETCH_CACHE_DIR = os.environ.get("FETCH_CACHE_DIR", "../Floor-Overlay/fetch_cache")
+FETCH_CACHE_DISK_MAX_BYTES = int(os.environ.get("FETCH_CACHE_DISK_MAX_BYTES", 1024 ** 3))
+# How long a cached image is used without asking the origin when the response set no max-age;
+# afterwards it is revalidated with If-None-Match / If-Modified-Since
+FETCH_REVALIDATE_S = float(os.environ.get("FETCH_REVALIDATE_S", "300"))
+
+def is_url(value):
+    return isinstance(value, str) and value.startswith(("http://", "https://"))
+
+def _freshness(headers, now):
+    """(cacheable, expires) of a response per its Cache-Control header."""
+    cache_control = headers.get("Cache-Control", "").lower()
+    if "no-store" in cache_control:
+        return False, now
+    if "no-cache" in cache_control:
+        return True, now
+    max_age = re.search(r"max-age=(\d+)", cache_control)
+    return True, now + (int(max_age.group(1)) if max_age else FETCH_REVALIDATE_S)
+
+class _Entry:
+    __slots__ = ("image", "data", "etag", "last_modified", "expires")
+
+    def __init__(self, image, data, etag, last_modified, expires):
+        self.image = image
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+
+    def validators(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+class ImageFetcher:
+    """
+    Downloads input images over pooled keep-alive connections.
+
+    Decoded images are cached in memory (LRU, FETCH_CACHE_MAX_BYTES) and the downloaded bodies on
+    disk (FETCH_CACHE_DIR), each with the response's ETag / Last-Modified. A cached image is
+    served without a request until it expires (Cache-Control max-age, else FETCH_REVALIDATE_S),
+    then revalidated with a conditional GET; a 304 keeps it. Concurrent fetches of the same URL
+    share one download. Safe to use from several threads.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None, cache_max_bytes=None, pool_size=None,
+                 timeout=None, disk_max_bytes=None):
+        self.cache_dir = FETCH_CACHE_DIR if cache_dir is None else cache_dir
+        self.max_bytes = max_bytes or FETCH_MAX_BYTES
+        self.cache_max_bytes = FETCH_CACHE_MAX_BYTES if cache_max_bytes is None else cache_max_bytes
+        self.disk_max_bytes = disk_max_bytes or FETCH_CACHE_DISK_MAX_BYTES
+        self.timeout = timeout or (FETCH_CONNECT_TIMEOUT_S, FETCH_READ_TIMEOUT_S)
+        pool_size = pool_size or FETCH_POOL_SIZE
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="image-fetch")
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._disk_lock = threading.Lock()
+        self._stats = {"requests": 0, "hits": 0, "revalidated": 0, "downloads": 0, "disk_hits": 0, "bytes": 0}
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _count(self, stat, amount=1):
+        with self._lock:
+            self._stats[stat] += amount
+
+    def _read_body(self, response, url, max_bytes):
+        length = response.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) > max_bytes:
+            raise ValueError(f"027 {url} is {int(length)} bytes, more than the {max_bytes} allowed")
+        body = bytearray()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            body += chunk
+            if len(body) > max_bytes:
+                raise ValueError(f"027 {url} is larger than the {max_bytes} bytes allowed")
+        return bytes(body)
+
+    def _get(self, url, headers=None, max_bytes=None, retry_unconditional=True):
+        """
+        GET with the pool, timeouts and size cap. Returns (status, headers, body); body is None
+        for a 304, which only conditional requests (If-None-Match / If-Modified-Since) accept.
+        """
+        self._count("requests")
+        conditional = bool(headers) and ("If-None-Match" in headers or "If-Modified-Since" in headers)
+        try:
+            with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                if response.status_code == 304 and conditional:
+                    return 304, response.headers, None
+                if response.status_code != 304:
+                    response.raise_for_status()
+                    body = self._read_body(response, url, max_bytes or self.max_bytes)
+                    self._count("bytes", len(body))
+                    return response.status_code, response.headers, body
+        except requests.exceptions.RequestException as e:
+            raise ConnectionError(f"Failed to download image from URL {url} due to a request error: {e}")
+        # A 304 to an unconditional request has no body to use (e.g. a proxy answering from its
+        # own cache); ask once more, past any caches, before giving up
+        if retry_unconditional:
+            return self._get(url, {"Cache-Control": "no-cache"}, max_bytes, retry_unconditional=False)
+        raise ConnectionError(f"Failed to download image from URL {url}: 304 Not Modified to an unconditional request")
+
+    def fetch_bytes(self, url, max_bytes=None):
+        """
+        Downloads a body without caching it (e.g. videos).
+
+        Args:
+            url (str): http(s) URL.
+            max_bytes (int): size cap; FETCH_MAX_BYTES by default.
+        """
+        return self._get(url, max_bytes=max_bytes)[2]
+
+    # ─── cache ───
+
+    def _disk_paths(self, url):
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.cache_dir, name + ".body"), os.path.join(self.cache_dir, name + ".json")
+
+    def _load_disk(self, url):
+        if not self.cache_dir:
+            return None
+        body_path, meta_path = self._disk_paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url:
+            return None
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        image.flags.writeable = False
+        self._count("disk_hits")
+        return _Entry(image, data, meta.get("etag"), meta.get("last_modified"), meta.get("expires", 0))
+
+    def _save_disk(self, url, entry, with_body=True):
+        if not self.cache_dir:
+            return
+        body_path, meta_path = self._disk_paths(url)
+        meta = {"url": url, "etag": entry.etag, "last_modified": entry.last_modified, "expires": entry.expires}
+        files = [(meta_path, json.dumps(meta), "w")]
+        if with_body:
+            files.insert(0, (body_path, entry.data, "wb"))
+        with self._disk_lock:
+            # Written under temporary names and renamed, so other workers never read half a file
+            for path, content, mode in files:
+                temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(temp_path, mode) as f:
+                    f.write(content)
+                os.replace(temp_path, path)
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Removes the least recently written bodies once the directory passes disk_max_bytes."""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".body"):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            for stale in (path, path[:-len(".body")] + ".json"):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            total -= size
+
+    def _remember(self, url, entry):
+        size = entry.image.nbytes
+        with self._lock:
+            previous = self._cache.pop(url, None)
+            if previous is not None:
+                self._cache_bytes -= previous.image.nbytes
+            if size > self.cache_max_bytes:
+                return
+            self._cache[url] = entry
+            self._cache_bytes += size
+            while self._cache_bytes > self.cache_max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= evicted.image.nbytes
+
+    def _cached(self, url):
+        with self._lock:
+            entry = self._cache.get(url)
+            if entry is not None:
+                self._cache.move_to_end(url)
+        return entry
+
+    def _fetch_entry(self, url):
+        entry = self._cached(url) or self._load_disk(url)
+        now = time.time()
+        if entry is not None and entry.expires > now:
+            self._count("hits")
+            self._remember(url, entry)
+            return entry
+
+        status, headers, body = self._get(url, headers=entry.validators() if entry is not None else None)
+        cacheable, expires = _freshness(headers, now)
+        if status == 304 and entry is not None:
+            self._count("revalidated")
+            entry = _Entry(entry.image, entry.data, headers.get("ETag", entry.etag),
+                           headers.get("Last-Modified", entry.last_modified), expires)
+        else:
+            self._count("downloads")
+            image = cv2.imdecode(np.frombuffer(body, np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError(f"Could not decode image from URL. It might be corrupted or not an image: {url}")
+            # Nothing may modify a cached image in place; callers get copies
+            image.flags.writeable = False
+            entry = _Entry(image, body, headers.get("ETag"), headers.get("Last-Modified"), expires)
+        if cacheable:
+            self._remember(url, entry)
+            # A 304 only refreshes the validators and expiry
+            self._save_disk(url, entry, with_body=status != 304)
+        return entry
+
+    def fetch_image(self, url):
+        """
+        Downloads (or serves from cache) and decodes an image.
+
+        Returns:
+            np.ndarray: BGR image, a private copy the caller may modify.
+        """
+        with self._lock:
+            pending = self._inflight.get(url)
+            if pending is None:
+                self._inflight[url] = future = Future()
+        if pending is not None:
+            return pending.result().image.copy()
+        try:
+            entry = self._fetch_entry(url)
+            future.set_result(entry)
+            return entry.image.copy()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[url]
+
+    def fetch_images(self, sources, decode=None):
+        """
+        Fetches several images concurrently.
+
+        Args:
+            sources (dict): key -> URL, or another encoding of the image when `decode` is given.
+            decode: callable(value) -> BGR image for the values that are not URLs (e.g. base64
+                    strings), run on the calling thread while the URLs download.
+
+        Returns:
+            dict: key -> BGR image, in the order of `sources`. Failures are raised once every
+                  download has finished.
+        """
+        futures = {key: self.executor.submit(self.fetch_image, value) for key, value in sources.items()
+                   if decode is None or is_url(value)}
+        try:
+            decoded = {key: decode(value) for key, value in sources.items() if key not in futures}
+        finally:
+            wait(futures.values())
+        results = {key: future.result() for key, future in futures.items()}
+        return {key: decoded[key] if key in decoded else results[key] for key in sources}
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._cache), cache_bytes=self._cache_bytes)
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+def get_fetcher():
+    """Process-wide ImageFetcher."""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = ImageFetcher()
+        return _fetcher
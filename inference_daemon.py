@@ -0,0 +1,211 @@
+# 020
+
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from PIL import Image
+
+# Unix socket of the inference daemon. When set, load_model() in Flask workers, the batch tooling
+# and CLI scripts connects to the daemon instead of loading its own copy of the model.
+INFERENCE_DAEMON_SOCKET = os.environ.get("INFERENCE_DAEMON_SOCKET", "")
+# Socket the daemon binds to when INFERENCE_DAEMON_SOCKET is not set
+DEFAULT_DAEMON_SOCKET = "/tmp/floor-overlay-inference.sock"
+# How long a client waits for the daemon to come up and finish loading the model
+INFERENCE_DAEMON_CONNECT_TIMEOUT = float(os.environ.get("INFERENCE_DAEMON_CONNECT_TIMEOUT", "300"))
+
+# Protocol: one JSON object per line in each direction. Pixels and label maps never go through
+# the socket; the client creates a shared memory block holding the RGB image followed by room for
+# the label map, the daemon writes the map into it and replies with its shape, dtype and segments.
+
+def _json_default(value):
+    # numpy scalars inside segments_info
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"020 Cannot serialise {type(value).__name__}")
+
+def _shared_block_size(height, width):
+    # RGB pixels, then a label map of at most the image size (int16 today, int32 leaves headroom)
+    return height * width * 3 + height * width * 4
+
+def _attach(name):
+    shm = shared_memory.SharedMemory(name=name)
+    # The client owns (and unlinks) the block; keep this process's resource tracker from
+    # unlinking it again when the daemon exits
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+# ───────────────────────────── daemon ───────────────────────────── #
+
+def _handle_hello(request):
+    import floor_mask_model
+    return {
+        "pid": os.getpid(),
+        "model_key": floor_mask_model.model_key,
+        "label2id": floor_mask_model.label2id,
+        "status": floor_mask_model.get_model_status(),
+    }
+
+def _handle_metrics(request):
+    import floor_mask_model
+    return floor_mask_model.get_inference_metrics()
+
+def _handle_segment(request):
+    import floor_mask_model
+    height, width = request["shape"]
+    shm = _attach(request["shm"])
+    try:
+        # Copy out of the block so no view outlives shm.close()
+        pixels = np.array(np.ndarray((height, width, 3), dtype=np.uint8, buffer=shm.buf))
+        panoptic_map, segments_info = floor_mask_model.segment(Image.fromarray(pixels))
+        offset = height * width * 3
+        if offset + panoptic_map.nbytes > shm.size:
+            raise ValueError(f"020 Label map {panoptic_map.shape} does not fit the shared block")
+        np.ndarray(panoptic_map.shape, dtype=panoptic_map.dtype, buffer=shm.buf, offset=offset)[...] = panoptic_map
+        return {"shape": list(panoptic_map.shape), "dtype": str(panoptic_map.dtype), "segments_info": segments_info}
+    finally:
+        shm.close()
+
+_HANDLERS = {"hello": _handle_hello, "metrics": _handle_metrics, "segment": _handle_segment}
+
+class _DaemonHandler(socketserver.StreamRequestHandler):
+    """Serves one client connection; requests on it are answered in order."""
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            try:
+                request = json.loads(line)
+                response = _HANDLERS[request["op"]](request)
+            except Exception as e:
+                response = {"error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(response, default=_json_default) + "\n").encode())
+            self.wfile.flush()
+
+class _DaemonServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+def serve(socket_path=None):
+    """
+    Runs the inference daemon: loads the model once (never as a client of another daemon) and
+    serves segmentation requests on a Unix socket, one thread per connection. Concurrent requests
+    from different workers share the daemon's segmentation cache and, with
+    INFERENCE_BATCH_WINDOW_MS set, its micro-batches.
+    """
+    import floor_mask_model
+    socket_path = socket_path or INFERENCE_DAEMON_SOCKET or DEFAULT_DAEMON_SOCKET
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = _DaemonServer(socket_path, _DaemonHandler)
+    # Accept connections while the model loads so clients can poll its status
+    threading.Thread(target=floor_mask_model.startup, kwargs={"use_daemon": False}, name="model-startup", daemon=True).start()
+    print(f"020 Inference daemon listening on {socket_path} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+# ───────────────────────────── client ───────────────────────────── #
+
+class InferenceClient:
+    """
+    Segmentation through the inference daemon. Each calling thread gets its own connection,
+    so concurrent requests from one worker are not serialised behind each other.
+    """
+
+    def __init__(self, socket_path=None, connect_timeout=INFERENCE_DAEMON_CONNECT_TIMEOUT):
+        self.socket_path = socket_path or INFERENCE_DAEMON_SOCKET or DEFAULT_DAEMON_SOCKET
+        self.connect_timeout = connect_timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        stream = getattr(self._local, "stream", None)
+        if stream is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+            stream = self._local.stream = sock.makefile("rwb")
+            self._local.socket = sock
+        return stream
+
+    def _close(self):
+        stream = getattr(self._local, "stream", None)
+        if stream is not None:
+            try:
+                stream.close()
+                self._local.socket.close()
+            except OSError:
+                pass
+        self._local.stream = None
+
+    def _request(self, message):
+        # Every request is idempotent, so a dropped connection (daemon restart) is retried once
+        for attempt in range(2):
+            try:
+                stream = self._connection()
+                stream.write((json.dumps(message) + "\n").encode())
+                stream.flush()
+                line = stream.readline()
+                if not line:
+                    raise ConnectionError("020 Inference daemon closed the connection")
+                break
+            except OSError:
+                self._close()
+                if attempt:
+                    raise
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(f"020 Inference daemon error: {response['error']}")
+        return response
+
+    def wait_until_ready(self):
+        """Blocks until the daemon is reachable and its model is loaded; returns its hello reply."""
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                hello = self._request({"op": "hello"})
+                if hello["status"]["ready"]:
+                    return hello
+                if hello["status"]["stage"] == "failed":
+                    raise RuntimeError(f"020 Inference daemon failed to load the model: {hello['status'].get('error')}")
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"020 Inference daemon at {self.socket_path} not ready after {self.connect_timeout:.0f}s")
+            time.sleep(0.2)
+
+    def metrics(self):
+        return self._request({"op": "metrics"})
+
+    def segment(self, image):
+        """
+        Segments a PIL RGB image in the daemon.
+
+        Returns:
+            tuple: (panoptic_map, segments_info), as floor_mask_model.segment() returns them.
+        """
+        pixels = np.asarray(image)
+        height, width = pixels.shape[:2]
+        shm = shared_memory.SharedMemory(create=True, size=_shared_block_size(height, width))
+        try:
+            np.ndarray((height, width, 3), dtype=np.uint8, buffer=shm.buf)[...] = pixels
+            response = self._request({"op": "segment", "shm": shm.name, "shape": [height, width]})
+            panoptic_map = np.array(np.ndarray(response["shape"], dtype=response["dtype"], buffer=shm.buf, offset=height * width * 3))
+            return panoptic_map, response["segments_info"]
+        finally:
+            shm.close()
+            shm.unlink()
+
+def main():
+    serve()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# 018
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+# How long the first queued image waits for company before the batch is run (0 disables batching)
+INFERENCE_BATCH_WINDOW_MS = float(os.environ.get("INFERENCE_BATCH_WINDOW_MS", "0"))
+# A batch is run as soon as this many images are queued, even if the window is still open
+INFERENCE_MAX_BATCH = int(os.environ.get("INFERENCE_MAX_BATCH", "4"))
+
+# Number of recent batches kept for the queue-wait and batch-size statistics
+_METRICS_WINDOW = 1000
+
+class InferenceScheduler:
+    """
+    Groups concurrent segmentation requests into micro-batches.
+
+    Callers submit one image at a time and get a Future back. A single worker thread collects
+    pending images until either `window_ms` has passed since the oldest one was queued or
+    `max_batch` images are waiting, then hands the whole group to `run_batch` (one forward pass)
+    and resolves each caller's Future with its own result.
+    """
+
+    def __init__(self, run_batch, window_ms=INFERENCE_BATCH_WINDOW_MS, max_batch=INFERENCE_MAX_BATCH):
+        self.run_batch = run_batch
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._batch_sizes = deque(maxlen=_METRICS_WINDOW)
+        self._queue_waits_ms = deque(maxlen=_METRICS_WINDOW * self.max_batch)
+        self._batch_ms = deque(maxlen=_METRICS_WINDOW)
+        self._totals = {"batches": 0, "images": 0, "errors": 0}
+        self._worker = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(self, image):
+        future = Future()
+        with self._condition:
+            self._pending.append((image, future, time.perf_counter()))
+            self._condition.notify()
+        return future
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            deadline = self._pending[0][2] + self.window
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            images = [image for image, _, _ in batch]
+            try:
+                results = self.run_batch(images)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                with self._condition:
+                    self._totals["errors"] += 1
+                continue
+            finished = time.perf_counter()
+            with self._condition:
+                self._totals["batches"] += 1
+                self._totals["images"] += len(batch)
+                self._batch_sizes.append(len(batch))
+                self._batch_ms.append((finished - started) * 1000)
+                self._queue_waits_ms.extend((started - queued) * 1000 for _, _, queued in batch)
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def metrics(self):
+        """Batch size and queue wait statistics over the most recent batches."""
+        with self._condition:
+            batch_sizes = np.array(self._batch_sizes)
+            queue_waits = np.array(self._queue_waits_ms)
+            batch_ms = np.array(self._batch_ms)
+            stats = dict(self._totals)
+            stats.update({
+                "window_ms": self.window * 1000,
+                "max_batch": self.max_batch,
+                "queued": len(self._pending),
+            })
+        if batch_sizes.size:
+            stats["batch_size"] = {
+                "mean": float(batch_sizes.mean()),
+                "histogram": {int(size): int(count) for size, count in zip(*np.unique(batch_sizes, return_counts=True))},
+            }
+            stats["queue_wait_ms"] = {
+                "mean": float(queue_waits.mean()),
+                "p50": float(np.percentile(queue_waits, 50)),
+                "p90": float(np.percentile(queue_waits, 90)),
+                "max": float(queue_waits.max()),
+            }
+            stats["batch_ms"] = {
+                "mean": float(batch_ms.mean()),
+                "p90": float(np.percentile(batch_ms, 90)),
+            }
+        return stats
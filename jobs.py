@@ -0,0 +1,382 @@
+# 030
+
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+# Asynchronous jobs: a sqlite queue under JOB_DIR shared by every worker process on the host
+# (no broker). Request bodies and results are files next to it: <JOB_DIR>/<job_id>/
+JOB_DIR = os.environ.get("JOB_DIR", "../Floor-Overlay/jobs")
+# Render threads per worker process taking jobs off the queue (0: this process only enqueues)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+# How long finished (done or failed) jobs and their results are kept
+JOB_RESULT_TTL_S = float(os.environ.get("JOB_RESULT_TTL_S", "3600"))
+# Running jobs hold a lease their process renews every JOB_LEASE_S / 3; the jobs of a process
+# that died are queued again once it runs out, up to JOB_MAX_ATTEMPTS runs in total
+JOB_LEASE_S = float(os.environ.get("JOB_LEASE_S", "60"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "2"))
+# How often idle render threads look for jobs queued by other processes
+JOB_POLL_S = float(os.environ.get("JOB_POLL_S", "0.5"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    route TEXT NOT NULL,
+    state TEXT NOT NULL,
+    request TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    expires REAL,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    stages TEXT NOT NULL DEFAULT '[]',
+    status_code INTEGER,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created);
+"""
+
+JOB_STATES = ("queued", "running", "done", "failed")
+
+# The job the current thread is running, for report_stage()
+_current = threading.local()
+
+def report_stage(stage):
+    """
+    Records that the job running on this thread entered `stage` (e.g. "segmenting"). Does
+    nothing outside jobs, so request handlers call it unconditionally.
+    """
+    job = getattr(_current, "job", None)
+    if job is not None:
+        job["queue"].stage(job["job_id"], stage)
+
+def current_job_id():
+    """Id of the job running on this thread, or None."""
+    job = getattr(_current, "job", None)
+    return job["job_id"] if job is not None else None
+
+class JobQueue:
+    """
+    Persistent FIFO of render requests.
+
+    enqueue() stores a request and returns its id at once; render threads (start_workers())
+    claim queued jobs, run them through a handler and store the response, which get()/result()
+    return until it expires. Jobs survive restarts, and jobs left running by a dead process are
+    queued again once their lease runs out. Several threads and processes can share one queue.
+    """
+
+    def __init__(self, root=None, result_ttl_s=None, lease_s=None, max_attempts=None):
+        self.root = root or JOB_DIR
+        self.result_ttl_s = JOB_RESULT_TTL_S if result_ttl_s is None else result_ttl_s
+        self.lease_s = JOB_LEASE_S if lease_s is None else lease_s
+        self.max_attempts = JOB_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        os.makedirs(self.root, exist_ok=True)
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._workers = []
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._last_sweep = 0
+        with self._db() as db:
+            db.executescript(_SCHEMA)
+
+    def _db(self):
+        # One connection per thread; WAL lets other workers read while one writes
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(os.path.join(self.root, "queue.sqlite"), timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def enqueue(self, route, body, content_type=None, accept=None, query=None):
+        """
+        Queues a request.
+
+        Args:
+            route (str): path of the route that renders it, e.g. "/overlayFloor".
+            body (bytes): the request body, as received.
+            content_type (str): its Content-Type.
+            accept (str): the client's Accept header (picks the response format).
+            query (dict): query string parameters.
+
+        Returns:
+            str: the job id.
+        """
+        job_id = uuid.uuid4().hex
+        job_dir = self._job_dir(job_id)
+        os.makedirs(job_dir)
+        with open(os.path.join(job_dir, "request.bin"), "wb") as f:
+            f.write(body)
+        request = {"content_type": content_type, "accept": accept, "query": query or {}}
+        db = self._db()
+        db.execute("INSERT INTO jobs (job_id, route, state, request, created) VALUES (?, ?, 'queued', ?, ?)",
+                   (job_id, route, json.dumps(request), time.time()))
+        self._wakeup.set()
+        return job_id
+
+    def claim(self):
+        """
+        Takes the oldest queued job (or one whose lease ran out) and marks it running.
+
+        Returns:
+            dict: the job (job_id, route, request, attempts, body), or None when there is none.
+        """
+        db = self._db()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock first, so two workers never claim the same job
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT job_id, route, request, attempts FROM jobs "
+                "WHERE state = 'queued' OR (state = 'running' AND lease_until < ?) ORDER BY created LIMIT 1",
+                (now,)).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            job_id, route, request, attempts = row
+            if attempts >= self.max_attempts:
+                # Its worker died on every attempt; give up instead of taking the next one down too
+                self._finish(db, job_id, "failed", 500, {"mimetype": "application/json", "headers": {}},
+                             json.dumps({"error": f"Job abandoned after {attempts} attempts"}).encode())
+                db.execute("COMMIT")
+                return self.claim()
+            db.execute("UPDATE jobs SET state = 'running', started = ?, lease_until = ?, attempts = attempts + 1, "
+                       "stages = ? WHERE job_id = ?",
+                       (now, now + self.lease_s, json.dumps([{"stage": "started", "at": now}]), job_id))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        with open(os.path.join(self._job_dir(job_id), "request.bin"), "rb") as f:
+            body = f.read()
+        return {"job_id": job_id, "route": route, "request": json.loads(request), "attempts": attempts + 1, "body": body}
+
+    def stage(self, job_id, stage):
+        """Appends a stage to a running job's progress (and renews its lease)."""
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT stages FROM jobs WHERE job_id = ? AND state = 'running'", (job_id,)).fetchone()
+            if row is not None:
+                stages = json.loads(row[0]) + [{"stage": stage, "at": now}]
+                db.execute("UPDATE jobs SET stages = ?, lease_until = ? WHERE job_id = ?",
+                           (json.dumps(stages), now + self.lease_s, job_id))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def finish(self, job_id, status_code, mimetype, body, headers=None):
+        """Stores a job's response; 2xx responses mark it done, others failed."""
+        state = "done" if 200 <= status_code < 300 else "failed"
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            self._finish(db, job_id, state, status_code, {"mimetype": mimetype, "headers": headers or {}}, body)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _finish(self, db, job_id, state, status_code, result, body):
+        job_dir = self._job_dir(job_id)
+        # Written under a private name and renamed, so readers never see a partial result
+        partial_path = os.path.join(job_dir, f"result.{uuid.uuid4().hex}.partial")
+        with open(partial_path, "wb") as f:
+            f.write(body)
+        os.replace(partial_path, os.path.join(job_dir, "result.bin"))
+        try:
+            os.remove(os.path.join(job_dir, "request.bin"))
+        except FileNotFoundError:
+            pass
+        now = time.time()
+        stages = json.loads(db.execute("SELECT stages FROM jobs WHERE job_id = ?", (job_id,)).fetchone()[0])
+        stages.append({"stage": state, "at": now})
+        db.execute("UPDATE jobs SET state = ?, finished = ?, expires = ?, status_code = ?, result = ?, stages = ?, "
+                   "lease_until = NULL WHERE job_id = ?",
+                   (state, now, now + self.result_ttl_s, status_code, json.dumps(result), json.dumps(stages), job_id))
+
+    def get(self, job_id):
+        """
+        A job's status and progress, or None for unknown and expired jobs.
+
+        Returns:
+            dict: job_id, route, state, created_at/started_at/finished_at/expires_at, attempts,
+                  `stages` (each with `stage`, `at` and `ms` spent in it so far), `stage` (the
+                  current one), `queue_position` while queued and, once finished, status_code.
+        """
+        row = self._db().execute(
+            "SELECT job_id, route, state, created, started, finished, expires, attempts, stages, status_code "
+            "FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None or (row[6] is not None and row[6] < time.time()):
+            return None
+        job_id, route, state, created, started, finished, expires, attempts, stages, status_code = row
+        stages = json.loads(stages)
+        now = time.time()
+        for stage, following in zip(stages, stages[1:] + [None]):
+            stage["ms"] = round(((following["at"] if following else finished or now) - stage["at"]) * 1000, 1)
+        job = {"job_id": job_id, "route": route, "state": state, "created_at": created, "started_at": started,
+               "finished_at": finished, "expires_at": expires, "attempts": attempts, "stages": stages,
+               "stage": stages[-1]["stage"] if stages else state}
+        if state == "queued":
+            job["queue_position"] = self._db().execute(
+                "SELECT COUNT(*) FROM jobs WHERE state = 'queued' AND created < ?", (created,)).fetchone()[0]
+        if status_code is not None:
+            job["status_code"] = status_code
+        return job
+
+    def result(self, job_id):
+        """
+        A finished job's stored response.
+
+        Returns:
+            tuple: (status_code, mimetype, headers, body), or None if the job is unknown,
+            expired or not finished.
+        """
+        row = self._db().execute("SELECT status_code, result, expires FROM jobs WHERE job_id = ? AND result IS NOT NULL",
+                                 (job_id,)).fetchone()
+        if row is None or row[2] < time.time():
+            return None
+        status_code, result, _ = row
+        result = json.loads(result)
+        try:
+            with open(os.path.join(self._job_dir(job_id), "result.bin"), "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        return status_code, result["mimetype"], result["headers"], body
+
+    def delete(self, job_id):
+        """Removes a job that is not running (cancels it while queued); returns whether it was removed."""
+        db = self._db()
+        removed = db.execute("DELETE FROM jobs WHERE job_id = ? AND state != 'running'", (job_id,)).rowcount
+        if removed:
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+        return bool(removed)
+
+    def sweep(self):
+        """Deletes expired jobs and their files; returns how many."""
+        db = self._db()
+        self._last_sweep = now = time.time()
+        expired = [row[0] for row in db.execute("SELECT job_id FROM jobs WHERE expires < ?", (now,)).fetchall()]
+        for job_id in expired:
+            db.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+        return len(expired)
+
+    def stats(self):
+        counts = dict(self._db().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        return {**{state: counts.get(state, 0) for state in JOB_STATES}, "workers": len(self._workers)}
+
+    def renew_leases(self):
+        """Extends the leases of the jobs running in this process."""
+        with self._running_lock:
+            running = list(self._running)
+        if running:
+            self._db().execute(f"UPDATE jobs SET lease_until = ? WHERE state = 'running' AND job_id IN ({','.join('?' * len(running))})",
+                               (time.time() + self.lease_s, *running))
+
+    def run_job(self, job, handler):
+        """Runs a claimed job through handler(job) -> (status_code, mimetype, body, headers) and stores the response."""
+        _current.job = {"job_id": job["job_id"], "queue": self}
+        with self._running_lock:
+            self._running.add(job["job_id"])
+        try:
+            status_code, mimetype, body, headers = handler(job)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            status_code, mimetype, body, headers = 500, "application/json", json.dumps({"error": str(e)}).encode(), {}
+        finally:
+            _current.job = None
+        try:
+            self.finish(job["job_id"], status_code, mimetype, body, headers)
+        finally:
+            with self._running_lock:
+                self._running.discard(job["job_id"])
+        print(f"030 Job {job['job_id']} ({job['route']}) finished with {status_code}")
+
+    def start_workers(self, handler, count=None, ready=None):
+        """
+        Starts the render threads of this process (once).
+
+        Args:
+            handler: callable(job) -> (status_code, mimetype, body, headers).
+            count (int): threads (JOB_WORKERS by default).
+            ready: callable returning whether jobs can run yet (e.g. the model is loaded);
+                   queued jobs wait until it does.
+        """
+        if self._workers:
+            return
+        count = JOB_WORKERS if count is None else count
+
+        def run():
+            while True:
+                try:
+                    if ready is not None and not ready():
+                        time.sleep(JOB_POLL_S)
+                        continue
+                    if time.time() - self._last_sweep > 60:
+                        self.sweep()
+                    job = self.claim()
+                    if job is None:
+                        # Woken at once by jobs queued in this process, by polling for other processes'
+                        self._wakeup.wait(JOB_POLL_S)
+                        self._wakeup.clear()
+                        continue
+                    self.run_job(job, handler)
+                except Exception as e:
+                    print(f"030 Job worker error: {e}")
+                    time.sleep(JOB_POLL_S)
+
+        def heartbeat():
+            while True:
+                time.sleep(self.lease_s / 3)
+                try:
+                    self.renew_leases()
+                except Exception as e:
+                    print(f"030 Job lease renewal error: {e}")
+
+        for index in range(count):
+            thread = threading.Thread(target=run, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._workers.append(thread)
+        if count:
+            threading.Thread(target=heartbeat, name="job-heartbeat", daemon=True).start()
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """The process-wide queue under JOB_DIR."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
+
+def main():
+    # python jobs.py stats | get <job_id> | sweep
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    queue = get_job_queue()
+    if command == "get" and len(sys.argv) > 2:
+        print(json.dumps(queue.get(sys.argv[2]), indent=2))
+    elif command == "sweep":
+        print(f"030 Removed {queue.sweep()} expired jobs")
+    else:
+        print(queue.stats())
+
+if __name__ == "__main__":
+    main()
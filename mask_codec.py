@@ -0,0 +1,192 @@
+# 026
+
+import json
+import os
+
+import cv2
+import numpy as np
+
+# Default simplification tolerance (px) of polygon masks; approxPolyDP epsilon
+MASK_POLYGON_TOLERANCE = float(os.environ.get("MASK_POLYGON_TOLERANCE", "1.5"))
+
+# Encodings of the `mask_encoding` request option: "image" keeps the red-on-black raster
+MASK_ENCODINGS = ("image", "rle", "polygon")
+# Extension of masks stored as compact JSON RLE (mask_to_bytes())
+MASK_EXT = ".rle.json"
+
+def _rle_counts(mask):
+    """COCO run lengths of a mask: column-major, alternating 0/1 runs, starting with a 0 run."""
+    flat = np.asarray(mask, dtype=bool).ravel(order="F")
+    if flat.size == 0:
+        return []
+    change = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    bounds = np.concatenate(([0], change, [flat.size]))
+    counts = np.diff(bounds).tolist()
+    if flat[0]:
+        counts.insert(0, 0)
+    return counts
+
+def _counts_to_string(counts):
+    """COCO's compressed RLE string (rleToString in pycocotools' maskApi.c)."""
+    chars = []
+    for i, x in enumerate(counts):
+        if i > 2:
+            x -= counts[i - 2]
+        more = True
+        while more:
+            c = x & 0x1f
+            x >>= 5
+            more = x != -1 if c & 0x10 else x != 0
+            if more:
+                c |= 0x20
+            chars.append(chr(c + 48))
+    return "".join(chars)
+
+def _string_to_counts(s):
+    """Inverse of _counts_to_string() (rleFrString in maskApi.c)."""
+    counts = []
+    p = 0
+    while p < len(s):
+        x = k = 0
+        more = True
+        while more:
+            c = ord(s[p]) - 48
+            x |= (c & 0x1f) << 5 * k
+            more = c & 0x20
+            p += 1
+            k += 1
+            if not more and c & 0x10:
+                x |= -1 << 5 * k
+        if len(counts) > 2:
+            x += counts[-2]
+        counts.append(x)
+    return counts
+
+def encode_rle(mask, compressed=True):
+    """
+    COCO-style RLE of a binary mask, compatible with pycocotools.mask.decode().
+
+    Args:
+        mask (np.ndarray): 2D mask; nonzero pixels are foreground.
+        compressed (bool): counts as COCO's compact string (default) or a plain list of ints.
+
+    Returns:
+        dict: {"size": [height, width], "counts": str | list}
+    """
+    counts = _rle_counts(mask)
+    return {"size": [int(mask.shape[0]), int(mask.shape[1])],
+            "counts": _counts_to_string(counts) if compressed else counts}
+
+def decode_rle(rle):
+    """
+    Rasterises a COCO RLE (string or list counts).
+
+    Returns:
+        np.ndarray: uint8 mask, 255 on the foreground.
+    """
+    height, width = rle["size"]
+    counts = rle["counts"]
+    if isinstance(counts, bytes):
+        counts = counts.decode("ascii")
+    if isinstance(counts, str):
+        counts = _string_to_counts(counts)
+    if sum(counts) != height * width:
+        raise ValueError(f"026 RLE counts cover {sum(counts)} pixels, expected {height * width}")
+    values = np.resize(np.array([0, 255], dtype=np.uint8), len(counts))
+    return np.repeat(values, counts).reshape((height, width), order="F")
+
+def encode_polygon(mask, tolerance=None):
+    """
+    Simplified polygons of a binary mask.
+
+    Args:
+        mask (np.ndarray): 2D mask; nonzero pixels are foreground.
+        tolerance (float): approxPolyDP epsilon in pixels (MASK_POLYGON_TOLERANCE by default).
+
+    Returns:
+        dict: {"size": [height, width], "polygons": [[x0, y0, x1, y1, ...], ...], "holes": [...]}.
+              `polygons` are outer boundaries (COCO segmentation format); `holes` are cut out of them.
+    """
+    tolerance = MASK_POLYGON_TOLERANCE if tolerance is None else tolerance
+    binary = (np.asarray(mask) > 0).astype(np.uint8)
+    contours, hierarchy = cv2.findContours(binary, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    polygons, holes = [], []
+    for contour, (_, _, _, parent) in zip(contours, hierarchy[0] if hierarchy is not None else []):
+        if tolerance > 0:
+            contour = cv2.approxPolyDP(contour, tolerance, True)
+        if len(contour) < 3:
+            continue
+        (holes if parent >= 0 else polygons).append(contour.reshape(-1).tolist())
+    return {"size": [int(mask.shape[0]), int(mask.shape[1])], "polygons": polygons, "holes": holes}
+
+def decode_polygon(polygon):
+    """
+    Rasterises encode_polygon() output.
+
+    Returns:
+        np.ndarray: uint8 mask, 255 inside the polygons and outside the holes.
+    """
+    height, width = polygon["size"]
+    mask = np.zeros((height, width), dtype=np.uint8)
+    as_points = lambda flat: np.array(flat, dtype=np.int32).reshape(-1, 1, 2)
+    if polygon["polygons"]:
+        cv2.fillPoly(mask, [as_points(p) for p in polygon["polygons"]], 255)
+    if polygon.get("holes"):
+        # fillPoly would also clear the hole boundary, which findContours traces on foreground pixels
+        holes = np.zeros_like(mask)
+        cv2.fillPoly(holes, [as_points(p) for p in polygon["holes"]], 255)
+        cv2.polylines(holes, [as_points(p) for p in polygon["holes"]], True, 0)
+        mask[holes > 0] = 0
+    return mask
+
+def encode_mask(mask, encoding):
+    """
+    Encodes a binary mask for a response.
+
+    Args:
+        mask (np.ndarray): 2D mask; nonzero pixels are foreground.
+        encoding (str): "rle" or "polygon".
+
+    Returns:
+        dict: the RLE or polygon dict, with its `encoding`.
+    """
+    if encoding == "rle":
+        return dict(encode_rle(mask), encoding="rle")
+    if encoding == "polygon":
+        return dict(encode_polygon(mask), encoding="polygon")
+    raise ValueError(f"026 Unsupported mask_encoding: {encoding}")
+
+def decode_mask(encoded):
+    """Rasterises encode_mask() output (or a bare COCO RLE) into a uint8 mask (255 = foreground)."""
+    if encoded.get("encoding") == "polygon" or "polygons" in encoded:
+        return decode_polygon(encoded)
+    return decode_rle(encoded)
+
+def mask_to_bytes(mask):
+    """Compact JSON RLE of a binary mask, for storing masks (see artifact_store.py)."""
+    return json.dumps(encode_rle(mask), separators=(",", ":")).encode("utf-8")
+
+def mask_from_bytes(data):
+    """Inverse of mask_to_bytes()."""
+    return decode_rle(json.loads(data))
+
+def encode_label_map(label_map):
+    """
+    Row-major run-length encoding of an integer label map (any number of labels), used by the
+    segmentation cache to hold label maps in a fraction of their raster size.
+
+    Returns:
+        tuple: (shape, run starts (int32), run values (label dtype))
+    """
+    flat = np.ascontiguousarray(label_map).ravel()
+    starts = np.concatenate(([0], np.flatnonzero(flat[1:] != flat[:-1]) + 1)).astype(np.int32)
+    return label_map.shape, starts, flat[starts]
+
+def decode_label_map(encoded):
+    """Inverse of encode_label_map()."""
+    shape, starts, values = encoded
+    lengths = np.diff(np.append(starts, int(np.prod(shape))))
+    return np.repeat(values, lengths).reshape(shape)
+
+def encoded_label_map_nbytes(encoded):
+    return encoded[1].nbytes + encoded[2].nbytes
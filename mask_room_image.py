@@ -3,28 +3,20 @@
 import os
 import cv2
 import numpy as np
-from floor_mask_model import load_model, infer
+from floor_mask_model import load_model, infer, resolve_label_id, floor_mask
 
-def scale_room_image(room_image_path,
-                     temp_path="../Floor-Overlay/temporary",
-                     target_resolution=(1920, 1080)):
+def scale_room_image_array(image, target_resolution=(1920, 1080)):
     """
-    Scales a room image to fit within the target resolution (1920x1080)
-    while maintaining aspect ratio. Upscales if below target, downscales if above.
+    In-memory counterpart of scale_room_image(): fits a BGR room image within the target
+    resolution, keeping its aspect ratio.
 
     Args:
-        room_image_path (str): Path to the original room image.
-        temp_path (str): Directory to save the scaled image.
+        image (np.ndarray): BGR room image.
         target_resolution (tuple): Desired (width, height) resolution.
 
     Returns:
-        str: Path to the scaled room image saved in the temporary folder.
+        np.ndarray: the scaled room image.
     """
-    # Load image
-    image = cv2.imread(room_image_path)
-    if image is None:
-        raise FileNotFoundError(f"011 Could not read room image at: {room_image_path}")
-
     orig_height, orig_width = image.shape[:2]
     target_width, target_height = target_resolution
 
@@ -43,6 +35,29 @@ def scale_room_image(room_image_path,
         print(f"011 Scaled room image from ({orig_width}, {orig_height}) to ({new_width}, {new_height})")
     else:
         print(f"011 Room image already at target resolution ({orig_width}, {orig_height})")
+    return image
+
+def scale_room_image(room_image_path,
+                     temp_path="../Floor-Overlay/temporary",
+                     target_resolution=(1920, 1080)):
+    """
+    Scales a room image to fit within the target resolution (1920x1080)
+    while maintaining aspect ratio. Upscales if below target, downscales if above.
+
+    Args:
+        room_image_path (str): Path to the original room image.
+        temp_path (str): Directory to save the scaled image.
+        target_resolution (tuple): Desired (width, height) resolution.
+
+    Returns:
+        str: Path to the scaled room image saved in the temporary folder.
+    """
+    # Load image
+    image = cv2.imread(room_image_path)
+    if image is None:
+        raise FileNotFoundError(f"011 Could not read room image at: {room_image_path}")
+
+    image = scale_room_image_array(image, target_resolution)
 
     # Ensure output folder exists
     os.makedirs(temp_path, exist_ok=True)
@@ -77,6 +92,57 @@ def mask(room_image_path):
         print("011 Feature not found in image. Exiting...")
         return None
 
+def mask_array(room_image):
+    """
+    In-memory counterpart of mask(): returns the floor mask instead of writing it to disk.
+
+    Args:
+        room_image: BGR array or path of the (scaled) room image.
+
+    Returns:
+        np.ndarray: (H, W) uint8 mask with 255 on the floor, or None if no floor is found.
+    """
+    floor = floor_mask(room_image)
+    if floor is None:
+        print("011 Feature not found in image.")
+    return floor
+
+def mask_classes(room_image_path, labels, mask_output_dir="../Floor-Overlay/mask_out"):
+    """
+    Writes masks for several segmentation classes from a single forward pass.
+
+    Args:
+        room_image_path (str): Path to the (scaled) room image.
+        labels (list): ADE class names or ids, e.g. ["floor", "wall", "carpet"].
+        mask_output_dir (str): Directory to save the masks in.
+
+    Returns:
+        dict: label (as given) -> mask path, or None for classes not found in the image.
+    """
+    room_image_name = os.path.splitext(os.path.basename(room_image_path))[0]
+    os.makedirs(mask_output_dir, exist_ok=True)
+
+    result = None
+    mask_paths = {}
+    for label in labels:
+        label_id = resolve_label_id(label)
+        mask_output_path = os.path.join(mask_output_dir, f"{room_image_name}_{label_id}_mask.jpg")
+        if result is None:
+            # The first class runs the model; the rest reuse its result
+            result = infer(room_image_path, 0, mask_output_path, mode=label_id)
+            mask_paths[label] = mask_output_path if result else None
+        elif result.has_class(label_id):
+            mask_paths[label] = result.save_mask(label_id, mask_output_path)
+        else:
+            mask_paths[label] = None
+    print(f"011 Class masks written: {mask_paths}")
+    return mask_paths
+
+def tile_design_array(design_img, multiplier=5):
+    """In-memory counterpart of tileDesign(): the BGR design repeated `multiplier` times each way."""
+    print(f"017 Tiling {multiplier}x horizontally and {multiplier}x vertically.")
+    return np.tile(design_img, (multiplier, multiplier, 1))
+
 def tileDesign(design_path,
                multiplier=5,
                temp_path="../Floor-Overlay/temporary"):
@@ -101,20 +167,8 @@ def tileDesign(design_path,
         print(f"017 Error: Could not read image at path: {design_path}")
         return None
 
-    # Get the dimensions of the single tile
-    tile_height, tile_width, _ = design_img.shape
-
-    # Calculate the new target dimensions based on the multiplier
-    target_width = tile_width * multiplier
-    target_height = tile_height * multiplier
-
-    print(f"017 Tiling {multiplier}x horizontally and {multiplier}x vertically.")
-
-    # Create the tiled image
-    tiled_image = np.tile(design_img, (multiplier, multiplier, 1))
-
-    # Crop the tiled image to the target dimensions (which are now based on the multiplier)
-    tiled_image_cropped = tiled_image[0:target_height, 0:target_width]
+    # Create the tiled image (exactly `multiplier` tiles each way, so no cropping is needed)
+    tiled_image_cropped = tile_design_array(design_img, multiplier)
 
     # Ensure the output directory exists
     os.makedirs(temp_path, exist_ok=True)
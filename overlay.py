@@ -1,14 +1,17 @@
 # 015
 
 import os
+import time
+import uuid
 import cv2
 import numpy as np
-from scale_and_overlay import place_on_black
-from convert_binary import convert_to_binary_mask, convert_to_binary_carpet
-from carpet_circle import carpet_ellipse_and_center
+from scale_and_overlay import place_on_black, place_on_black_array
+from convert_binary import convert_to_binary_mask, convert_to_binary_carpet, convert_to_binary_carpet_array
+from carpet_circle import carpet_ellipse_and_center, carpet_circle_array, carpet_ellipse_and_center_array
+from temp_dirs import request_temp_dir
 
-def adjust_carpet_perspective(carpet_img_path, temp_path="../Floor-Overlay/temporary"):
-    image = cv2.imread(carpet_img_path)
+def adjust_carpet_perspective_array(image):
+    """In-memory counterpart of adjust_carpet_perspective(): narrows the top edge of the BGR carpet."""
     h, w = image.shape[:2]
 
     # Define the source points (corners of the original image)
@@ -32,7 +35,10 @@ def adjust_carpet_perspective(carpet_img_path, temp_path="../Floor-Overlay/tempo
     matrix = cv2.getPerspectiveTransform(src_pts, dst_pts)
 
     # Apply the perspective transformation, explicitly setting border properties for clarity and robustness
-    warped = cv2.warpPerspective(image, matrix, (w, h), borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+    return cv2.warpPerspective(image, matrix, (w, h), borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+
+def adjust_carpet_perspective(carpet_img_path, temp_path="../Floor-Overlay/temporary"):
+    warped = adjust_carpet_perspective_array(cv2.imread(carpet_img_path))
 
     warped_img_path = os.path.join(temp_path, "warped_carpet_image.jpg") # Or "carpet_trapezoid.jpg" if preferred
     cv2.imwrite(warped_img_path, warped)
@@ -45,8 +51,13 @@ def apply_transparency_to_black_background(
         overlay_type="ellipse",
         carpet_dimensions=None,
         output_path="../Floor-Overlay/final_out",
-        temp_path = "../Floor-Overlay/temporary"):
-    
+        temp_path=None):
+    if temp_path is None:
+        # Intermediates use fixed file names, so each call gets a private directory
+        with request_temp_dir() as temp_path:
+            return apply_transparency_to_black_background(
+                room_img_path, carpet_img_path, overlay_type, carpet_dimensions, output_path, temp_path)
+
     carpet_on_black_path = None
     binary_carpet_mask_path = None
     room_image_name = os.path.splitext(os.path.basename(room_img_path))[0]
@@ -91,7 +102,7 @@ def apply_transparency_to_black_background(
         print(f"015 Error: Invalid overlay_type '{overlay_type}'. Please use 'ellipse'/'e' or 'trapezoid'/'t'.")
         return
 
-    output_filename = f"transparent_carpet_{type_abbr}_{room_image_name}.png"
+    output_filename = f"transparent_carpet_{type_abbr}_{room_image_name}_{uuid.uuid4().hex[:8]}.png"
     final_output_path = os.path.join(output_path, output_filename)
 
     print(f"015 Applying transparency to the generated '{overlay_type}' carpet on black background...")
@@ -103,6 +114,23 @@ def apply_transparency_to_black_background(
         print("015 Error: Could not load intermediate images for transparency application.")
         return
 
+    transparent_image = transparent_carpet_array(carpet_on_black, binary_carpet_mask)
+
+    cv2.imwrite(final_output_path, transparent_image)
+    print(f"015 Final transparent image saved to: {final_output_path}")
+    return final_output_path
+
+def transparent_carpet_array(carpet_on_black, binary_carpet_mask):
+    """
+    BGRA carpet with a feathered alpha edge; black pixels inside the carpet stay opaque.
+
+    Args:
+        carpet_on_black (np.ndarray): room-sized BGR carpet on black.
+        binary_carpet_mask (np.ndarray): uint8 mask, 255 on the carpet.
+
+    Returns:
+        np.ndarray: BGRA image.
+    """
     if len(carpet_on_black.shape) < 3 or carpet_on_black.shape[2] == 1:
         carpet_on_black = cv2.cvtColor(carpet_on_black, cv2.COLOR_GRAY2BGR)
 
@@ -140,14 +168,87 @@ def apply_transparency_to_black_background(
 
     # --- END OF MODIFICATIONS ---
 
-    cv2.imwrite(final_output_path, transparent_image)
-    print(f"015 Final transparent image saved to: {final_output_path}")
-    return final_output_path
+    return transparent_image
+
+def crop_layer(layer):
+    """
+    Crops a BGRA layer to the bounding box of its visible (alpha > 0) pixels.
+
+    Args:
+        layer (np.ndarray): frame-sized BGRA layer, e.g. from apply_transparency_array().
+
+    Returns:
+        tuple: (cropped BGRA layer, (x, y) of its top-left corner in the frame). A fully
+        transparent layer crops to a single transparent pixel at (0, 0).
+    """
+    x, y, w, h = cv2.boundingRect(layer[:, :, 3])
+    if w == 0 or h == 0:
+        return np.zeros((1, 1, 4), dtype=layer.dtype), (0, 0)
+    return layer[y:y + h, x:x + w], (x, y)
+
+def apply_transparency_array(room_image, carpet_image, overlay_type="ellipse", carpet_dimensions=None, floor_mask=None, timings=None,
+                             shaped_carpet=None, floor_center=None):
+    """
+    In-memory counterpart of apply_transparency_to_black_background(): every intermediate stays
+    an array, nothing is written to or read back from disk.
+
+    Args:
+        room_image (np.ndarray): BGR (scaled) room image.
+        carpet_image (np.ndarray): BGR carpet image.
+        overlay_type (str): "ellipse"/"e" or "trapezoid"/"t".
+        carpet_dimensions (str): "width/height" in feet.
+        floor_mask (np.ndarray): precomputed floor mask; segmentation is skipped when given.
+        timings (dict): if given, filled with the milliseconds spent in each stage.
+        shaped_carpet (np.ndarray): the carpet already shaped for overlay_type (e.g. a catalog
+                                    variant, see catalog.py); carpet_image is then not used.
+        floor_center (tuple): precomputed (cx, cy) the carpet is centred on (e.g. from a room
+                              session, see room_sessions.py).
+
+    Returns:
+        np.ndarray: room-sized BGRA transparent carpet, or None on failure.
+    """
+    timings = timings if timings is not None else {}
+    started = time.perf_counter()
+
+    def lap(stage):
+        nonlocal started
+        now = time.perf_counter()
+        timings[stage] = (now - started) * 1000
+        started = now
+
+    if shaped_carpet is not None:
+        print(f"015 Using the pre-shaped {overlay_type} carpet...")
+    elif overlay_type.lower() in ["ellipse", "e"]:
+        print(f"015 Preparing elliptical carpet for transparency...")
+        shaped_carpet, _ = carpet_ellipse_and_center_array(carpet_circle_array(carpet_image))
+    elif overlay_type.lower() in ["trapezoid", "t"]:
+        print(f"015 Preparing trapezoidal carpet for transparency...")
+        shaped_carpet = adjust_carpet_perspective_array(carpet_image)
+    else:
+        print(f"015 Error: Invalid overlay_type '{overlay_type}'. Please use 'ellipse'/'e' or 'trapezoid'/'t'.")
+        return
+    lap("shape_carpet")
+
+    carpet_on_black = place_on_black_array(room_image, shaped_carpet, carpet_dimensions=carpet_dimensions, floor_mask=floor_mask,
+                                           floor_center=floor_center)
+    if carpet_on_black is None:
+        print("015 Failed to place carpet on black background. Aborting transparency application.")
+        return
+    lap("place_on_black")
+
+    binary_carpet_mask = convert_to_binary_carpet_array(carpet_on_black)
+    lap("binary_carpet")
+
+    transparent_image = transparent_carpet_array(carpet_on_black, binary_carpet_mask)
+    lap("transparency")
+    return transparent_image
 
-def overlay_carpet_trapezoid(room_img_path, carpet_img_path, carpet_dimensions=None, output_path="../Floor-Overlay/final_out"):
+def overlay_carpet_trapezoid(room_img_path, carpet_img_path, carpet_dimensions=None, output_path="../Floor-Overlay/final_out", temp_path=None):
     os.makedirs(output_path, exist_ok=True)
-    temp_path = "../Floor-Overlay/temporary"
-    os.makedirs(temp_path, exist_ok=True)
+    if temp_path is None:
+        # Intermediates use fixed file names, so each call gets a private directory
+        with request_temp_dir() as temp_path:
+            return overlay_carpet_trapezoid(room_img_path, carpet_img_path, carpet_dimensions, output_path, temp_path)
 
     warped_carpet_img_path = adjust_carpet_perspective(carpet_img_path, temp_path=temp_path)
     room_img = cv2.imread(room_img_path)
@@ -187,14 +288,16 @@ def overlay_carpet_trapezoid(room_img_path, carpet_img_path, carpet_dimensions=N
 
     result = np.clip(result_float, 0, 255).astype(np.uint8)
 
-    result_img_path = os.path.join(output_path, f"overlayed_carpet_t_{room_image_name}.jpg")
+    result_img_path = os.path.join(output_path, f"overlayed_carpet_t_{room_image_name}_{uuid.uuid4().hex[:8]}.jpg")
     cv2.imwrite(result_img_path, result)
     return result_img_path
 
-def overlay_carpet_ellipse(room_img_path, carpet_img_path, carpet_dimensions=None, output_path="../Floor-Overlay/final_out"):
+def overlay_carpet_ellipse(room_img_path, carpet_img_path, carpet_dimensions=None, output_path="../Floor-Overlay/final_out", temp_path=None):
     os.makedirs(output_path, exist_ok=True)
-    temp_path = "../Floor-Overlay/temporary"
-    os.makedirs(temp_path, exist_ok=True)
+    if temp_path is None:
+        # Intermediates use fixed file names, so each call gets a private directory
+        with request_temp_dir() as temp_path:
+            return overlay_carpet_ellipse(room_img_path, carpet_img_path, carpet_dimensions, output_path, temp_path)
 
     ellipse_carpet_path, ellipse_carpet_center = carpet_ellipse_and_center(carpet_img_path, temp_path=temp_path)
     room_img = cv2.imread(room_img_path)
@@ -234,7 +337,7 @@ def overlay_carpet_ellipse(room_img_path, carpet_img_path, carpet_dimensions=Non
 
     result = np.clip(result_float, 0, 255).astype(np.uint8)
 
-    result_img_path = os.path.join(output_path, f"overlayed_carpet_e_{room_image_name}.jpg")
+    result_img_path = os.path.join(output_path, f"overlayed_carpet_e_{room_image_name}_{uuid.uuid4().hex[:8]}.jpg")
     cv2.imwrite(result_img_path, result)
     return result_img_path
 
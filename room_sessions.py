@@ -0,0 +1,265 @@
+# 029
+
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from carpet_working import floor_geometry
+from find_centroid import largest_contour_centroid
+from floor_mask_model import SegmentationResult, FLOOR_LABEL_ID, _as_pil_rgb
+
+# Room sessions: <ROOM_SESSION_DIR>/<room_id>/ holds the scaled room, its segmentation and the
+# floor geometry, so a room uploaded through one worker can be rendered by any worker on the host
+ROOM_SESSION_DIR = os.environ.get("ROOM_SESSION_DIR", "../Floor-Overlay/room_sessions")
+# Lifetime of a session from its creation; expired sessions return 404 and are swept on create
+ROOM_SESSION_TTL_S = float(os.environ.get("ROOM_SESSION_TTL_S", 1800))
+# Memory budget of loaded sessions (LRU); a 1080p room with its masks is about 10 MB
+ROOM_SESSION_CACHE_MAX_BYTES = int(os.environ.get("ROOM_SESSION_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+class UnknownRoom(KeyError):
+    """The room id was never created, has expired or was deleted."""
+
+class RoomSession:
+    """
+    Everything a carpet or floor render needs from the room: the scaled room, its segmentation
+    (so `mask_classes` still need no forward pass), the floor mask, the floor's convex hull and
+    ordered corners (the homography inputs of carpet_working.py) and the floor centroid the
+    carpet is centred on. Shared read-only by concurrent renders.
+    """
+
+    def __init__(self, meta, room, panoptic_map, segmentation=None):
+        self.meta = meta
+        self.room_id = meta["room_id"]
+        self.room = room
+        self.room.flags.writeable = False
+        # The segmentation the session was created from keeps its already upsampled class masks
+        if segmentation is None:
+            segmentation = SegmentationResult(panoptic_map, meta["segments"], _as_pil_rgb(room), FLOOR_LABEL_ID)
+        self.segmentation = segmentation
+        self.floor_mask = self.segmentation.binary_mask(FLOOR_LABEL_ID)
+        self.floor_mask.flags.writeable = False
+        self.floor_center = tuple(meta["floor_center"]) if meta.get("floor_center") else None
+        self.geometry = None
+        if meta.get("corners"):
+            self.geometry = {"contour": np.array(meta["contour"], dtype=np.int32),
+                             "corners": np.array(meta["corners"], dtype=np.int32), "binary_mask": self.floor_mask}
+
+    @classmethod
+    def from_segmentation(cls, room, segmentation, room_id=None, ttl_s=0.0):
+        """
+        The session of a freshly segmented room, not stored anywhere (RoomSessions.create()
+        stores one). The overlay routes also render uploaded rooms through one of these.
+
+        Args:
+            room (np.ndarray): scaled BGR room image.
+            segmentation (SegmentationResult): its segmentation.
+            room_id (str): id of a stored session.
+            ttl_s (float): lifetime of a stored session.
+        """
+        floor_mask = segmentation.binary_mask(FLOOR_LABEL_ID)
+        try:
+            geometry = floor_geometry(floor_mask) if floor_mask.any() else None
+        except (ValueError, IndexError):
+            # Degenerate floors (a point or a line) have no corners; renders then fail as before
+            geometry = None
+        center = largest_contour_centroid(floor_mask)
+        now = time.time()
+        meta = {"room_id": room_id, "created_at": now, "expires_at": now + ttl_s, "ttl_s": ttl_s,
+                "size": [room.shape[1], room.shape[0]], "labels": segmentation.label_ids,
+                "segments": [{"id": int(info["id"]), "label_id": int(info["label_id"])} for info in segmentation.segments_info],
+                "floor_center": list(center) if center else None,
+                "corners": geometry["corners"].tolist() if geometry else None,
+                "contour": geometry["contour"].tolist() if geometry else None}
+        return cls(meta, room, segmentation.panoptic_map, segmentation)
+
+    @property
+    def expired(self):
+        return time.time() >= self.meta["expires_at"]
+
+    @property
+    def nbytes(self):
+        return self.room.nbytes + self.segmentation.panoptic_map.nbytes + self.floor_mask.nbytes * 2
+
+class RoomSessions:
+    """
+    Room sessions by id, kept in memory (LRU) and on disk.
+
+    create() stores a segmented room and returns its session; load() returns it from memory or,
+    on a miss, reads it from disk, so sessions created by one worker are usable by all. Safe to
+    use from several threads.
+    """
+
+    def __init__(self, root=None, ttl_s=None, cache_max_bytes=None):
+        self.root = root or ROOM_SESSION_DIR
+        self.ttl_s = ROOM_SESSION_TTL_S if ttl_s is None else ttl_s
+        self.cache_max_bytes = ROOM_SESSION_CACHE_MAX_BYTES if cache_max_bytes is None else cache_max_bytes
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "hits": 0, "misses": 0, "expired": 0}
+        self._last_sweep = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    def _session_dir(self, room_id):
+        if not isinstance(room_id, str) or not room_id.isalnum() or len(room_id) > 64:
+            raise UnknownRoom(f"029 Unknown room id: {room_id}")
+        return os.path.join(self.root, room_id)
+
+    def create(self, room, segmentation):
+        """
+        Stores a room and its segmentation as a new session.
+
+        Args:
+            room (np.ndarray): scaled BGR room image, as the overlay routes render on.
+            segmentation (SegmentationResult): its segmentation (segment_image()).
+
+        Returns:
+            RoomSession
+        """
+        if time.time() - self._last_sweep > 60:
+            self.sweep()
+        room_id = uuid.uuid4().hex
+        session = RoomSession.from_segmentation(room.copy(), segmentation, room_id, self.ttl_s)
+
+        # Written to a scratch directory and renamed into place, so other workers never read half a session
+        scratch = os.path.join(self.root, f".tmp-{room_id}")
+        os.makedirs(scratch)
+        try:
+            cv2.imwrite(os.path.join(scratch, "room.png"), session.room)
+            np.savez_compressed(os.path.join(scratch, "panoptic.npz"), panoptic_map=segmentation.panoptic_map)
+            with open(os.path.join(scratch, "meta.json"), "w") as f:
+                json.dump(session.meta, f)
+            os.replace(scratch, self._session_dir(room_id))
+        except BaseException:
+            shutil.rmtree(scratch, ignore_errors=True)
+            raise
+        self._remember(session)
+        with self._lock:
+            self._stats["created"] += 1
+        print(f"029 Created room session {room_id} (expires in {self.ttl_s:.0f} s)")
+        return session
+
+    def info(self, room_id):
+        """Metadata of a live session, or None."""
+        try:
+            with open(os.path.join(self._session_dir(room_id), "meta.json")) as f:
+                meta = json.load(f)
+        except (FileNotFoundError, UnknownRoom):
+            return None
+        return meta if time.time() < meta["expires_at"] else None
+
+    def load(self, room_id):
+        """
+        A live session.
+
+        Raises:
+            UnknownRoom: the session does not exist (any more).
+        """
+        session_dir = self._session_dir(room_id)
+        with self._lock:
+            session = self._cache.get(room_id)
+            # The meta file is checked so a session deleted through another worker is gone here too
+            if session is not None and not session.expired and os.path.exists(os.path.join(session_dir, "meta.json")):
+                self._cache.move_to_end(room_id)
+                self._stats["hits"] += 1
+                return session
+            if session is not None:
+                self._forget(room_id)
+            self._stats["misses"] += 1
+
+        meta = self.info(room_id)
+        if meta is None:
+            with self._lock:
+                self._stats["expired"] += os.path.isdir(session_dir)
+            raise UnknownRoom(f"029 Unknown or expired room id: {room_id}")
+        room = cv2.imread(os.path.join(session_dir, "room.png"), cv2.IMREAD_COLOR)
+        with np.load(os.path.join(session_dir, "panoptic.npz")) as arrays:
+            panoptic_map = arrays["panoptic_map"]
+        if room is None:
+            raise UnknownRoom(f"029 Could not read room session {room_id}")
+        session = RoomSession(meta, room, panoptic_map)
+        self._remember(session)
+        return session
+
+    def _remember(self, session):
+        if session.nbytes > self.cache_max_bytes:
+            return
+        with self._lock:
+            self._forget(session.room_id)
+            self._cache[session.room_id] = session
+            self._cache_bytes += session.nbytes
+            while self._cache_bytes > self.cache_max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= evicted.nbytes
+
+    def _forget(self, room_id):
+        session = self._cache.pop(room_id, None)
+        if session is not None:
+            self._cache_bytes -= session.nbytes
+
+    def delete(self, room_id):
+        """Removes a session; returns whether it existed."""
+        session_dir = self._session_dir(room_id)
+        with self._lock:
+            self._forget(room_id)
+        if not os.path.isdir(session_dir):
+            return False
+        shutil.rmtree(session_dir, ignore_errors=True)
+        return True
+
+    def sweep(self):
+        """Deletes expired sessions (and scratch directories left by crashed writers); returns how many."""
+        removed = 0
+        now = self._last_sweep = time.time()
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if name.startswith(".tmp-"):
+                    expired = now - os.path.getmtime(path) > 3600
+                else:
+                    with open(os.path.join(path, "meta.json")) as f:
+                        expired = now >= json.load(f)["expires_at"]
+            except (OSError, ValueError, KeyError):
+                expired = not name.startswith(".tmp-")
+            if expired:
+                shutil.rmtree(path, ignore_errors=True)
+                with self._lock:
+                    self._forget(name)
+                removed += 1
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._cache), cache_bytes=self._cache_bytes)
+
+_sessions = None
+_sessions_lock = threading.Lock()
+
+def get_room_sessions():
+    """Process-wide RoomSessions."""
+    global _sessions
+    with _sessions_lock:
+        if _sessions is None:
+            _sessions = RoomSessions()
+        return _sessions
+
+def main():
+    # python room_sessions.py [info <room_id> | sweep]
+    sessions = get_room_sessions()
+    if len(sys.argv) > 2 and sys.argv[1] == "info":
+        print(sessions.info(sys.argv[2]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "sweep":
+        print(f"029 Removed {sessions.sweep()} expired session(s)")
+    else:
+        print(sorted(name for name in os.listdir(sessions.root) if not name.startswith(".")))
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,19 @@ import cv2
 import numpy as np
 
 
-def scale_carpet(room_img_path, carpet_img_path, carpet_dimensions=None, temp_path="../Floor-Overlay/temporary"):
-    ref_image = cv2.imread(room_img_path)
-    ref_height, ref_width = ref_image.shape[:2]
+def scale_carpet_array(room_image, carpet_image, carpet_dimensions=None):
+    """
+    In-memory counterpart of scale_carpet(): resizes the carpet to a third of the room.
+
+    Args:
+        room_image (np.ndarray): BGR room image (only its size is used).
+        carpet_image (np.ndarray): BGR carpet image.
+        carpet_dimensions (str): "width/height" in feet, e.g. "13/9".
+
+    Returns:
+        np.ndarray: the resized carpet.
+    """
+    ref_height, ref_width = room_image.shape[:2]
 
     if carpet_dimensions:
         try:
@@ -25,14 +35,17 @@ def scale_carpet(room_img_path, carpet_img_path, carpet_dimensions=None, temp_pa
         max_width = max(1, ref_width // 3)
         max_height = max(1, ref_height // 3)
 
-    img = cv2.imread(carpet_img_path)
-    img_height, img_width = img.shape[:2]
+    img_height, img_width = carpet_image.shape[:2]
 
     scale_factor = min(max_width / img_width, max_height / img_height)
     new_width = int(img_width * scale_factor)
     new_height = int(img_height * scale_factor)
 
-    resized_img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_AREA)
+    return cv2.resize(carpet_image, (new_width, new_height), interpolation=cv2.INTER_AREA)
+
+def scale_carpet(room_img_path, carpet_img_path, carpet_dimensions=None, temp_path="../Floor-Overlay/temporary"):
+    resized_img = scale_carpet_array(cv2.imread(room_img_path), cv2.imread(carpet_img_path), carpet_dimensions)
+    new_height, new_width = resized_img.shape[:2]
 
     output_folder = temp_path
     os.makedirs(output_folder, exist_ok=True)
@@ -41,13 +54,18 @@ def scale_carpet(room_img_path, carpet_img_path, carpet_dimensions=None, temp_pa
     print(f"014 Resized image saved as {scaled_carpet_path} with dimensions {new_width}x{new_height}")
     return scaled_carpet_path
 
+def create_black_image_array(room_image):
+    """Black BGR image the size of the room image."""
+    ref_height, ref_width = room_image.shape[:2]
+    return np.zeros((ref_height, ref_width, 3), dtype=np.uint8)
+
 def create_black_image(room_img_path, temp_path="../Floor-Overlay/temporary"):
     # Load the reference image to get its dimensions
     ref_img = cv2.imread(room_img_path)
     ref_height, ref_width = ref_img.shape[:2]
 
     # Create a black image of the same dimensions
-    black_img = np.zeros((ref_height, ref_width, 3), dtype=np.uint8)
+    black_img = create_black_image_array(ref_img)
 
     # Ensure the "temporary" folder exists
     output_folder = temp_path
@@ -63,15 +81,10 @@ def create_black_image(room_img_path, temp_path="../Floor-Overlay/temporary"):
     return black_blank_img_path
 
 
-def place_on_black(room_img_path, carpet_img_path, carpet_dimensions=None, temp_path="../Floor-Overlay/temporary"):
-    center_of_mask = find_and_mark_floor_center(room_img_path, temp_path)
-    x, y = center_of_mask
-    background_path = create_black_image(room_img_path, temp_path)
-    foreground_path = scale_carpet(room_img_path, carpet_img_path, carpet_dimensions=carpet_dimensions, temp_path=temp_path)
-
-    background = cv2.imread(background_path)
+def _paste_centered(background, foreground, center):
+    """Pastes foreground onto background centred on `center`, shifted to stay inside the frame."""
+    x, y = center
     h2, w2, _ = background.shape
-    foreground = cv2.imread(foreground_path)
     h1, w1, _ = foreground.shape
 
     x1_start = x - w1 // 2
@@ -93,6 +106,35 @@ def place_on_black(room_img_path, carpet_img_path, carpet_dimensions=None, temp_
         y1_start = max(0, h2 - h1)
 
     background[y1_start:y1_end, x1_start:x1_end] = foreground[:y1_end - y1_start, :x1_end - x1_start]
+    return background
+
+def place_on_black_array(room_image, carpet_image, carpet_dimensions=None, floor_mask=None, floor_center=None):
+    """
+    In-memory counterpart of place_on_black(): the scaled carpet centred on the floor, on black.
+
+    Args:
+        room_image (np.ndarray): BGR (scaled) room image.
+        carpet_image (np.ndarray): BGR carpet (already shaped as ellipse/trapezoid).
+        carpet_dimensions (str): "width/height" in feet.
+        floor_mask (np.ndarray): precomputed floor mask; segmentation is skipped when given.
+        floor_center (tuple): precomputed (cx, cy) of the floor; the mask is then not searched.
+
+    Returns:
+        np.ndarray: room-sized BGR image, or None if no floor is found.
+    """
+    center_of_mask = floor_center or find_and_mark_floor_center(room_image, floor_mask=floor_mask, save_marked_image=False)
+    if center_of_mask is None:
+        return None
+    background = create_black_image_array(room_image)
+    foreground = scale_carpet_array(room_image, carpet_image, carpet_dimensions)
+    return _paste_centered(background, foreground, center_of_mask)
+
+def place_on_black(room_img_path, carpet_img_path, carpet_dimensions=None, temp_path="../Floor-Overlay/temporary"):
+    center_of_mask = find_and_mark_floor_center(room_img_path, temp_path)
+    background_path = create_black_image(room_img_path, temp_path)
+    foreground_path = scale_carpet(room_img_path, carpet_img_path, carpet_dimensions=carpet_dimensions, temp_path=temp_path)
+
+    background = _paste_centered(cv2.imread(background_path), cv2.imread(foreground_path), center_of_mask)
     overlayed_binary_carpet_path = os.path.join(temp_path, "overlayed_carpet.jpg")
     cv2.imwrite(overlayed_binary_carpet_path, background)
     print(f"014 Image saved as {overlayed_binary_carpet_path}")
@@ -0,0 +1,24 @@
+# 023
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+# Parent of the per-request scratch directories. The file-based helpers (scale_room_image,
+# tileDesign, place_on_black, convert_to_binary_carpet, carpet_circle, ...) write fixed file
+# names into their temp_path, so concurrent callers must each pass a directory of their own.
+TEMP_ROOT = os.environ.get("TEMP_ROOT", "../Floor-Overlay/temporary")
+
+@contextmanager
+def request_temp_dir(root=None):
+    """
+    Private scratch directory for one request or pipeline run, removed with everything in it
+    when the block exits.
+
+    Yields:
+        str: path of the new directory (under TEMP_ROOT by default).
+    """
+    root = root or TEMP_ROOT
+    os.makedirs(root, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="req_", dir=root) as temp_path:
+        yield temp_path
@@ -0,0 +1,17 @@
+import pytest
+
+from artifact_store import _parse_persist
+
+
+def test_every_route_keeps_its_artifacts_by_default():
+    # The routes wrote their inputs to inputRoom/, inputCarpet/, ... before the store existed
+    levels = _parse_persist("")
+    for route in ("overlayCarpet", "overlayFloor", "overlayWall", "overlayVideo", "rooms", "overlayBatch"):
+        assert levels[route] == "all"
+
+
+def test_routes_can_be_turned_down():
+    levels = _parse_persist("overlayCarpet=none, /overlayFloor=outputs")
+    assert (levels["overlayCarpet"], levels["overlayFloor"], levels["overlayWall"]) == ("none", "outputs", "all")
+    with pytest.raises(ValueError):
+        _parse_persist("overlayFloor=everything")
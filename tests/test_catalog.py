@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import catalog
+from catalog import Catalog
+
+
+@pytest.fixture
+def design():
+    return np.full((32, 48, 3), (40, 90, 160), dtype=np.uint8)
+
+
+@pytest.fixture
+def store(tmp_path, design):
+    store = Catalog(root=str(tmp_path / "catalog"))
+    store.register("design", design, "oak")
+    store.register("carpet", design, "rug")
+    return store
+
+
+@pytest.mark.parametrize("asset_id", [".", "..", "...", ".hidden", "-x", "a/b", "../designs", "oak\n", "x" * 65])
+def test_invalid_ids_are_rejected(store, design, asset_id):
+    with pytest.raises(ValueError):
+        store.delete("carpet", asset_id)
+    with pytest.raises(ValueError):
+        store.register("carpet", design, asset_id)
+    assert store.list("carpet") == ["rug"]
+    assert store.list("design") == ["oak"]
+
+
+def test_symlinked_asset_dir_is_rejected(store, tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (tmp_path / "catalog" / "carpets" / "link").symlink_to(outside)
+    with pytest.raises(ValueError):
+        store.delete("carpet", "link")
+    assert outside.is_dir()
+
+
+def test_dotted_ids_still_work(store, design):
+    store.register("design", design, "oak.v2-1_b")
+    assert store.load("design", "oak.v2-1_b").shape == design.shape
+    assert store.delete("design", "oak.v2-1_b")
+
+
+@pytest.mark.parametrize("asset_id", [".", ".."])
+def test_delete_route_rejects_dot_ids(app_module, store, monkeypatch, asset_id):
+    monkeypatch.setattr(catalog, "_catalog", store)
+    client = app_module.app.test_client()
+    for kinds in ("carpets", "designs"):
+        assert client.delete(f"/catalog/{kinds}/{asset_id}").status_code == 400
+        assert client.get(f"/catalog/{kinds}/{asset_id}").status_code == 400
+    assert client.get("/catalog/carpets/rug").status_code == 200
+    assert client.get("/catalog/designs/oak").status_code == 200
+    assert store.load("carpet", "rug", "ellipse") is not None
@@ -0,0 +1,187 @@
+import base64
+import email.utils
+import http.server
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from image_fetch import ImageFetcher
+
+
+def png(seed, size=(300, 400)):
+    image = np.random.default_rng(seed).integers(0, 255, (*size, 3), dtype=np.uint8)
+    return image, cv2.imencode(".png", image)[1].tobytes()
+
+
+ROOM, ROOM_PNG = png(0)
+CARPET, CARPET_PNG = png(1)
+CARPET_V2, CARPET_V2_PNG = png(2)
+
+
+@pytest.fixture
+def server():
+    """
+    Local stand-in for a catalog server: /<name> serves images[name] = (body, version) with an
+    ETag and a Last-Modified date and answers conditional requests with 304; /slow/<name>
+    stalls before answering; /big announces more than any test cap; /stale/<name> answers 304
+    `stale_304s` times even to unconditional requests (a misbehaving proxy). Counts requests
+    per path.
+    """
+    images = {"room.png": (ROOM_PNG, 1), "carpet.png": (CARPET_PNG, 1), "nostore.png": (CARPET_PNG, 1)}
+    hits = {}
+    state = {"stale_304s": 1}
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def reply(self, status, headers=None, body=b""):
+            self.send_response(status)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            hits[self.path] = hits.get(self.path, 0) + 1
+            name = self.path.rsplit("/", 1)[-1]
+            if self.path.startswith("/slow/"):
+                time.sleep(0.5)
+            if self.path == "/big":
+                self.send_response(200)
+                self.send_header("Content-Length", str(64 * 1024 * 1024))
+                self.end_headers()
+                return
+            if self.path.startswith("/stale/") and state["stale_304s"] > 0:
+                state["stale_304s"] -= 1
+                return self.reply(304)
+            if name not in images:
+                return self.reply(404)
+            body, version = images[name]
+            etag = f'"{version}"'
+            if self.headers.get("If-None-Match") == etag:
+                return self.reply(304, {"ETag": etag})
+            headers = {"Content-Type": "image/png", "ETag": etag, "Last-Modified": email.utils.formatdate(usegmt=True)}
+            if name.startswith("nostore"):
+                headers["Cache-Control"] = "no-store"
+            self.reply(200, headers, body)
+
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    # Clients that time out on /slow/ leave broken pipes behind
+    httpd.handle_error = lambda request, client_address: None
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    httpd.base = f"http://127.0.0.1:{httpd.server_port}"
+    httpd.images, httpd.hits, httpd.state = images, hits, state
+    yield httpd
+    httpd.shutdown()
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    return ImageFetcher(cache_dir=str(tmp_path / "cache"), max_bytes=1024 * 1024, timeout=(1, 2))
+
+
+def expire(fetcher):
+    for entry in fetcher._cache.values():
+        entry.expires = 0
+
+
+@pytest.fixture
+def load_input_images(app_module, fetcher, monkeypatch):
+    """app.load_input_images(), the routes' way of reading base64/URL inputs, on the test fetcher."""
+    monkeypatch.setattr(app_module, "get_fetcher", lambda: fetcher)
+    return app_module.load_input_images
+
+
+def test_concurrent_fetch_decodes_every_image(server, load_input_images):
+    fetched = load_input_images({"room": f"{server.base}/room.png", "carpet": f"{server.base}/carpet.png",
+                                 "design": base64.b64encode(CARPET_V2_PNG).decode("ascii")})
+    assert list(fetched) == ["room", "carpet", "design"]
+    assert np.array_equal(fetched["room"], ROOM)
+    assert np.array_equal(fetched["carpet"], CARPET)
+    assert np.array_equal(fetched["design"], CARPET_V2)
+
+
+def test_fresh_hit_makes_no_request_and_returns_a_copy(server, fetcher):
+    fetcher.fetch_image(f"{server.base}/room.png")[:] = 0
+    assert np.array_equal(fetcher.fetch_image(f"{server.base}/room.png"), ROOM)
+    assert server.hits["/room.png"] == 1
+
+
+def test_concurrent_fetches_of_one_url_share_a_download(server, fetcher):
+    results = fetcher.fetch_images({str(i): f"{server.base}/slow/carpet.png" for i in range(4)})
+    assert server.hits["/slow/carpet.png"] == 1
+    assert all(np.array_equal(result, CARPET) for result in results.values())
+
+
+def test_slow_responses_time_out(server):
+    with pytest.raises(ConnectionError):
+        ImageFetcher(cache_dir="", timeout=(1, 0.1)).fetch_image(f"{server.base}/slow/room.png")
+
+
+def test_expired_entry_is_revalidated(server, fetcher):
+    fetcher.fetch_image(f"{server.base}/room.png")
+    expire(fetcher)
+    assert np.array_equal(fetcher.fetch_image(f"{server.base}/room.png"), ROOM)
+    assert server.hits["/room.png"] == 2
+    assert fetcher.stats()["revalidated"] == 1
+
+
+def test_changed_etag_downloads_the_new_image(server, fetcher):
+    fetcher.fetch_image(f"{server.base}/carpet.png")
+    server.images["carpet.png"] = (CARPET_V2_PNG, 2)
+    expire(fetcher)
+    assert np.array_equal(fetcher.fetch_image(f"{server.base}/carpet.png"), CARPET_V2)
+
+
+def test_disk_cache_serves_another_worker(server, fetcher):
+    fetcher.fetch_image(f"{server.base}/carpet.png")
+    other = ImageFetcher(cache_dir=fetcher.cache_dir, max_bytes=1024 * 1024)
+    assert np.array_equal(other.fetch_image(f"{server.base}/carpet.png"), CARPET)
+    assert server.hits["/carpet.png"] == 1
+    assert other.stats()["disk_hits"] == 1
+
+
+def test_no_store_is_not_cached(server, fetcher):
+    fetcher.fetch_image(f"{server.base}/nostore.png")
+    fetcher.fetch_image(f"{server.base}/nostore.png")
+    assert server.hits["/nostore.png"] == 2
+
+
+def test_bodies_over_max_bytes_are_refused(server, fetcher):
+    with pytest.raises(ValueError):
+        fetcher.fetch_image(f"{server.base}/big")
+
+
+def test_http_errors_raise_connection_error(server, fetcher):
+    with pytest.raises(ConnectionError):
+        fetcher.fetch_image(f"{server.base}/missing.png")
+    with pytest.raises(ConnectionError):
+        fetcher.fetch_images({"room": f"{server.base}/room.png", "x": f"{server.base}/missing.png"})
+
+
+def test_failed_input_is_raised_after_the_other_downloads(server, fetcher, load_input_images):
+    with pytest.raises(ConnectionError):
+        load_input_images({"x": f"{server.base}/missing.png", "room": f"{server.base}/slow/room.png"})
+    # Nothing is left downloading in the background: the slow image has already been cached
+    assert f"{server.base}/slow/room.png" in fetcher._cache
+
+
+def test_unprompted_304_is_retried_unconditionally(server, fetcher):
+    assert np.array_equal(fetcher.fetch_image(f"{server.base}/stale/room.png"), ROOM)
+    assert server.hits["/stale/room.png"] == 2
+
+
+def test_repeated_unprompted_304_raises_connection_error(server, fetcher):
+    server.state["stale_304s"] = 2
+    with pytest.raises(ConnectionError):
+        fetcher.fetch_image(f"{server.base}/stale/room.png")
+    server.state["stale_304s"] = 2
+    with pytest.raises(ConnectionError):
+        fetcher.fetch_bytes(f"{server.base}/stale/room.png")
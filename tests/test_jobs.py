@@ -0,0 +1,112 @@
+import json
+import threading
+import time
+
+import jobs
+from jobs import JobQueue, report_stage
+
+
+def test_importing_app_starts_nothing(app_module):
+    # Only init_app() loads the model and starts render threads; the process-wide queue was never opened
+    assert app_module.get_model_status()["stage"] == "not loaded"
+    assert jobs._queue is None
+    assert not [thread for thread in threading.enumerate() if thread.name == "model-startup"]
+
+
+def test_init_app_starts_model_and_workers_once(app_module, monkeypatch, tmp_path):
+    loads = []
+    queue = JobQueue(str(tmp_path))
+    monkeypatch.setattr(app_module, "_initialized", False)
+    monkeypatch.setattr(app_module, "MODEL_LOAD_IN_BACKGROUND", False)
+    monkeypatch.setattr(app_module, "startup", lambda: loads.append(1))
+    monkeypatch.setattr(app_module, "get_job_queue", lambda: queue)
+    monkeypatch.setattr(app_module, "get_model_status", lambda: {"ready": False})
+
+    app_module.init_app(job_workers=1)
+    app_module.init_app(job_workers=1)
+    assert loads == [1]
+    assert len(queue._workers) == 1
+
+
+def test_claim_finish_and_result(tmp_path):
+    queue = JobQueue(str(tmp_path), result_ttl_s=60)
+    job_id = queue.enqueue("/overlayFloor", b"body", "application/json", "image/png", {"async": ["1"]})
+    assert queue.get(job_id)["state"] == "queued"
+    assert queue.get(job_id)["queue_position"] == 0
+
+    job = queue.claim()
+    assert (job["job_id"], job["body"], job["attempts"]) == (job_id, b"body", 1)
+    assert job["request"] == {"content_type": "application/json", "accept": "image/png", "query": {"async": ["1"]}}
+    assert queue.claim() is None
+
+    queue.stage(job_id, "segmenting")
+    queue.finish(job_id, 200, "image/png", b"png", {"X-Layer-Offset": "1,2"})
+    status = queue.get(job_id)
+    assert status["state"] == "done" and status["status_code"] == 200
+    assert [stage["stage"] for stage in status["stages"]] == ["started", "segmenting", "done"]
+    assert queue.result(job_id) == (200, "image/png", {"X-Layer-Offset": "1,2"}, b"png")
+
+
+def test_error_responses_mark_the_job_failed(tmp_path):
+    queue = JobQueue(str(tmp_path))
+    job_id = queue.enqueue("/overlayWall", b"{}")
+    queue.claim()
+    queue.finish(job_id, 400, "application/json", json.dumps({"error": "Feature not found in image"}).encode())
+    assert queue.get(job_id)["state"] == "failed"
+    assert queue.result(job_id)[0] == 400
+
+
+def test_lapsed_lease_is_requeued_then_abandoned(tmp_path):
+    queue = JobQueue(str(tmp_path), lease_s=0.1, max_attempts=2)
+    job_id = queue.enqueue("/overlayFloor", b"body")
+    queue.claim()
+    time.sleep(0.15)
+    assert queue.claim()["attempts"] == 2
+    time.sleep(0.15)
+    assert queue.claim() is None
+    assert queue.get(job_id)["state"] == "failed"
+    assert queue.result(job_id)[0] == 500
+
+
+def test_finished_jobs_expire(tmp_path):
+    queue = JobQueue(str(tmp_path), result_ttl_s=0.1)
+    job_id = queue.enqueue("/overlayFloor", b"body")
+    queue.claim()
+    queue.finish(job_id, 200, "application/json", b"{}")
+    time.sleep(0.15)
+    assert queue.get(job_id) is None and queue.result(job_id) is None
+    assert queue.sweep() == 1
+    assert not (tmp_path / job_id).exists()
+
+
+def test_delete_cancels_queued_jobs_only(tmp_path):
+    queue = JobQueue(str(tmp_path))
+    queued = queue.enqueue("/overlayFloor", b"a")
+    assert queue.delete(queued) and queue.get(queued) is None
+    running = queue.enqueue("/overlayFloor", b"b")
+    queue.claim()
+    assert not queue.delete(running)
+
+
+def test_workers_run_jobs_once_ready(tmp_path):
+    queue = JobQueue(str(tmp_path))
+    ready = threading.Event()
+    ran = []
+
+    def handler(job):
+        report_stage("compositing")
+        ran.append(job["job_id"])
+        return 200, "application/octet-stream", job["body"][::-1], {}
+
+    job_ids = [queue.enqueue("/overlayFloor", f"body{index}".encode()) for index in range(3)]
+    queue.start_workers(handler, count=2, ready=ready.is_set)
+    time.sleep(0.2)
+    assert not ran
+    ready.set()
+    deadline = time.time() + 10
+    while time.time() < deadline and not all(queue.get(job_id)["state"] == "done" for job_id in job_ids):
+        time.sleep(0.05)
+    assert sorted(ran) == sorted(job_ids)
+    for index, job_id in enumerate(job_ids):
+        assert queue.result(job_id)[3] == f"body{index}".encode()[::-1]
+        assert "compositing" in [stage["stage"] for stage in queue.get(job_id)["stages"]]
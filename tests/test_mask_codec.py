@@ -0,0 +1,106 @@
+import cv2
+import numpy as np
+import pytest
+
+from mask_codec import (decode_label_map, decode_mask, decode_polygon, decode_rle, encode_label_map, encode_mask,
+                        encode_polygon, encode_rle, mask_from_bytes, mask_to_bytes)
+
+
+def blobs(seed):
+    """Random ellipses with a hole cut out of the middle."""
+    rng = np.random.default_rng(seed)
+    height, width = (int(x) for x in rng.integers(200, 700, size=2))
+    mask = np.zeros((height, width), np.uint8)
+    for _ in range(rng.integers(1, 5)):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        axes = (int(rng.integers(10, width // 2)), int(rng.integers(10, height // 2)))
+        cv2.ellipse(mask, center, axes, float(rng.integers(0, 180)), 0, 360, 255, -1)
+    cv2.circle(mask, (width // 2, height // 2), min(width, height) // 10, 0, -1)
+    return mask
+
+
+def single_pixel(row, col):
+    mask = np.zeros((37, 53), np.uint8)
+    mask[row, col] = 255
+    return mask
+
+
+MASKS = {
+    "empty": np.zeros((37, 53), np.uint8),
+    "full": np.full((37, 53), 255, np.uint8),
+    "first pixel": single_pixel(0, 0),
+    "last pixel": single_pixel(-1, -1),
+    "noise": (np.random.default_rng(0).random((61, 47)) > 0.5).astype(np.uint8) * 255,
+    **{f"blobs {seed}": blobs(seed) for seed in range(4)},
+}
+
+
+def iou(a, b):
+    union = np.logical_or(a > 0, b > 0).sum()
+    return np.logical_and(a > 0, b > 0).sum() / union if union else 1.0
+
+
+@pytest.fixture(params=list(MASKS), ids=list(MASKS))
+def mask(request):
+    return MASKS[request.param]
+
+
+def test_rle_round_trip_is_exact(mask):
+    assert np.array_equal(decode_rle(encode_rle(mask)), mask)
+    assert np.array_equal(decode_rle(encode_rle(mask, compressed=False)), mask)
+    assert np.array_equal(mask_from_bytes(mask_to_bytes(mask)), mask)
+    assert np.array_equal(decode_mask(encode_mask(mask, "rle")), mask)
+
+
+def test_rle_of_empty_and_full_masks():
+    assert encode_rle(MASKS["empty"], compressed=False)["counts"] == [37 * 53]
+    assert encode_rle(MASKS["full"], compressed=False)["counts"] == [0, 37 * 53]
+
+
+def test_rle_matches_pycocotools(mask):
+    coco_mask = pytest.importorskip("pycocotools.mask")
+    reference = coco_mask.encode(np.asfortranarray(mask > 0).astype(np.uint8))
+    assert encode_rle(mask)["counts"] == reference["counts"].decode("ascii")
+
+
+def test_rle_with_wrong_size_is_rejected():
+    with pytest.raises(ValueError):
+        decode_rle({"size": [2, 2], "counts": [1, 2]})
+
+
+def test_polygon_of_empty_and_full_masks():
+    assert encode_polygon(MASKS["empty"])["polygons"] == []
+    assert not decode_polygon(encode_polygon(MASKS["empty"])).any()
+    assert decode_polygon(encode_polygon(MASKS["full"])).all()
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_polygon_keeps_holes(seed):
+    mask = blobs(seed)
+    polygon = encode_mask(mask, "polygon")
+    decoded = decode_mask(polygon)
+    assert iou(decoded, mask) >= 0.98
+    # The hole cut out of the middle stays empty
+    height, width = mask.shape
+    assert not decoded[height // 2, width // 2]
+
+
+def test_polygon_hole_is_exact_without_simplification():
+    mask = np.zeros((120, 160), np.uint8)
+    cv2.rectangle(mask, (10, 10), (149, 109), 255, -1)
+    cv2.rectangle(mask, (50, 40), (99, 79), 0, -1)
+    polygon = encode_polygon(mask, tolerance=0)
+    assert len(polygon["polygons"]) == 1 and len(polygon["holes"]) == 1
+    assert np.array_equal(decode_polygon(polygon), mask)
+
+
+@pytest.mark.parametrize("dtype", [np.int16, np.int32, np.uint8])
+def test_label_map_round_trip(mask, dtype):
+    labels = (mask // 255).astype(dtype) * 7 + (3 if dtype == np.uint8 else -1)
+    assert np.array_equal(decode_label_map(encode_label_map(labels)), labels)
+
+
+def test_label_map_round_trip_with_many_labels():
+    labels = np.random.default_rng(1).integers(-1, 150, size=(90, 120)).astype(np.int32)
+    decoded = decode_label_map(encode_label_map(labels))
+    assert decoded.dtype == labels.dtype and np.array_equal(decoded, labels)
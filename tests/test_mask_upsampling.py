@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+import pytest
+
+import floor_mask_model
+from floor_mask_model import get_model_status, upsample_mask
+
+
+@pytest.fixture
+def low_res_mask():
+    mask = np.zeros((30, 40), np.uint8)
+    cv2.circle(mask, (20, 15), 9, 255, -1)
+    guide = np.random.default_rng(0).integers(0, 255, (120, 160, 3), dtype=np.uint8)
+    return mask, guide
+
+
+@pytest.fixture
+def without_guided_filter(monkeypatch):
+    monkeypatch.setattr(floor_mask_model, "GUIDED_FILTER_AVAILABLE", False)
+    monkeypatch.setattr(floor_mask_model, "_bilinear_fallback_warned", False)
+
+
+def test_bilinear_fallback_warns_once(without_guided_filter, low_res_mask, capsys):
+    mask, guide = low_res_mask
+    upsampled = upsample_mask(mask, guide)
+    upsample_mask(mask, guide)
+
+    bilinear = cv2.resize((mask > 0).astype(np.float32), (160, 120), interpolation=cv2.INTER_LINEAR) > 0.5
+    assert np.array_equal(upsampled, bilinear)
+    warnings = [line for line in capsys.readouterr().out.splitlines() if line.startswith("001 WARNING")]
+    assert len(warnings) == 1 and "cv2.ximgproc" in warnings[0]
+
+
+def test_status_reports_the_fallback(without_guided_filter, monkeypatch):
+    monkeypatch.setattr(floor_mask_model, "SEGMENTATION_WORKING_SIZE", 640)
+    status = get_model_status()
+    assert status["mask_upsampling"] == "bilinear"
+    assert any("mask_upsampling" in entry for entry in status["degraded"])
+
+    # At full resolution nothing is upsampled, so nothing is degraded
+    monkeypatch.setattr(floor_mask_model, "SEGMENTATION_WORKING_SIZE", 0)
+    monkeypatch.setattr(floor_mask_model, "SEGMENTATION_POSTPROCESS", "panoptic")
+    assert "degraded" not in get_model_status()
+
+
+@pytest.mark.skipif(not floor_mask_model.GUIDED_FILTER_AVAILABLE, reason="needs opencv-contrib-python")
+def test_guided_filter_is_reported_and_silent(low_res_mask, capsys):
+    mask, guide = low_res_mask
+    upsample_mask(mask, guide)
+    assert "001 WARNING" not in capsys.readouterr().out
+    assert get_model_status()["mask_upsampling"] == "guided_filter"
+    assert "degraded" not in get_model_status()
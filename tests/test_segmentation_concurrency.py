@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import floor_mask_model
+from floor_mask_model import FLOOR_LABEL_ID, WALL_LABEL_ID, segment_image
+
+THREADS = 32
+
+
+class FakeModel:
+    """
+    Stands in for segment_batch(): a slow "forward pass" that counts calls per image and the
+    most passes ever running at once. Pixels brighter than 127 are floor, the rest wall.
+    """
+
+    def __init__(self, delay_s=0.05, fail=False):
+        self.delay_s = delay_s
+        self.fail = fail
+        self.calls = Counter()
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, images):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            for image in images:
+                self.calls[np.asarray(image).tobytes()] += 1
+        try:
+            time.sleep(self.delay_s)
+            if self.fail:
+                raise RuntimeError("forward pass failed")
+            entries = []
+            for image in images:
+                gray = np.asarray(image.convert("L"))
+                panoptic_map = np.where(gray > 127, 2, 1).astype(np.int16)
+                entries.append((panoptic_map, [{"id": 1, "label_id": WALL_LABEL_ID}, {"id": 2, "label_id": FLOOR_LABEL_ID}]))
+            return entries
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(floor_mask_model, "segment_batch", model)
+    monkeypatch.setattr(floor_mask_model, "_scheduler", None)
+    monkeypatch.setattr(floor_mask_model, "_daemon_client", None)
+    floor_mask_model.clear_segmentation_cache()
+    yield model
+    floor_mask_model.clear_segmentation_cache()
+
+
+def rooms(count):
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (48, 64, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def segment_concurrently(images):
+    """segment_image() of images[i % len(images)] from THREADS threads released at once."""
+    barrier = threading.Barrier(THREADS)
+
+    def run(index):
+        barrier.wait()
+        return index % len(images), segment_image(images[index % len(images)])
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        return list(pool.map(run, range(THREADS)))
+
+
+def test_one_inference_per_distinct_image(fake_model):
+    images = rooms(4)
+    results = segment_concurrently(images)
+
+    assert len(fake_model.calls) == len(images)
+    assert set(fake_model.calls.values()) == {1}
+    # Forward passes are serialised by the inference lock
+    assert fake_model.max_active == 1
+    assert not floor_mask_model._inflight
+
+    for index, image in enumerate(images):
+        same_image = [result for image_index, result in results if image_index == index]
+        reference = same_image[0]
+        for result in same_image:
+            assert np.array_equal(result.panoptic_map, reference.panoptic_map)
+            assert result.segments_info == reference.segments_info
+            assert np.array_equal(result.binary_mask(FLOOR_LABEL_ID), reference.binary_mask(FLOOR_LABEL_ID))
+        # Shared results must not be modifiable in place
+        assert not reference.panoptic_map.flags.writeable
+    # Different images got their own segmentations
+    assert not np.array_equal(results[0][1].panoptic_map, results[1][1].panoptic_map)
+
+
+def test_later_requests_hit_the_cache(fake_model):
+    images = rooms(2)
+    segment_concurrently(images)
+    segment_concurrently(images)
+    assert set(fake_model.calls.values()) == {1}
+    assert floor_mask_model.get_inference_metrics()["segmentation_cache"]["entries"] == 2
+
+
+def test_failed_inference_reaches_every_waiter(fake_model):
+    fake_model.fail = True
+    with pytest.raises(RuntimeError):
+        segment_concurrently(rooms(1))
+    assert not floor_mask_model._inflight
+    # Nothing was cached: the next request runs the model again
+    fake_model.fail = False
+    segment_image(rooms(1)[0])
+    assert sum(fake_model.calls.values()) >= 2
@@ -0,0 +1,27 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import floor_mask_model
+
+torch = pytest.importorskip("torch")
+
+
+def test_semantic_segment_scores_are_class_confidences():
+    # Two queries over a 4x6 grid: query 0 is confidently class 3 on the left, query 1 is
+    # unsure between classes 5 and 7 (with 5 ahead) on the right
+    class_logits = torch.full((1, 2, 10), -20.0)
+    class_logits[0, 0, 3] = 10.0
+    class_logits[0, 1, 5], class_logits[0, 1, 7] = 1.0, 0.0
+    mask_logits = torch.full((1, 2, 4, 6), -20.0)
+    mask_logits[0, 0, :, :2] = 20.0
+    mask_logits[0, 1, :, 2:] = 20.0
+
+    label_map, segments_info = floor_mask_model._postprocess_semantic(
+        SimpleNamespace(class_queries_logits=class_logits, masks_queries_logits=mask_logits))
+    scores = {segment["label_id"]: segment["score"] for segment in segments_info}
+    assert np.array_equal(np.unique(label_map), [4, 6])
+    # Not the area (1/3 and 2/3): certain for class 3, softmax(1, 0) = 0.73 for class 5
+    assert scores[3] == pytest.approx(1.0, abs=1e-3)
+    assert scores[5] == pytest.approx(1 / (1 + np.exp(-1)), abs=1e-3)
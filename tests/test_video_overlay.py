@@ -0,0 +1,120 @@
+import base64
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+import carpet_working
+import video_overlay
+
+SHIFT_PX = 3
+FRAMES = 10
+
+
+class FloorSegmentation:
+    """segment_image() stand-in: the lower half of every frame is floor."""
+
+    def __init__(self, frame):
+        self.shape = frame.shape[:2]
+
+    def binary_mask(self, label):
+        mask = np.zeros(self.shape, np.uint8)
+        mask[self.shape[0] // 2:] = 255
+        return mask
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = {"segment": 0, "contour": 0}
+
+    def segment_image(frame, label):
+        calls["segment"] += 1
+        return FloorSegmentation(frame)
+
+    def find_floor_contour(mask):
+        calls["contour"] += 1
+        return contour(mask)
+
+    contour = carpet_working.find_floor_contour
+    monkeypatch.setattr(video_overlay, "segment_image", segment_image)
+    monkeypatch.setattr(carpet_working, "find_floor_contour", find_floor_contour)
+    return calls
+
+
+def panning_frames():
+    """A textured scene panning left by SHIFT_PX per frame."""
+    scene = cv2.GaussianBlur(np.random.default_rng(0).integers(0, 255, (240, 400 + SHIFT_PX * FRAMES, 3), dtype=np.uint8), (5, 5), 0)
+    return [scene[:, index * SHIFT_PX:index * SHIFT_PX + 400].copy() for index in range(FRAMES)]
+
+
+def test_tile_geometry_is_propagated_not_refitted(calls):
+    design = np.random.default_rng(1).integers(0, 255, (64, 64, 3), dtype=np.uint8)
+    stats = {}
+    outputs = list(video_overlay.overlay_frames(panning_frames(), design, stats))
+
+    assert stats["frames"] == FRAMES and stats["keyframes"] == 1
+    # The floor contour is fitted on the keyframe only
+    assert calls == {"segment": 1, "contour": 1}
+    # The texture moves with the scene: frame k is frame 0 shifted by k * SHIFT_PX
+    last = FRAMES - 1
+    offset = last * SHIFT_PX
+    floor_rows = slice(140, 230)
+    first, moved = outputs[0][floor_rows, offset + 20:380].astype(int), outputs[last][floor_rows, 20:380 - offset].astype(int)
+    assert np.abs(first - moved).mean() < 10
+
+
+@pytest.fixture
+def client(app_module, calls, monkeypatch, tmp_path):
+    import temp_dirs
+
+    monkeypatch.setattr(app_module, "get_model_status", lambda: {"ready": True})
+    monkeypatch.setattr(app_module, "persist_level", lambda route: "none")
+    monkeypatch.setattr(temp_dirs, "TEMP_ROOT", str(tmp_path / "temporary"))
+    return app_module.app.test_client()
+
+
+def encoded(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+@pytest.fixture
+def video_request(tmp_path):
+    video_path = str(tmp_path / "walkthrough.mp4")
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"mp4v"), 10, (400, 240))
+    for frame in panning_frames():
+        writer.write(frame)
+    writer.release()
+    with open(video_path, "rb") as f:
+        video = f.read()
+    design = cv2.imencode(".png", np.full((32, 32, 3), 128, np.uint8))[1].tobytes()
+    return {"video": encoded(video), "design_image": encoded(design)}
+
+
+def test_route_streams_the_video_and_removes_its_temp_dir(client, video_request, tmp_path):
+    response = client.post("/overlayVideo", json=video_request)
+    assert response.status_code == 200 and response.mimetype == "video/mp4"
+    assert json.loads(response.headers["X-Overlay-Stats"])["frames"] == FRAMES
+    # Streamed from the encoded file, which is only removed once the response is closed
+    assert response.is_streamed
+    [temp_dir] = (tmp_path / "temporary").iterdir()
+    assert (temp_dir / "final.mp4").exists()
+    assert response.get_data()[4:8] == b"ftyp"
+    response.close()
+    assert not temp_dir.exists()
+
+
+def test_route_rejects_undecodable_videos(client, tmp_path):
+    design = cv2.imencode(".png", np.full((32, 32, 3), 128, np.uint8))[1].tobytes()
+    response = client.post("/overlayVideo", json={"video": encoded(b"not a video" * 100), "design_image": encoded(design)})
+    assert response.status_code == 400
+    assert not list((tmp_path / "temporary").iterdir())
+
+
+def test_jobs_store_the_video_and_remove_its_temp_dir(app_module, client, video_request, tmp_path):
+    job = {"route": "/overlayVideo", "body": json.dumps(video_request).encode(),
+           "request": {"content_type": "application/json", "accept": None, "query": {}}}
+    status_code, mimetype, body, headers = app_module.run_job_request(job)
+    assert (status_code, mimetype) == (200, "video/mp4")
+    assert body[4:8] == b"ftyp" and "X-Overlay-Stats" in headers
+    assert not list((tmp_path / "temporary").iterdir())
@@ -0,0 +1,209 @@
+# 021
+
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from floor_mask_model import segment_image, FLOOR_LABEL_ID
+from carpet_working import overlay_texture_on_floor, floor_geometry
+
+# Frames taller than this are downscaled before processing (as scale_room_image does for photos)
+VIDEO_MAX_HEIGHT = int(os.environ.get("VIDEO_MAX_HEIGHT", "1080"))
+# A keyframe is segmented at least this often, however well tracking holds up
+VIDEO_MAX_KEYFRAME_INTERVAL = int(os.environ.get("VIDEO_MAX_KEYFRAME_INTERVAL", "30"))
+# Re-segment once the accumulated homography residual since the last keyframe exceeds this (px)
+VIDEO_DRIFT_THRESHOLD_PX = float(os.environ.get("VIDEO_DRIFT_THRESHOLD_PX", "8"))
+# Re-segment when fewer than this share of the tracked points survive a frame as homography inliers
+VIDEO_MIN_INLIER_RATIO = float(os.environ.get("VIDEO_MIN_INLIER_RATIO", "0.5"))
+# Codec of the output video (mp4v is available in every OpenCV build)
+VIDEO_FOURCC = os.environ.get("VIDEO_FOURCC", "mp4v")
+
+# Below this many tracked points new corners are detected
+_MIN_TRACKED_POINTS = 40
+_FEATURE_PARAMS = dict(maxCorners=400, qualityLevel=0.01, minDistance=8, blockSize=7)
+_FLOW_PARAMS = dict(winSize=(21, 21), maxLevel=3, criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 30, 0.01))
+# Points whose forward-backward flow disagrees by more than this (px) are dropped
+_MAX_FORWARD_BACKWARD_ERROR = 1.0
+
+def _scale_frame(frame):
+    height, width = frame.shape[:2]
+    if height <= VIDEO_MAX_HEIGHT:
+        return frame
+    scale = VIDEO_MAX_HEIGHT / height
+    return cv2.resize(frame, (round(width * scale), VIDEO_MAX_HEIGHT), interpolation=cv2.INTER_AREA)
+
+def _track_points(gray, floor_mask):
+    """
+    Corners to track, taken from inside the floor when it has enough texture (points on the floor
+    plane move exactly by a homography), otherwise from the whole frame. None on blank frames.
+    """
+    points = None
+    if floor_mask is not None and floor_mask.any():
+        inner_floor = cv2.erode(floor_mask, np.ones((15, 15), np.uint8))
+        points = cv2.goodFeaturesToTrack(gray, mask=inner_floor, **_FEATURE_PARAMS)
+    if points is None or len(points) < _MIN_TRACKED_POINTS:
+        points = cv2.goodFeaturesToTrack(gray, mask=None, **_FEATURE_PARAMS)
+    return points
+
+def _frame_homography(prev_gray, gray, points):
+    """
+    Tracks points from the previous frame with pyramidal Lucas-Kanade and fits the frame-to-frame
+    homography with RANSAC.
+
+    Returns:
+        tuple: (H, inlier points in the new frame, inlier ratio, median residual in px), or
+               (None, None, 0.0, inf) when tracking fails.
+    """
+    failed = (None, None, 0.0, float("inf"))
+    if points is None or len(points) < 4:
+        return failed
+    forward, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None, **_FLOW_PARAMS)
+    backward, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, forward, None, **_FLOW_PARAMS)
+    forward_backward_error = np.linalg.norm((points - backward).reshape(-1, 2), axis=1)
+    good = (status.ravel() == 1) & (back_status.ravel() == 1) & (forward_backward_error < _MAX_FORWARD_BACKWARD_ERROR)
+    if good.sum() < 4:
+        return failed
+    source, target = points[good], forward[good]
+    H, inliers = cv2.findHomography(source, target, cv2.RANSAC, 3.0)
+    if H is None:
+        return failed
+    inliers = inliers.ravel().astype(bool)
+    projected = cv2.perspectiveTransform(source[inliers], H)
+    residual = float(np.median(np.linalg.norm((projected - target[inliers]).reshape(-1, 2), axis=1)))
+    return H, target[inliers], inliers.sum() / len(points), residual
+
+def _warp_geometry(geometry, H, floor_mask):
+    """A keyframe's floor_geometry() moved by the homography H, with floor_mask as its (warped) mask."""
+    warp = lambda points: cv2.perspectiveTransform(np.float32(points).reshape(-1, 1, 2), H).reshape(-1, 2)
+    return {"contour": warp(geometry["contour"]), "corners": warp(geometry["corners"]), "binary_mask": floor_mask}
+
+def overlay_frames(frames, design, stats=None):
+    """
+    Composites a floor design onto every frame of a walkthrough.
+
+    MaskFormer only runs on keyframes. In between, the keyframe's floor mask and tile geometry
+    (carpet_working.floor_geometry) are carried along with the homography accumulated from the
+    frame-to-frame homographies of optical flow, so the design is warped with the propagated
+    homography instead of being refitted to each frame's mask. A new keyframe is segmented when
+    tracking is lost, the accumulated drift passes VIDEO_DRIFT_THRESHOLD_PX or
+    VIDEO_MAX_KEYFRAME_INTERVAL frames have passed.
+
+    Args:
+        frames: iterable of BGR frames.
+        design: tiled design image (path or BGR array).
+        stats (dict): filled in with frames, keyframes and the reason for each keyframe.
+
+    Yields:
+        BGR output frames (frames without floor are passed through unchanged).
+    """
+    stats = stats if stats is not None else {}
+    stats.update(frames=0, keyframes=0, keyframe_reasons={"first_frame": 0, "interval": 0, "tracking_lost": 0, "drift": 0})
+    if not isinstance(design, np.ndarray):
+        design = cv2.imread(design)
+    prev_gray = floor_mask = points = None
+    keyframe_mask = keyframe_geometry = geometry = accumulated_H = None
+    frames_since_keyframe = 0
+    drift = 0.0
+    for frame in frames:
+        frame = _scale_frame(frame)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        reason = None
+        if floor_mask is None:
+            reason = "first_frame"
+        elif frames_since_keyframe >= VIDEO_MAX_KEYFRAME_INTERVAL:
+            reason = "interval"
+        else:
+            H, points, inlier_ratio, residual = _frame_homography(prev_gray, gray, points)
+            drift += residual
+            if H is None or inlier_ratio < VIDEO_MIN_INLIER_RATIO:
+                reason = "tracking_lost"
+            elif drift > VIDEO_DRIFT_THRESHOLD_PX:
+                reason = "drift"
+            else:
+                # Warped from the keyframe in one step, so resampling errors do not build up
+                accumulated_H = H @ accumulated_H
+                floor_mask = cv2.warpPerspective(keyframe_mask, accumulated_H, (frame.shape[1], frame.shape[0]),
+                                                 flags=cv2.INTER_NEAREST)
+                if keyframe_geometry is not None:
+                    geometry = _warp_geometry(keyframe_geometry, accumulated_H, floor_mask)
+                frames_since_keyframe += 1
+                if len(points) < _MIN_TRACKED_POINTS:
+                    points = _track_points(gray, floor_mask)
+
+        if reason is not None:
+            floor_mask = keyframe_mask = segment_image(frame, FLOOR_LABEL_ID).binary_mask(FLOOR_LABEL_ID)
+            # The only contour fit until the next keyframe
+            geometry = keyframe_geometry = floor_geometry(floor_mask) if floor_mask.any() else None
+            accumulated_H = np.eye(3)
+            points = _track_points(gray, floor_mask)
+            frames_since_keyframe = 0
+            drift = 0.0
+            stats["keyframes"] += 1
+            stats["keyframe_reasons"][reason] += 1
+
+        composited = overlay_texture_on_floor(frame, floor_mask, design, geometry) if geometry is not None else None
+        stats["frames"] += 1
+        prev_gray = gray
+        yield frame if composited is None else composited
+
+def _read_frames(capture):
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                return
+            yield frame
+    finally:
+        capture.release()
+
+def overlay_video(video_path, design, output_path):
+    """
+    Applies a floor design to a walkthrough video and writes the encoded result.
+    Frames are decoded, composited and encoded one at a time, so memory does not grow with the clip.
+
+    Args:
+        video_path (str): input video.
+        design: tiled design image (path or BGR array).
+        output_path (str): where the encoded video (VIDEO_FOURCC) is written.
+
+    Returns:
+        dict: frames, keyframes, keyframe_reasons, seconds, fps (processed frames per second)
+              and source_fps.
+    """
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise ValueError(f"021 Could not open video: {video_path}")
+    source_fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+
+    stats = {}
+    writer = None
+    started = time.perf_counter()
+    try:
+        for output_frame in overlay_frames(_read_frames(capture), design, stats):
+            if writer is None:
+                height, width = output_frame.shape[:2]
+                writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*VIDEO_FOURCC), source_fps, (width, height))
+            writer.write(output_frame)
+    finally:
+        if writer is not None:
+            writer.release()
+    elapsed = time.perf_counter() - started
+    stats.update(seconds=round(elapsed, 3), fps=round(stats["frames"] / elapsed, 2) if elapsed else 0.0, source_fps=source_fps)
+    print(f"021 Video overlay: {stats['frames']} frames, {stats['keyframes']} keyframes segmented, "
+          f"{stats['fps']} frames/s -> {output_path}")
+    return stats
+
+def main():
+    if len(sys.argv) != 4:
+        print("usage: python video_overlay.py <walkthrough video> <design image> <output video>")
+        return
+    from floor_mask_model import load_model
+    from mask_room_image import tileDesign
+    load_model()
+    print(overlay_video(sys.argv[1], tileDesign(sys.argv[2]), sys.argv[3]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# 019
+
+# numba wall-overlay kernels (moved out of floor_mask_model.py so numba is only imported
+# by code paths that actually use them). wall_overlay.py holds vectorized equivalents and
+# picks between the two; compiled code is cached next to this file, so only the very first
+# process on a host pays the JIT compile.
+import numpy as np
+from numba import njit, prange
+
+@njit(parallel=True, cache=True)
+def create_wall_overlay(mask,dsgn,woverlay):
+    w,h,_ = woverlay.shape
+    dw,dh,_ = dsgn.shape
+    for i in prange(0,w):
+        for j in range(0,h):
+            if(mask[i][j][0] == 255):
+                p = dsgn[i%dw][j%dh]
+                woverlay[i][j]= p
+    return woverlay
+
+@njit(parallel=True, cache=True)
+def create_output_image(imagearray,walloverlayarray):
+    h,w,_ =  walloverlayarray.shape
+    for i in prange(0,h):
+        for j in range(0,w):
+            if(walloverlayarray[i][j].sum() > 0 ):
+                imagearray[i][j] =  walloverlayarray[i][j]
+    return imagearray.astype(np.uint8)
+
+@njit(parallel=True, cache=True)
+def create_image_with_shadow(img_gray,hsv_image,walloverlayarray):
+  # Multiplies the brightness of the design by the room's brightness relative to the mean over
+  # the overlaid area, so shadows and light falloff on the wall carry over to the design.
+  # (The previous formula, V - normalised(gray) * 100, darkened the brightest parts of the wall most.)
+  h,w,_ =  hsv_image.shape
+  total = 0.0
+  count = 0
+  for i in prange(0,h):
+    for j in range(0,w):
+      if(walloverlayarray[i][j].sum() > 0 ):
+        total += img_gray[i][j]
+        count += 1
+  if count == 0:
+    return hsv_image
+  mean_gray = max(total / count, 1.0)
+  for i in prange(0,h):
+    for j in range(0,w):
+      if(walloverlayarray[i][j].sum() > 0 ):
+        hsv_image[i][j][2] = min(255.0, np.floor(hsv_image[i][j][2] * img_gray[i][j] / mean_gray + 0.5))
+  return hsv_image
@@ -0,0 +1,104 @@
+# 022
+
+import os
+import threading
+from contextlib import nullcontext
+
+import cv2
+import numpy as np
+
+# "vectorized" (NumPy/OpenCV, below) or "numba" (wall_kernels.py, JIT-compiled with an on-disk
+# cache). Vectorized is the default: benchmarks/wall_kernels.py measures it faster end to end and
+# it needs no compilation at all.
+WALL_KERNELS = os.environ.get("WALL_KERNELS", "vectorized")
+
+# Vectorized equivalents of the numba kernels in wall_kernels.py (same arguments and results).
+# Masked copies go through cv2.copyTo and per-pixel channel tests through cv2 per-channel ops;
+# the NumPy equivalents (np.copyto(where=...), .any(axis=2)) are several times slower.
+
+def _covered(walloverlayarray):
+    """uint8 mask, non-zero where the overlay pixel is not black."""
+    blue, green, red = cv2.split(walloverlayarray)
+    return cv2.bitwise_or(cv2.bitwise_or(blue, green), red)
+
+def create_wall_overlay(mask, dsgn, woverlay):
+    """Writes the design, repeated from the top-left corner, wherever mask[..., 0] is 255."""
+    height, width = woverlay.shape[:2]
+    design_height, design_width = dsgn.shape[:2]
+    tiled = cv2.repeat(dsgn, -(-height // design_height), -(-width // design_width))[:height, :width]
+    cv2.copyTo(tiled, cv2.compare(np.ascontiguousarray(mask[:, :, 0]), 255, cv2.CMP_EQ), woverlay)
+    return woverlay
+
+def create_output_image(imagearray, walloverlayarray):
+    """Copies every non-black overlay pixel onto the image."""
+    cv2.copyTo(walloverlayarray, _covered(walloverlayarray), imagearray)
+    return imagearray
+
+def create_image_with_shadow(img_gray, hsv_image, walloverlayarray):
+    """
+    Multiplies the brightness (V) of the overlaid pixels by the room's brightness relative to its
+    mean over the overlaid area, so shadows and light falloff on the wall carry over to the design.
+    """
+    covered = _covered(walloverlayarray)
+    if not cv2.countNonZero(covered):
+        return hsv_image
+    mean_gray = max(cv2.mean(img_gray, mask=covered)[0], 1.0)
+    hue, saturation, value = cv2.split(hsv_image)
+    # Saturating uint8 product, rounded like the numba kernel
+    shaded = cv2.multiply(value, img_gray, scale=1.0 / mean_gray)
+    cv2.copyTo(shaded, covered, value)
+    cv2.merge((hue, saturation, value), dst=hsv_image)
+    return hsv_image
+
+def _numba_kernels():
+    import wall_kernels
+    # Compile the kernels (or load them from numba's cache) now, on tiny arrays of the types
+    # overlay_wall() passes, so no request pays for JIT compilation
+    mask = np.full((2, 2, 1), 255, dtype=np.uint8)
+    overlay = wall_kernels.create_wall_overlay(mask, np.ones((1, 1, 3), dtype=np.uint8), np.zeros((2, 2, 3), dtype=np.uint8))
+    wall_kernels.create_output_image(np.zeros((2, 2, 3), dtype=np.uint8), overlay)
+    wall_kernels.create_image_with_shadow(np.ones((2, 2), dtype=np.uint8), np.zeros((2, 2, 3), dtype=np.uint8), overlay)
+    return wall_kernels.create_wall_overlay, wall_kernels.create_output_image, wall_kernels.create_image_with_shadow
+
+if WALL_KERNELS == "numba":
+    _kernels = _numba_kernels()
+    # numba's default (workqueue) threading layer aborts the process when two threads launch
+    # parallel kernels at the same time, so threaded workers take turns
+    _kernels_lock = threading.Lock()
+elif WALL_KERNELS == "vectorized":
+    _kernels = (create_wall_overlay, create_output_image, create_image_with_shadow)
+    _kernels_lock = nullcontext()
+else:
+    raise ValueError(f"022 Unsupported wall kernels: {WALL_KERNELS}")
+
+def paint_swatch(color):
+    """1x1 BGR design of a solid paint colour given as "#RRGGBB"."""
+    color = color.lstrip("#")
+    if len(color) != 6:
+        raise ValueError(f"022 Paint colour must be #RRGGBB, got: {color}")
+    red, green, blue = (int(color[i:i + 2], 16) for i in (0, 2, 4))
+    return np.array([[[blue, green, red]]], dtype=np.uint8)
+
+def overlay_wall(room_image, wall_mask, design):
+    """
+    Applies a wallpaper or paint design to the walls with the room's shading preserved.
+
+    Args:
+        room_image (np.ndarray): BGR room image.
+        wall_mask (np.ndarray): uint8 wall mask (255 = wall) of the same size.
+        design (np.ndarray): BGR wallpaper tile, repeated across the wall, or a paint swatch.
+
+    Returns:
+        np.ndarray: BGR room image with the design on the walls.
+    """
+    create_overlay, create_output, create_shadow = _kernels
+    # Pure black design pixels would read as "not covered" in the kernels
+    design = np.ascontiguousarray(np.maximum(design, 1))
+    mask = np.ascontiguousarray(wall_mask[:, :, None])
+    img_gray = cv2.cvtColor(room_image, cv2.COLOR_BGR2GRAY)
+    with _kernels_lock:
+        wall_overlay = create_overlay(mask, design, np.zeros_like(room_image))
+        output = create_output(room_image.copy(), wall_overlay)
+        hsv_image = cv2.cvtColor(output, cv2.COLOR_BGR2HSV)
+        hsv_image = create_shadow(img_gray, hsv_image, wall_overlay)
+    return cv2.cvtColor(hsv_image, cv2.COLOR_HSV2BGR)